@@ -15,10 +15,40 @@
 # You should have received a copy of the GNU General Public License
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
-from .src.device import Device
-from .src.frames import Frame
-from .src.frames import Response
-from .src.record import Record
+import importlib
 
-from .src.parameters import Range
-from .src.parameters import Parameters
+# The public classes are imported on first access, so that importing the package is cheap
+__exports = {
+    'Device':         '.src.device',
+    'DeviceInfo':     '.src.device',
+    'DeviceRegistry': '.src.registry',
+    'AsyncDevice':    '.src.asyncdevice',
+    'Frame':          '.src.frames',
+    'Response':       '.src.frames',
+    'MemoryImage':    '.src.image',
+    'ConfigImage':    '.src.image',
+    'Record':         '.src.record',
+    'RecordPager':    '.src.pager',
+    'RecordPipeline': '.src.pipeline',
+    'RequestBroker':  '.src.broker',
+    'FrameScheduler': '.src.scheduler',
+    'RecordCache':    '.src.recordcache',
+    'ConfigCache':    '.src.configcache',
+    'Archive':        '.src.archive',
+    'Fleet':          '.src.fleet',
+    'Simulator':      '.src.simulator',
+    'Range':          '.src.parameters',
+    'Parameters':     '.src.parameters',
+}
+
+__all__ = list(__exports)
+
+def __getattr__(name):
+    if name not in __exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(__exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,87 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from datetime import datetime
+
+import gc
+import json
+import platform
+import time
+
+# Version of the results file format
+Version = 1
+
+def measure(fn, number=None, repeat=5, minTime=0.02):
+    # Best time per call over the repetitions, with the garbage collector disabled.
+    # When the number of calls is not given, it is chosen so that a repetition lasts at least minTime.
+    if number is None:
+        number = 1
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if (time.perf_counter() - t0 >= minTime) or (number >= 1000000):
+                break
+            number *= 10
+
+    best = None
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(number):
+                fn()
+            t = (time.perf_counter() - t0) / number
+            if (best is None) or (t < best):
+                best = t
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+def save(path, results):
+    data = {
+        'version': Version,
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'wt') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+
+def load(path):
+    with open(path, 'rt') as f:
+        data = json.load(f)
+    if (data.get('version') != Version):
+        raise ValueError(f"Unsupported benchmark results version: {data.get('version')}")
+    return data['results']
+
+def compare(baseline, results, threshold=0.1):
+    # Results are times (in seconds): a ratio above 1 + threshold is a regression
+    comparison = []
+    for name in sorted(set(baseline) & set(results)):
+        ratio = results[name] / baseline[name] if (baseline[name] > 0) else float('inf')
+        if (ratio > 1 + threshold):
+            status = 'regression'
+        elif (ratio < 1 / (1 + threshold)):
+            status = 'improvement'
+        else:
+            status = ''
+        comparison.append((name, baseline[name], results[name], ratio, status))
+    return comparison
@@ -0,0 +1,84 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import argparse
+import sys
+
+from . import compare
+from . import load
+from . import save
+
+Benchmarks = ['micro', 'macro', 'session', 'planner', 'enumeration', 'startup']
+
+def run(names, args):
+    results = {}
+    for name in names:
+        if (name == 'micro'):
+            from . import micro
+            results.update(micro.run())
+        elif (name == 'macro'):
+            from . import macro
+            results.update(macro.run(args.records, args.latency))
+        elif (name == 'session'):
+            from . import session
+            results.update(session.run())
+        elif (name == 'planner'):
+            from . import planner
+            results.update(planner.run())
+        elif (name == 'enumeration'):
+            from . import enumeration
+            results.update(enumeration.run())
+        elif (name == 'startup'):
+            from . import startup
+            results.update(startup.run())
+    return results
+
+parser = argparse.ArgumentParser(prog='python -m elitech.bench', description="Benchmarks for python-elitech")
+parser.add_argument('benchmarks', nargs='*', default=[],
+                    help=f"The benchmarks to run among {', '.join(Benchmarks)} (all by default)")
+parser.add_argument('-o', '--output', action='store', default=None,
+                    help='Write the results (times in seconds) to this JSON file')
+parser.add_argument('-c', '--compare', action='store', default=None,
+                    help='Compare the results with the results in this JSON file')
+parser.add_argument('-i', '--input', action='store', default=None,
+                    help='Read the results from this JSON file instead of running the benchmarks')
+parser.add_argument('-t', '--threshold', action='store', type=float, default=0.1,
+                    help='Relative slow down above which a result is a regression (default 0.1)')
+parser.add_argument('--records', action='store', type=int, default=1000,
+                    help='Number of records downloaded by the end-to-end benchmarks')
+parser.add_argument('--latency', action='store', type=float, default=0,
+                    help='Latency of the simulated device for each frame (in seconds)')
+args = parser.parse_args()
+for name in args.benchmarks:
+    if name not in Benchmarks:
+        parser.error(f"Unknown benchmark: {name}")
+
+if args.input is not None:
+    results = load(args.input)
+else:
+    results = run(args.benchmarks or Benchmarks, args)
+if args.output is not None:
+    save(args.output, results)
+
+if args.compare is not None:
+    comparison = compare(load(args.compare), results, args.threshold)
+    print(f"Comparison with {args.compare} (threshold {100*args.threshold:.0f}%):")
+    for name, old, new, ratio, status in comparison:
+        print(f"  - {name + ':':36s} {1e6*old:12.2f}µs -> {1e6*new:12.2f}µs ({100*(ratio - 1):+6.1f}%) {status.upper()}")
+    regressions = [c for c in comparison if c[4] == 'regression']
+    print(f"{len(regressions)} regressions in {len(comparison)} results")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,72 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+
+import tempfile
+
+from ..src.device import Device
+from ..src.device import supportedDevices
+from . import measure
+
+def makeTree(root, nodes):
+    root = Path(root)
+    (root / 'class' / 'hidraw').mkdir(parents=True)
+    ids = [(d['VId'], d['PId']) for d in supportedDevices] + [(0x046D, 0xC069)]
+    for n in range(0, nodes):
+        vendorId, productId = ids[n % len(ids)]
+        port = f'{1 + n // 100}-{1 + (n // 10) % 10}.{1 + n % 10}'
+        usbPath = root / 'devices' / 'pci0000:00' / '0000:00:14.0' / f'usb{1 + n // 100}' / port.partition('.')[0] / port
+        hidPath = usbPath / f'{port}:1.0' / f'0003:{vendorId:04X}:{productId:04X}.{n:04X}'
+        (hidPath / 'hidraw' / f'hidraw{n}').mkdir(parents=True)
+        (hidPath / 'uevent').write_text(f'DRIVER=hid-generic\nHID_ID=0003:{vendorId:08X}:{productId:08X}\n')
+        (usbPath / 'idVendor').write_text(f'{vendorId:04x}\n')
+        (usbPath / 'idProduct').write_text(f'{productId:04x}\n')
+        (hidPath / 'hidraw' / f'hidraw{n}' / 'device').symlink_to(hidPath)
+        (root / 'class' / 'hidraw' / f'hidraw{n}').symlink_to(hidPath / 'hidraw' / f'hidraw{n}')
+    return root / 'class' / 'hidraw'
+
+def walk(classPath):
+    # Former enumeration: walk the parents of each node and search the supported devices list
+    devices = []
+    for hidSysPath in classPath.iterdir():
+        for p in hidSysPath.resolve().parents:
+            if (p / 'idVendor').is_file() and (p / 'idProduct').is_file():
+                with open(p / 'idVendor', 'rt') as f:
+                    vendorId = int(f.read().strip(), 16)
+                with open(p / 'idProduct', 'rt') as f:
+                    productId = int(f.read().strip(), 16)
+                break
+        else:
+            continue
+        for d in supportedDevices:
+            if (d['VId'] == vendorId) and (d['PId'] == productId):
+                devices.append(hidSysPath.name)
+                break
+    return devices
+
+def run(nodes=500):
+    with tempfile.TemporaryDirectory() as root:
+        classPath = makeTree(root, nodes)
+        tWalk = measure(lambda: walk(classPath))
+        tScan = measure(lambda: list(Device.scan(classPath)))
+        assert len(walk(classPath)) == len(list(Device.scan(classPath)))
+
+    print(f"Device enumeration ({nodes} hidraw nodes):")
+    print(f"  - parent directory walk: {1e3*tWalk:8.2f}ms")
+    print(f"  - uevent scan:           {1e3*tScan:8.2f}ms ({tWalk/tScan:.1f}x)")
+    return {'enumeration.walk': tWalk, 'enumeration.scan': tScan}
@@ -0,0 +1,84 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from argparse import Namespace
+from contextlib import redirect_stdout
+from datetime import datetime
+from datetime import timedelta
+
+import itertools
+import os
+import tempfile
+import warnings
+
+from ..src.cache import cachePath
+from ..src.commands import Command
+from ..src.configcache import ConfigCache
+from ..src.parameters import Parameters
+from ..src.simulator import Simulator
+from . import measure
+
+def execute(dev, *cmds):
+    Command(Namespace(dev=dev, compat=False, since=None, until=None, cmds=list(cmds))).execute()
+
+def run(records=1000, latency=0):
+    t = datetime(2024, 1, 31, 8, 0, 0)
+    sim = Simulator(records=[Simulator.record(t + timedelta(minutes=r)) for r in range(0, records)], latency=latency)
+    dev = sim.loopback()
+
+    # The written values alternate, so that each run writes the same modified data
+    writes = itertools.cycle([
+        ('parameter', 'set', 'travel-number', 'BENCH', 'start-delay', '10'),
+        ('parameter', 'set', 'travel-number', 'bench', 'start-delay', '20'),
+    ])
+    names = tuple([p.name for p in Parameters()])
+
+    def cold():
+        # The configuration cache is cleared, so that the whole configuration is read
+        cachePath(ConfigCache.CacheName).unlink(missing_ok=True)
+        return ('parameter', 'get') + names
+
+    cases = {
+        'config-read':        cold,
+        'config-read-cached': lambda: ('parameter', 'get') + names,
+        'config-write':       lambda: next(writes),
+        'download':           lambda: ('record', 'get'),
+    }
+
+    results = {}
+    frames = {}
+    env = os.environ.get('ELITECH_CACHE_DIR')
+    with tempfile.TemporaryDirectory() as cacheDir, open(os.devnull, 'w') as null, redirect_stdout(null), warnings.catch_warnings():
+        # The record page size probe results are cached apart from the user cache
+        os.environ['ELITECH_CACHE_DIR'] = cacheDir
+        warnings.simplefilter('ignore')
+        try:
+            for name, cmds in cases.items():
+                execute(dev, *cmds())
+                n = len(sim.requests)
+                results[name] = measure(lambda: execute(dev, *cmds()), number=1, repeat=3)
+                frames[name] = (len(sim.requests) - n) // 3
+        finally:
+            if env is None:
+                del os.environ['ELITECH_CACHE_DIR']
+            else:
+                os.environ['ELITECH_CACHE_DIR'] = env
+
+    print(f"End-to-end commands ({records} records, {1e3*latency:.1f}ms latency per frame):")
+    for name, t in results.items():
+        print(f"  - {name + ':':21s} {1e3*t:10.2f}ms ({frames[name]} frames)")
+    return {f'macro.{name}': t for name, t in results.items()}
@@ -0,0 +1,83 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from datetime import datetime
+
+import copy
+import random
+
+from ..src.frames import Frame
+from ..src.frames import Response
+from ..src.parameters import Parameters
+from ..src.parameters import Range
+from ..src.parameters import codec
+from ..src.record import Record
+from ..src.simulator import Simulator
+from . import measure
+
+def run(pages=256):
+    sim = Simulator(records=[Simulator.record(datetime(2024, 1, 31, 8, r, 0)) for r in range(0, 30)])
+    report = sim.reportSize
+    configFrame = Frame(Frame.Operation.GetParameter, 0x20, 48)
+    configAnswer = sim.answer(bytes(configFrame) + bytes(report - len(bytes(configFrame))))
+    recordFrame = Frame(Frame.Operation.GetRecord, 0, 6)
+    recordAnswer = sim.answer(bytes(recordFrame) + bytes(report - len(bytes(recordFrame))))
+    record = sim.records[0]
+
+    # Adjacent pages, received in random order
+    ranges = [Range(48*p, 48) for p in range(0, pages)]
+    random.Random(0).shuffle(ranges)
+    data = bytes(48)
+
+    params = [copy.copy(p) for p in Parameters()]
+    sim.set('device-state', 'MAX')
+    image = bytes(sim.image)
+    for p in params:
+        p.parseData(image[p.offset:(p.offset + p.len)])
+    writable = [p for p in params if p.writable]
+    values = {p.name: p.value for p in writable}
+
+    # Per-parameter path, as used by commands before the codec
+    def change():
+        data = bytearray(image)
+        for p in writable:
+            c = copy.copy(p)
+            c.value = values[p.name]
+            data[p.offset:(p.offset + p.len)] = bytes(c | data[p.offset:(p.offset + p.len)])
+        return bytes(data)
+
+    results = {
+        'frame.bytes':        measure(lambda: bytes(configFrame)),
+        'frame.parse.config': measure(lambda: configFrame.parse(configAnswer)),
+        'frame.parse.record': measure(lambda: recordFrame.parse(recordAnswer)),
+        'response.merge':     measure(lambda: Response.merge([Response(r, data) for r in ranges])),
+        'range.optimize':     measure(lambda: Range.optimize([p.range for p in params])),
+        'record.parse':       measure(lambda: Record.parse(record)),
+        'parameters.decode':  measure(lambda: [p.parseData(image[p.offset:(p.offset + p.len)]) for p in params]),
+        'parameters.encode':  measure(lambda: [bytes(p | image[p.offset:(p.offset + p.len)]) for p in writable]),
+        'parameters.values':  measure(lambda: {p.name: p.parseData(image[p.offset:(p.offset + p.len)]).value for p in params}),
+        'parameters.change':  measure(change),
+        'codec.decode':       measure(lambda: codec.decode(image)),
+        'codec.encode':       measure(lambda: codec.encode(image, values)),
+    }
+
+    print("Micro benchmarks:")
+    for name, t in results.items():
+        print(f"  - {name + ':':21s} {1e6*t:10.2f}µs")
+    print(f"    (response.merge merges {pages} pages, parameters decode {len(params)} and encode {len(writable)} parameters)")
+    print(f"    (codec.decode is {results['parameters.values'] / results['codec.decode']:.1f}x the per-parameter path, codec.encode {results['parameters.change'] / results['codec.encode']:.1f}x)")
+    return {f'micro.{name}': t for name, t in results.items()}
@@ -0,0 +1,45 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from ..src.frames import Frame
+from ..src.parameters import Range
+from ..src.parameters import parameters
+from . import measure
+
+def run():
+    cases = {
+        'all parameters': [p.range for p in parameters],
+        'writable parameters': [p.range for p in parameters if p.writable],
+        'each parameter': None,
+    }
+
+    results = {}
+    print("Read planner (full parameter table):")
+    for name, ranges in cases.items():
+        if ranges is None:
+            rangeLists = [[p.range] for p in parameters]
+        else:
+            rangeLists = [ranges]
+
+        optimized = sum([len(Range.optimize(r)) for r in rangeLists])
+        planned = sum([len(Range.plan(r, Frame.MaxLength)) for r in rangeLists])
+        tOptimize = measure(lambda: [Range.optimize(r) for r in rangeLists], 100)
+        tPlan = measure(lambda: [Range.plan(r, Frame.MaxLength) for r in rangeLists], 100)
+        print(f"  - {name + ':':21s} {optimized:3d} -> {planned:3d} frames (optimize {1e6*tOptimize:8.2f}µs, plan {1e6*tPlan:8.2f}µs)")
+        results[f"planner.{name.replace(' ', '-')}.optimize"] = tOptimize
+        results[f"planner.{name.replace(' ', '-')}.plan"] = tPlan
+    return results
@@ -0,0 +1,54 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from contextlib import redirect_stdout
+
+import os
+
+from ..src.device import Device
+from ..src.frames import Frame
+from . import measure
+
+class NullDevice(Device):
+    outReportSize = 64
+    inReportSize = 64
+
+def run(frames=1000):
+    dev = NullDevice('/dev/zero')
+    request = bytes(Frame(Frame.Operation.GetRecord, 0, 6))
+
+    def reopen():
+        for _ in range(frames):
+            with dev:
+                dev.write(request)
+                dev.read()
+
+    def session():
+        with dev:
+            for _ in range(frames):
+                dev.write(request)
+                dev.read()
+
+    with open(os.devnull, 'w') as null, redirect_stdout(null):
+        tReopen = measure(reopen) / frames
+        tSession = measure(session) / frames
+
+    print(f"Device session ({frames} frames):")
+    print(f"  - open/close per frame: {1e6*tReopen:8.2f}µs/frame")
+    print(f"  - persistent session:   {1e6*tSession:8.2f}µs/frame")
+    print(f"  - reduction:            {1e6*(tReopen - tSession):8.2f}µs/frame ({100*(1 - tSession/tReopen):.0f}%)")
+    return {'session.reopen': tReopen, 'session.persistent': tSession}
@@ -0,0 +1,57 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+
+import subprocess
+import sys
+
+# Modules which must not be imported to start the command line tool
+Heavy = ['numpy', 'hid_parser', 'asyncio', 'importlib.metadata', 'elitech.src.parameters', 'elitech.src.frames', 'elitech.src.record']
+# Import time budget for the command line tool modules (in seconds)
+Budget = 0.150
+
+def importTimes(module='elitech.src.main'):
+    # Import the module in a fresh interpreter and parse -X importtime report:
+    #     import time: self [us] | cumulative | imported package
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=Path(__file__).parents[2], capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue # Header line
+        times[fields[2].strip()] = (1e-6 * own, 1e-6 * cumulative)
+    return times
+
+def run(module='elitech.src.main', top=10, repeat=5):
+    # Best of a few runs: a new interpreter is started for each of them
+    times = min([importTimes(module) for _ in range(0, repeat)], key=lambda t: t[module][1])
+    total = times[module][1]
+
+    print(f"Command line startup ({module}):")
+    print(f"  - total import time:     {1e3*total:8.2f}ms (budget {1e3*Budget:.0f}ms)")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda t: t[1][0], reverse=True)[:top]:
+        print(f"  - {name:<24} {1e3*own:8.2f}ms")
+    for name in Heavy:
+        if name in times:
+            print(f"  - WARNING: {name} is imported at startup")
+    return {'startup.import': total}
@@ -0,0 +1,142 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+
+import mmap
+import os
+import struct
+
+from .parameters import DateTimeParameter
+from .record import Record
+
+class Archive:
+    Magic = b'ELTA'
+    Version = 1
+    # Magic, version, protocol-version, model, serial-number, start-time, interval (padded to 64 bytes)
+    Header = struct.Struct('<4sBBH12s7sxI32x')
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.__file = open(self.path, 'rb')
+        self.__map = None
+        self.__view = None
+        self.__size = 0
+
+        header = self.__file.read(Archive.Header.size)
+        if (len(header) != Archive.Header.size):
+            self.__file.close()
+            raise ValueError(f"Invalid archive header length: {len(header)}")
+        magic, version, self.protocol, self.model, serial, self.__startTime, self.interval = Archive.Header.unpack(header)
+        if (magic != Archive.Magic):
+            self.__file.close()
+            raise ValueError(f"Invalid archive magic: {magic}")
+        if (version != Archive.Version):
+            self.__file.close()
+            raise ValueError(f"Unsupported archive version: {version}")
+        self.serial = serial.decode().replace('\x00', '')
+
+    @classmethod
+    def create(cls, path, serial, model, protocol, startTime, interval, data=bytes()):
+        path = Path(path)
+        if (len(data) % Record.Length != 0):
+            raise ValueError(f"Invalid records length: {len(data)}")
+        header = cls.Header.pack(cls.Magic, cls.Version, protocol, model, serial.encode()[:12], bytes(startTime), interval)
+
+        tmpPath = path.with_name(path.name + '.tmp')
+        with open(tmpPath, 'wb') as f:
+            f.write(header)
+            f.write(data)
+        os.replace(tmpPath, path)
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def close(self):
+        self.__view = None
+        if self.__map is not None:
+            try:
+                self.__map.close()
+            except BufferError:
+                # Views returned by raw() are still in use
+                pass
+            self.__map = None
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    @property
+    def startTime(self):
+        try:
+            return DateTimeParameter('start-time', '', 0, False, False).parseData(self.__startTime).value
+        except ValueError:
+            return None
+
+    @property
+    def rawStartTime(self):
+        return self.__startTime
+
+    def __len__(self):
+        return (os.fstat(self.__file.fileno()).st_size - Archive.Header.size) // Record.Length
+
+    def append(self, data):
+        if (len(data) % Record.Length != 0):
+            raise ValueError(f"Invalid records length: {len(data)}")
+        with open(self.path, 'r+b') as f:
+            # Drop any partially written record
+            f.truncate(Archive.Header.size + Record.Length * len(self))
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+
+    def raw(self, index, stop=None):
+        n = len(self)
+        if (index < 0):
+            index += n
+        if stop is None:
+            stop = index + 1
+        if (index < 0) or (stop > n) or (index > stop):
+            raise IndexError(f"Record index out of range: {index}")
+        view = self.__records(n)
+        return view[(Record.Length * index):(Record.Length * stop)]
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            start, stop, step = index.indices(len(self))
+            return [Record.parse(self.raw(r), self.protocol) for r in range(start, stop, step)]
+        return Record.parse(self.raw(index), self.protocol)
+
+    def batch(self, start=0, stop=None):
+        if stop is None:
+            stop = len(self)
+        return Record.parseBatch(self.raw(start, stop), self.protocol)
+
+    def __records(self, n):
+        size = Archive.Header.size + Record.Length * n
+        if (self.__map is None) or (self.__size < size):
+            # Views returned previously keep the former mapping alive
+            self.__map = mmap.mmap(self.__file.fileno(), size, access=mmap.ACCESS_READ)
+            self.__view = memoryview(self.__map)[Archive.Header.size:]
+            self.__size = size
+        return self.__view
+
+    def __repr__(self): #pragma: no cover
+        return f"Archive('{self.path}')"
@@ -0,0 +1,231 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+from pathlib import Path
+
+import asyncio
+import copy
+import os
+
+from .configcache import ConfigCache
+from .device import Device
+from .frames import Frame
+from .image import ConfigImage
+from .image import MemoryImage
+from .pager import RecordPager
+from .parameters import Parameters
+from .parameters import Range
+from .parameters import codec
+
+class AsyncDevice:
+    Timeout = 2.0
+
+    def __init__(self, dev, timeout=None):
+        if isinstance(dev, (str, Path)):
+            dev = Device(dev)
+        self.__dev = dev
+        self.__fd = None
+        self.__lock = None
+        # Serial number of the device, identifying its configuration cache entry
+        self.__serial = None
+        self.timeout = AsyncDevice.Timeout if timeout is None else timeout
+
+    @property
+    def path(self):
+        return self.__dev.path
+
+    @property
+    def isOpen(self):
+        return self.__fd is not None
+
+    async def __aenter__(self):
+        return self.open()
+
+    async def __aexit__(self, *args):
+        self.close()
+        return False
+
+    def open(self):
+        if self.__fd is None:
+            self.__fd = os.open(self.__dev.path, os.O_RDWR | os.O_NONBLOCK)
+            self.__lock = asyncio.Lock()
+        return self
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+        # Another logger may be plugged at the same path
+        self.__serial = None
+
+    async def write(self, frame, timeout=None):
+        request = frame + bytes([0] * (self.__dev.outReportSize - len(frame)))
+        deadline = self.__deadline(timeout)
+        while True:
+            try:
+                os.write(self.__fd, request)
+                return
+            except BlockingIOError:
+                await self.__wait(asyncio.get_running_loop().add_writer, asyncio.get_running_loop().remove_writer, deadline)
+
+    async def read(self, timeout=None):
+        deadline = self.__deadline(timeout)
+        while True:
+            try:
+                return os.read(self.__fd, self.__dev.inReportSize)
+            except BlockingIOError:
+                await self.__wait(asyncio.get_running_loop().add_reader, asyncio.get_running_loop().remove_reader, deadline)
+
+    async def request(self, frame, timeout=None):
+        async with self.__lock:
+            # Drop reports answering timed out requests
+            self.__flush()
+            await self.write(bytes(frame), timeout)
+            return frame.parse(await self.read(timeout))
+
+    async def getParameters(self, *names, timeout=None):
+        parameters = Parameters()
+        params = [copy.copy(parameters[n]) for n in names] if names else [copy.copy(p) for p in parameters]
+
+        image = MemoryImage(*await self.__getRanges(Range.plan([p.range for p in params], Frame.MaxLength), timeout))
+        values = {}
+        for p in params:
+            if p.range in image:
+                try:
+                    values[p.name] = p.parseData(image[p.range]).value
+                except ValueError:
+                    warning(f"Invalid value for parameter: {p.name}")
+                    values[p.name] = None
+        if values.get('serial-number'):
+            self.__serial = values['serial-number']
+        return values
+
+    async def getRecords(self, records=slice(None), since=None, until=None, protocol=0x20, timeout=None):
+        # Page size probing uses blocking I/O, so the safe page size is used (if the reports are large enough)
+        pager = RecordPager(self.__dev, min(RecordPager.DefaultPageSize, RecordPager.maxPageSize(self.__dev.inReportSize)))
+        start = records.start or 0
+        step = records.step or 1
+        stop = records.stop
+        if stop is None:
+            try:
+                capacity, number = RecordPager.parseCounters(await self.request(RecordPager.countersFrame(), timeout))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+                capacity, number = None, None
+            if (capacity is not None) and (number is not None) and (number <= capacity):
+                stop = number
+            else:
+                # Records are read up to the first empty one
+                stop = capacity or 0x10000
+
+        result = []
+        for frame in pager.frames(start, stop, step):
+            try:
+                a = await self.request(frame, timeout)
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+                continue
+            for r, record in RecordPager.decode(a, step, protocol):
+                if (record is None) and (records.stop is None):
+                    return result
+                if (record is None) or RecordPager.selected(record.time, since, until):
+                    result.append((r, record))
+        return result
+
+    async def setParameters(self, values, timeout=None):
+        parameters = Parameters()
+        params = []
+        for name, v in values.items():
+            p = copy.copy(parameters[name])
+            if not p.writable:
+                raise ValueError(f"Read-only parameter: {p.name}")
+            try:
+                p.parseValue(v)
+            except ValueError:
+                p._value = None
+            if p.value is None:
+                raise ValueError(f"Invalid value for parameter: {p.name}")
+            params.append(p)
+
+        # Read old values for parameters (and the serial number, when it is not known yet)
+        serialNumber = parameters['serial-number']
+        ranges = Range.plan([p.range for p in params] + ([serialNumber.range] if (self.__serial is None) else []), Frame.MaxLength)
+        image = ConfigImage(*await self.__getRanges(ranges, timeout))
+        if (self.__serial is None):
+            self.__serial = ConfigCache.serialOf(image)
+        # Set new parameter values in the image
+        for p in params:
+            if p.range in image:
+                image[p.range] = codec.encode(image[p.range], {p.name: p.value}, p.offset)
+        # Zero non writable parameters
+        for p in parameters:
+            if not p.writable and p.immutable and (p.range in image):
+                image.fill(p.range, codec.encode(image[p.range], {p.name: None}, p.offset))
+        configurationTime = parameters['configuration-time']
+        if any([p.name == configurationTime.name for p in params]):
+            image.touch(configurationTime.range)
+        # Write parameters (only the modified data)
+        written = True
+        planned = image.plan(Frame.MaxLength, [configurationTime.range, serialNumber.range])
+        for r in planned:
+            try:
+                result = await self.request(Frame(Frame.Operation.SetParameter, r.start, image[r]), timeout)
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+                result = False
+            if result:
+                image.clean(r)
+            else:
+                names = ', '.join([p.name for p in params if p.range in r])
+                warning(f"Could not write parameter(s): {names}")
+                written = False
+        if planned and (self.__serial is not None):
+            ConfigCache.forget(self.__serial)
+        return written
+
+    async def __getRanges(self, ranges, timeout):
+        answers = []
+        for r in ranges:
+            try:
+                answers.append(await self.request(Frame(Frame.Operation.GetParameter, r.start, r.len), timeout))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+        return answers
+
+    def __deadline(self, timeout):
+        return asyncio.get_running_loop().time() + (self.timeout if timeout is None else timeout)
+
+    async def __wait(self, add, remove, deadline):
+        future = asyncio.get_running_loop().create_future()
+        add(self.__fd, lambda: future.done() or future.set_result(None))
+        try:
+            await asyncio.wait_for(future, max(0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Device \"{self.path}\" did not answer in time")
+        finally:
+            remove(self.__fd)
+
+    def __flush(self):
+        try:
+            while os.read(self.__fd, self.__dev.inReportSize):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __repr__(self): #pragma: no cover
+        return f"AsyncDevice('{self.path}')"
@@ -0,0 +1,127 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+
+import copy
+import threading
+import time
+
+from .frames import Frame
+from .frames import Response
+from .image import MemoryImage
+from .parameters import Parameters
+from .parameters import Range
+
+class Flight:
+    def __init__(self):
+        self.requests = []
+        self.ranges = []
+        self.image = MemoryImage()
+        self.error = None
+        self.done = threading.Event()
+
+    def covers(self, ranges):
+        return all([any([r in p for p in self.ranges]) for r in ranges])
+
+    def response(self, r):
+        if self.error is not None:
+            raise self.error
+        if r not in self.image:
+            raise ValueError(f"No answer for range {r}")
+        return Response(r, self.image[r])
+
+    def __repr__(self): #pragma: no cover
+        return f"Flight({self.ranges})"
+
+
+class RequestBroker:
+    # Time during which the concurrent requests are gathered (in seconds)
+    Window = 0.005
+
+    def __init__(self, dev, window=None):
+        self.__dev = dev
+        self.__window = RequestBroker.Window if window is None else window
+        self.__lock = threading.Lock()
+        self.__io = threading.Lock()
+        self.__pending = None
+        self.__inflight = None
+        self.requests = 0
+        self.frames = 0
+
+    def get(self, *ranges, strict=True):
+        # The requests are gathered into a flight, which reads all their ranges at once.
+        # A request whose ranges are being read joins the flight in progress.
+        leader = False
+        with self.__lock:
+            self.requests += 1
+            if (self.__inflight is not None) and self.__inflight.covers(ranges):
+                flight = self.__inflight
+            else:
+                if self.__pending is None:
+                    self.__pending = Flight()
+                    leader = True
+                flight = self.__pending
+                flight.requests += ranges
+
+        if leader:
+            self.__fly(flight)
+        flight.done.wait()
+        # Unless strict, the ranges without answer are skipped (as the direct reads do)
+        if not strict:
+            ranges = [r for r in ranges if (flight.error is not None) or (r in flight.image)]
+        return [flight.response(r) for r in ranges]
+
+    def getParameters(self, *names):
+        parameters = Parameters()
+        params = [copy.copy(parameters[n]) for n in names]
+
+        values = {}
+        for p, a in zip(params, self.get(*[p.range for p in params])):
+            values[p.name] = p.parseData(a.data).value
+        return values
+
+    def __fly(self, flight):
+        time.sleep(self.__window)
+        with self.__io:
+            # The window closes when the device is available: the next requests go to a new flight
+            with self.__lock:
+                self.__pending = None
+                flight.ranges = Range.plan(flight.requests, Frame.MaxLength)
+                self.__inflight = flight
+
+            try:
+                answers = []
+                with self.__dev:
+                    for r in flight.ranges:
+                        frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+                        self.__dev.write(bytes(frame))
+                        self.frames += 1
+                        try:
+                            answers.append(frame.parse(self.__dev.read()))
+                        except ValueError as e:
+                            warning(f"Got invalid response ({str(e)})")
+                flight.image = MemoryImage(*answers)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self.__lock:
+                    self.__inflight = None
+                flight.done.set()
+
+    def __repr__(self): #pragma: no cover
+        return f"RequestBroker({self.__dev})"
@@ -0,0 +1,55 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+
+import json
+import os
+import tempfile
+
+def cachePath(*parts):
+    if os.environ.get('ELITECH_CACHE_DIR'):
+        base = Path(os.environ['ELITECH_CACHE_DIR'])
+    elif os.environ.get('XDG_CACHE_HOME'):
+        base = Path(os.environ['XDG_CACHE_HOME']) / 'elitech'
+    else:
+        base = Path.home() / '.cache' / 'elitech'
+    return base.joinpath(*parts)
+
+def loadJson(name, default=None):
+    try:
+        with open(cachePath(name), 'rt') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def storeJson(name, data):
+    path = cachePath(name)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    except OSError:
+        return False
+
+    try:
+        with os.fdopen(fd, 'wt') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(tmpPath, path)
+    except OSError:
+        os.unlink(tmpPath)
+        return False
+    return True
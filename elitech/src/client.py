@@ -0,0 +1,97 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+
+import json
+import os
+import socket
+import sys
+
+def socketPath():
+    if os.environ.get('ELITECH_SOCKET'):
+        return Path(os.environ['ELITECH_SOCKET'])
+    elif os.environ.get('XDG_RUNTIME_DIR'):
+        return Path(os.environ['XDG_RUNTIME_DIR']) / 'elitech.sock'
+    else:
+        return Path('/tmp') / f'elitech-{os.getuid()}.sock'
+
+class Client:
+    # Messages are JSON objects, one per line:
+    #   - the client sends {"args": {...}} with the command line arguments,
+    #   - the daemon answers with {"out": "..."} and {"err": "..."} messages,
+    #     and then either {"exit": 0} or {"error": "...", "type": "..."}.
+
+    def __init__(self, sock):
+        self.__sock = sock
+        self.__file = sock.makefile('rwb')
+
+    @staticmethod
+    def connect(path=None):
+        path = socketPath() if path is None else Path(path)
+        if not path.exists():
+            return None
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            # Stale socket: the daemon is not running anymore
+            sock.close()
+            return None
+        return Client(sock)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def close(self):
+        if self.__sock is not None:
+            self.__file.close()
+            self.__sock.close()
+            self.__sock = None
+
+    def execute(self, args, out=None, err=None):
+        out = sys.stdout if out is None else out
+        err = sys.stderr if err is None else err
+
+        args = dict(vars(args))
+        if args.get('dev'):
+            # The daemon does not run in the working directory of the client
+            args['dev'] = os.path.abspath(args['dev'])
+        self.__file.write(json.dumps({'args': args}).encode() + b'\n')
+        self.__file.flush()
+
+        for line in self.__file:
+            message = json.loads(line)
+            if 'out' in message:
+                out.write(message['out'])
+            elif 'err' in message:
+                err.write(message['err'])
+            elif 'exit' in message:
+                out.flush()
+                return message['exit']
+            elif 'error' in message:
+                out.flush()
+                raise ValueError(message['error'])
+        raise ValueError("Connection to the daemon closed unexpectedly")
+
+    def __repr__(self): #pragma: no cover
+        return f"Client({self.__sock})"
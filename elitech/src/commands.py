@@ -16,14 +16,13 @@
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
 from .device import Device
-from .parameters import Parameters
-from .parameters import Range
-from .frames import Frame
-from .frames import Response
-from .record import Record
+from .scheduler import Priority
 
+from datetime import datetime
+from pathlib import Path
 from warnings import warn as warning
 
+import copy
 import sys
 import textwrap
 
@@ -41,6 +40,15 @@ class MetaCommand(type):
         assert len(args) == 1
         args = args[0]
 
+        subClass, params = cls.lookup(args.cmds)
+        if subClass is not None:
+            delattr(args, 'cmds')
+            return subClass.__call__(args, *params)
+            #return cls.__create(subClass, args, len(subClassCmd))
+
+        return super().__call__(args)
+
+    def lookup(cls, cmds):
         for subClass in cls.__subclasses__():
             try:
                 subClassCmd = subClass.cmdName
@@ -48,13 +56,9 @@ class MetaCommand(type):
                 continue
             if type(subClassCmd) is str:
                 subClassCmd = (subClassCmd,)
-            if all([cmd == subCmd for cmd, subCmd in zip(args.cmds, subClassCmd)]):
-                params = args.cmds[len(subClassCmd):]
-                delattr(args, 'cmds')
-                return subClass.__call__(args, *params)
-                #return cls.__create(subClass, args, len(subClassCmd))
-
-        return super().__call__(args)
+            if all([cmd == subCmd for cmd, subCmd in zip(cmds, subClassCmd)]):
+                return subClass, cmds[len(subClassCmd):]
+        return None, cmds
 
     # def __create(cls, subClass, args, skip):
     #     try:
@@ -74,14 +78,34 @@ class MetaCommand(type):
     #         return subClass.__call__(*params)
 
 class Command(metaclass=MetaCommand):
+    # Whether the command is run by the daemon when it is running
+    remote = True
+    # Priority of the device frames of the command, when it is run by the daemon
+    priority = Priority.Interactive
+    # Whether the concurrent reads of the command are merged by the daemon
+    brokered = False
+
     def __init__(self, args):
         raise UnknownCommandError(args.cmds)
 
+    @staticmethod
+    def device(args):
+        # The daemon gives its device sessions instead of device paths
+        if (args.dev is None) or isinstance(args.dev, (str, Path)):
+            return Device(args.dev)
+        return args.dev
+
+    @staticmethod
+    def broker(args):
+        # The daemon gives the request broker of the device session to brokered commands
+        return getattr(args, 'broker', None)
+
 class Help(Command):
     '''Give help on command 'command'.'''
 
     cmdName = 'help'
     cmdArgs = 'command'
+    remote = False
 
     def __init__(self, args, *params):
         self.__params = params
@@ -159,12 +183,45 @@ class DeviceList(Command):
         return 'DeviceListCommand'
 
 
+class DeviceMetrics(Command):
+    '''
+        Print the frame scheduling metrics of a device served by the daemon
+
+        The daemon exchanges the interactive frames (parameters and addresses)
+        before the bulk frames (records, stop and format). For each priority class,
+        prints the number of exchanged frames, the current and maximum queue depths,
+        and the mean and maximum waiting times and latencies.
+    '''
+
+    cmdName = ('device', 'metrics')
+
+    def __init__(self, args, *params):
+        self.__dev = Command.device(args)
+        if (len(params) > 0):
+            params = '", "'.join(params)
+            warning(f"Ignored parameters: \"{params}\"")
+
+    def execute(self):
+        scheduler = getattr(self.__dev, 'scheduler', None)
+        if scheduler is None:
+            warning(f"Frame scheduling metrics are only available from the daemon")
+            return
+
+        for priority, m in scheduler.metrics.items():
+            print(f'{priority.name}: {m.frames} frames, depth {m.depth} (max {m.maxDepth}), '
+                  f'wait {1e3*m.meanWait:.1f}ms (max {1e3*m.maxWait:.1f}ms), latency {1e3*m.meanLatency:.1f}ms (max {1e3*m.maxLatency:.1f}ms)')
+
+    def __repr__(self):
+        return f'DeviceMetricsCommand({self.__dev})'
+
+
 class ParameterList(Command):
     '''
         List available parameters and their meanings
     '''
 
     cmdName = ('parameter', 'list')
+    remote = False
 
     def __init__(self, args, *params):
         if (len(params) > 0):
@@ -172,6 +229,8 @@ class ParameterList(Command):
             warning(f"Ignored parameters: \"{params}\"")
 
     def execute(self):
+        from .parameters import Parameters
+
         print('Available parameters:')
         for param in Parameters():
             print(f'  - {param.name}: {param.description}')
@@ -184,19 +243,27 @@ class ConfigRead(Command):
     '''
         Read configuration parameters from an Elitech device
 
-        The implementation will send the minimum number of commands to get the parameters
+        The implementation will send the minimum number of commands to get the parameters.
+        The configuration is cached and validated with the configuration time, so that
+        only the volatile parameters (device-time, battery-level, ...) are read again
+        when the configuration was not modified.
     '''
 
     cmdName = ('parameter', 'get')
     cmdArgs = 'parameter ...'
+    brokered = True
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        from .parameters import Parameters
+
+        self.__dev = Command.device(args)
+        self.__broker = Command.broker(args)
+        # The parameters are copied, as the commands of the daemon run in several threads
         self.__params = []
         parameters = Parameters()
         for p in params:
             try:
-                self.__params.append(parameters[p])
+                self.__params.append(copy.copy(parameters[p]))
             except KeyError:
                 warning(f"Ignoring unknown parameter: {p}")
 
@@ -204,27 +271,28 @@ class ConfigRead(Command):
             raise ValueError(f"All parameters have been ignored")
 
     def execute(self):
-        ranges = Range.optimize([p.range for p in self.__params])
-        print(ranges)
+        from .configcache import ConfigCache
+        from .parameters import codec
 
         if not self.__dev:
             warning(f"No device selected. Only there to check the request.")
 
-        answers = []
-        for r in ranges:
-            frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+        # The configuration is served from cache when it was not modified
+        cache = ConfigCache(self.__dev, self.__broker)
+        if self.__broker is not None:
+            image = cache.read([p.range for p in self.__params])
+        else:
             with self.__dev:
-                self.__dev.write(bytes(frame))
-                try:
-                    answers.append(frame.parse(self.__dev.read()))
-                except ValueError as e:
-                    warning(f"Got invalid response ({str(e)})")
-        answers = Response.merge(answers)
+                image = cache.read([p.range for p in self.__params])
+        print(cache.requested)
+        values = {}
+        for a in image.responses():
+            values.update(codec.decode(a.data, a.range.start, [p.name for p in self.__params]))
         for p in self.__params:
-            for a in answers:
-                if p.range in a.range:
-                    print(f'{p.name}: {p.parseData(a[p.range])}')
-                    break
+            if p.name in values:
+                if values[p.name] is not None:
+                    p.value = values[p.name]
+                print(f'{p.name}: {p}')
 
 
     def __repr__(self):
@@ -246,34 +314,43 @@ class AddressRead(Command):
 
     cmdName = ('address', 'get')
     cmdArgs = 'range ...'
+    brokered = True
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        from .parameters import Range
+
+        self.__dev = Command.device(args)
+        self.__broker = Command.broker(args)
         self.__ranges = [Range.fromString(p) for p in params]
 
     def execute(self):
-        ranges = Range.optimize(self.__ranges)
+        from .frames import Frame
+        from .image import MemoryImage
+        from .parameters import Range
+
+        ranges = Range.plan(self.__ranges, Frame.MaxLength)
         print(ranges)
 
         if not self.__dev:
             warning(f"No device selected. Only there to check the request.")
 
         answers = []
-        for r in ranges:
-            frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+        if self.__broker is not None:
+            answers = self.__broker.get(*ranges, strict=False)
+        else:
             with self.__dev:
-                self.__dev.write(bytes(frame))
-                try:
-                    answers.append(frame.parse(self.__dev.read()))
-                except ValueError as e:
-                    warning(f"Got invalid response ({str(e)})")
-        answers = Response.merge(answers)
+                for r in ranges:
+                    frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+                    self.__dev.write(bytes(frame))
+                    try:
+                        answers.append(frame.parse(self.__dev.read()))
+                    except ValueError as e:
+                        warning(f"Got invalid response ({str(e)})")
+        image = MemoryImage(*answers)
         for r in self.__ranges:
-            for a in answers:
-                if r in a.range:
-                    data = ' '.join([f'{b:02X}' for b in a[r]])
-                    print(f'{r}: {data}')
-                    break
+            if r in image:
+                data = ' '.join([f'{b:02X}' for b in image[r]])
+                print(f'{r}: {data}')
 
     def __repr__(self):
         return f'AddressReadCommand({self.__dev}, {self.__ranges})'
@@ -293,14 +370,19 @@ class ConfigWrite(Command):
     cmdArgs = 'parameter=value | parameter value ...'
 
     def __init__(self, args, *params):
+        from .frames import Frame
+        from .parameters import Parameters
+        from .parameters import Range
+
         # Arguments processing
-        self.__dev = Device(args.dev)
+        self.__dev = Command.device(args)
         self.__compat = args.compat
 
         # Parameters list processing
         if (len(params) == 0):
             raise ValueError(f"No parameters were given")
 
+        # The parameters are copied, as the commands of the daemon run in several threads
         self.__params = []
         parameters = Parameters()
         i = 0
@@ -317,7 +399,7 @@ class ConfigWrite(Command):
                 break
 
             try:
-                self.__params.append(parameters[p])
+                self.__params.append(copy.copy(parameters[p]))
             except KeyError:
                 warning(f"Ignoring unknown parameter: {p}")
                 break
@@ -349,65 +431,72 @@ class ConfigWrite(Command):
                 Range(0xFD, 0x2F),
             ]
 
+        # The serial number is read to invalidate the cached configuration of the device
         if any([all([p.range not in r for r in self.__ranges]) for p in self.__params]):
-            self.__ranges = Range.optimize([p.range for p in self.__params])
+            self.__ranges = Range.plan([p.range for p in self.__params] + [parameters['serial-number'].range], Frame.MaxLength)
         print(self.__ranges)
 
     def execute(self):
         if not self.__dev:
             warning(f"No device selected. Only there to check the request.")
 
+        with self.__dev:
+            self.__execute()
+
+    def __execute(self):
+        from .configcache import ConfigCache
+        from .frames import Frame
+        from .image import ConfigImage
+        from .parameters import Parameters
+        from .parameters import codec
+
         # Read old values for parameters
         answers = []
         for r in self.__ranges:
             frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
-            with self.__dev:
-                self.__dev.write(bytes(frame))
-                try:
-                    answers.append(frame.parse(self.__dev.read()))
-                except ValueError as e:
-                    warning(f"Got invalid response ({str(e)})")
-        # Set new parameter values in answers
-        answers = Response.merge(answers)
+            self.__dev.write(bytes(frame))
+            try:
+                answers.append(frame.parse(self.__dev.read()))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+        # Set new parameter values in the image
+        image = ConfigImage(*answers)
+        serial = ConfigCache.serialOf(image)
         for p in self.__params:
-            for a in answers:
-                if p.range in a.range:
-                    a[p.range] = bytes(p | a[p.range])
+            if p.range in image:
+                image[p.range] = codec.encode(image[p.range], {p.name: p.value}, p.offset)
         # Zero non writable parameters
         parameters = Parameters()
         for p in parameters:
-            for a in answers:
-                if not p.writable and p.immutable and (p.range in a.range):
-                    a[p.range] = bytes(p | a[p.range])
-        print(answers)
-        # Write parameters
-        for r1 in self.__ranges:
-            if self.__compat:
-                splitRanges = [r1]
-                p = parameters['configuration-time'].now()
-                for a in answers:
-                    if p.range in a.range:
-                        a[p.range] = bytes(p | a[p.range])
-            elif parameters['configuration-time'].range not in r1:
-                splitRanges = [r1]
-            elif parameters['configuration-time'] in self.__params:
-                splitRanges = [r1]
+            if not p.writable and p.immutable and (p.range in image):
+                image.fill(p.range, codec.encode(image[p.range], {p.name: None}, p.offset))
+        configurationTime = parameters['configuration-time']
+        if self.__compat:
+            if configurationTime.range in image:
+                image[configurationTime.range] = codec.encode(image[configurationTime.range], {configurationTime.name: datetime.now()}, configurationTime.offset)
+        elif any([p.name == configurationTime.name for p in self.__params]):
+            image.touch(configurationTime.range)
+        print(image.responses())
+        # Write parameters (only the modified data, unless in compatibility mode)
+        if self.__compat:
+            ranges = [r for r in self.__ranges if r in image]
+        else:
+            ranges = image.plan(Frame.MaxLength, [configurationTime.range, parameters['serial-number'].range])
+        for r in ranges:
+            frame = Frame(Frame.Operation.SetParameter, r.start, image[r])
+            self.__dev.write(bytes(frame))
+            try:
+                result = frame.parse(self.__dev.read())
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+                result = False
+            if result:
+                image.clean(r)
             else:
-                splitRanges = r1 - parameters['configuration-time'].range
-
-            for r2 in splitRanges:
-                for a in answers:
-                    if r2 in a.range:
-                        frame = Frame(Frame.Operation.SetParameter, r2.start, a[r2])
-                        with self.__dev:
-                            self.__dev.write(bytes(frame))
-                            try:
-                                result = frame.parse(self.__dev.read())
-                            except ValueError as e:
-                                warning(f"Got invalid response ({str(e)})")
-                            if not result:
-                                params = ', '.join([p.name for p in self.__params if p.range in r2])
-                                warning(f"Could not write parameter(s): {params}")
+                params = ', '.join([p.name for p in self.__params if p.range in r])
+                warning(f"Could not write parameter(s): {params}")
+        if ranges and (serial is not None):
+            ConfigCache.forget(serial)
 
     def __repr__(self):
         params = '", "'.join([p.name + '=' + str(p) for p in self.__params])
@@ -427,7 +516,9 @@ class AddressWrite(Command):
     cmdArgs = 'range data ...'
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        from .parameters import Range
+
+        self.__dev = Command.device(args)
         p = 0
         self.__ranges = []
         self.__data = []
@@ -441,40 +532,56 @@ class AddressWrite(Command):
             p = p + r.len
 
     def execute(self):
-        ranges = Range.optimize(self.__ranges)
+        from .frames import Frame
+        from .parameters import Parameters
+        from .parameters import Range
+
+        # The serial number is read to invalidate the cached configuration of the device
+        ranges = Range.plan(self.__ranges + [Parameters()['serial-number'].range], Frame.MaxLength)
         print(ranges)
 
         if not self.__dev:
             warning(f"No device selected. Only there to check the request.")
 
+        with self.__dev:
+            self.__execute(ranges)
+
+    def __execute(self, ranges):
+        from .configcache import ConfigCache
+        from .frames import Frame
+        from .image import ConfigImage
+        from .parameters import Parameters
+
         answers = []
         for r in ranges:
             frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
-            with self.__dev:
-                self.__dev.write(bytes(frame))
-                try:
-                    answers.append(frame.parse(self.__dev.read()))
-                except ValueError as e:
-                    warning(f"Got invalid response ({str(e)})")
-        answers = Response.merge(answers)
+            self.__dev.write(bytes(frame))
+            try:
+                answers.append(frame.parse(self.__dev.read()))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+        image = ConfigImage(*answers)
+        serial = ConfigCache.serialOf(image)
         for r, d in zip(self.__ranges, self.__data):
-            for a in answers:
-                if r in a.range:
-                    a[r] = d
-        print(answers)
+            if r in image:
+                image[r] = d
+        print(image.responses())
+        # Only the modified data is written (the serial number only when it was modified)
+        ranges = image.plan(Frame.MaxLength, [Parameters()['serial-number'].range])
         for r in ranges:
-            for a in answers:
-                if r in a.range:
-                    frame = Frame(Frame.Operation.SetParameter, r.start, a[r])
-                    with self.__dev:
-                        self.__dev.write(bytes(frame))
-                        try:
-                            result = frame.parse(self.__dev.read())
-                        except ValueError as e:
-                            warning(f"Got invalid response ({str(e)})")
-                        if not result:
-                            params = ', '.join([p.name for p in self.__params if p.range in r])
-                            warning(f"Could not write parameter(s): {params}")
+            frame = Frame(Frame.Operation.SetParameter, r.start, image[r])
+            self.__dev.write(bytes(frame))
+            try:
+                result = frame.parse(self.__dev.read())
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+                result = False
+            if result:
+                image.clean(r)
+            else:
+                warning(f"Could not write address range: {r}")
+        if ranges and (serial is not None):
+            ConfigCache.forget(serial)
 
     def __repr__(self):
         data = [[f'{b:02X}' for b in d] for d in self.__data]
@@ -499,13 +606,19 @@ class AddressWrite(Command):
 class RecordRead(Command):
     '''
         Read and interpret records from an Elitech device
+
+        The --since and --until options restrict the records to a time span.
+        The span is located by binary search, so only the needed records are downloaded.
     '''
 
     cmdName = ('record', 'get')
     cmdArgs = '[firstRecord:recordStep:lastRecord]'
+    priority = Priority.Bulk
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        self.__dev = Command.device(args)
+        self.__since = RecordRead.timeFromString(getattr(args, 'since', None))
+        self.__until = RecordRead.timeFromString(getattr(args, 'until', None))
         if (len(params) == 0):
             self.__range = slice(None, None, 1)
         elif (len(params) == 1):
@@ -515,60 +628,42 @@ class RecordRead(Command):
             warning(f"Ignored parameters: \"{params}\"")
 
     def execute(self):
+        from .pipeline import RecordPipeline
+
         if not self.__dev:
             warning(f"No device selected. Only there to check the request.")
 
-        answers = []
-        r = self.__range.start or 0
-        s = self.__range.step or 1
-        while (self.__range.stop is None) or (r < self.__range.stop):
-            n = 51 // Record.Length
-            if (self.__range.stop is not None) and (r + n > self.__range.stop):
-                n = self.__range.stop - r
-            l = ((n + s - 1) // s) * s + 1 - s
-            print((r, l, n))
-
-            frame = Frame(Frame.Operation.GetRecord, r, l)
-            with self.__dev:
-                self.__dev.write(bytes(frame))
-                try:
-                    answers.append(frame.parse(self.__dev.read()))
-                except ValueError as e:
-                    warning(f"Got invalid response ({str(e)})")
-            if (self.__range.stop is None) and (len(answers) != 0) and all([b == 0xFF for b in answers[-1][(8*r):(8*(r + n))]]):
-                del(answers[-1])
-                break
-            r += ((n + s - 1) // s) * s
-
-        r0 = self.__range.start or 0
-        s = self.__range.step or 1
-        for a in answers:
-            r = r0
-            while (8*(r - r0) < a.range.len):
-                record = Record.parse(a[(8*r):(8*(r + 1))])
-
-                if record is None:
-                    if self.__range.stop is None:
-                        break
-                    print(f"{r + 1:-4d}\t---------- --------\t---\tNo data")
-                elif record.pause:
-                    print(f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tPause")
-                elif record.stop:
-                    print(f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tStop")
-                elif record.error:
-                    print(f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tError")
-                elif record.humidity is None:
-                    print(f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\t{record.temperature:.1f}°C")
-                else:
-                    print(f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\t{record.temperature:.1f}°C\t{record.humidity:.1f}%")
-                r += s
-            r0 = r
-
+        pipeline = RecordPipeline(self.__dev, self.__range, self.__since, self.__until)
+        pipeline.run(lambda r, record: print(RecordRead.formatRecord(r, record)))
 
     def __repr__(self):
         r = self.__range or '*'
         return f'RecordReadCommand({self.__dev}, {r})'
 
+    @staticmethod
+    def formatRecord(r, record):
+        if record is None:
+            return f"{r + 1:-4d}\t---------- --------\t---\tNo data"
+        elif record.pause:
+            return f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tPause"
+        elif record.stop:
+            return f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tStop"
+        elif record.error:
+            return f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\tError"
+        elif record.humidity is None:
+            return f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\t{record.temperature:.1f}°C"
+        else:
+            return f"{r + 1:-4d}\t{record.time}\t{record.flagStr}\t{record.temperature:.1f}°C\t{record.humidity:.1f}%"
+
+    @staticmethod
+    def timeFromString(s):
+        if s is None:
+            return None
+        try:
+            return datetime.fromisoformat(s)
+        except ValueError:
+            raise ValueError(f'Invalid time: {s}')
+
     @staticmethod
     def sliceFromString(s):
         parts = s.split(':')
@@ -602,20 +697,128 @@ class RecordRead(Command):
             raise ValueError(f'Invalid record selection: {s}')
 
 
+class RecordSync(Command):
+    '''
+        Download the new records from an Elitech device into the local record cache
+
+        Only the records which were not downloaded by a previous synchronization are read
+        from the device. The cached records are discarded when a new recording is started.
+        Only the new records are printed, unless 'all' is given.
+    '''
+
+    cmdName = ('record', 'sync')
+    cmdArgs = '[all]'
+    priority = Priority.Bulk
+
+    def __init__(self, args, *params):
+        self.__dev = Command.device(args)
+        self.__all = (len(params) > 0) and (params[0] == 'all')
+        if (len(params) > 1) or ((len(params) == 1) and not self.__all):
+            params = '", "'.join(params[(1 if self.__all else 0):])
+            warning(f"Ignored parameters: \"{params}\"")
+
+    def execute(self):
+        from .recordcache import RecordCache
+
+        if not self.__dev:
+            warning(f"No device selected. Only there to check the request.")
+
+        cache = RecordCache(self.__dev)
+        try:
+            n = cache.sync()
+        except ValueError as e:
+            warning(f"Could not synchronize records ({str(e)})")
+            return
+
+        print(f"{cache.serial}: {n} new records ({len(cache)} records in cache)")
+        for r, record in cache.records(0 if self.__all else cache.new):
+            print(RecordRead.formatRecord(r, record))
+
+    def __repr__(self):
+        return f'RecordSyncCommand({self.__dev})'
+
+
+class FleetDownload(Command):
+    '''
+        Download the records of all the connected Elitech devices concurrently
+
+        The records are synchronized with the local record cache of each device and,
+        if a directory is given, all the cached records of each device are written
+        to a file named after its serial number in this directory.
+        The number of concurrent downloads is limited by --jobs,
+        and the number of concurrent downloads behind the same USB hub by --per-hub.
+    '''
+
+    cmdName = ('fleet', 'download')
+    cmdArgs = '[directory]'
+    remote = False
+
+    def __init__(self, args, *params):
+        from .fleet import Fleet
+
+        self.__fleet = Fleet(concurrency=getattr(args, 'jobs', None), perHub=getattr(args, 'per_hub', None))
+        self.__directory = Path(params[0]) if (len(params) > 0) else None
+        if (len(params) > 1):
+            params = '", "'.join(params[1:])
+            warning(f"Ignored parameters: \"{params}\"")
+
+    def execute(self):
+        from contextlib import redirect_stdout
+
+        import os
+
+        if (len(self.__fleet.devices) == 0):
+            warning(f"No device found")
+            return
+        if self.__directory is not None:
+            self.__directory.mkdir(parents=True, exist_ok=True)
+
+        # The frames of all the devices are discarded, instead of being kept in memory
+        with open(os.devnull, 'w') as null, redirect_stdout(null):
+            results = self.__fleet.download(self.__output)
+        for result in results:
+            if result:
+                print(f"{result.device.path}: {result.serial}: {result.new} new records ({result.records} records in cache) in {result.time:.1f}s")
+            else:
+                print(f"{result.device.path}: Download failed ({str(result.error)})")
+
+        new = sum([result.new for result in results])
+        print(f"{len([r for r in results if r])}/{len(results)} devices: {new} new records in {self.__fleet.time:.1f}s ({new / max(self.__fleet.time, 1e-6):.0f} records/s, {8 * new / max(self.__fleet.time, 1e-6) / 1024:.1f} kiB/s)")
+
+    def __output(self, result):
+        from .recordcache import RecordCache
+
+        if result.cache is None:
+            return
+        try:
+            if result and (self.__directory is not None):
+                with open(self.__directory / f'{RecordCache.fileName(result.serial)}.txt', 'wt') as f:
+                    for r, record in result.cache.records():
+                        f.write(RecordRead.formatRecord(r, record) + '\n')
+        finally:
+            result.cache.close()
+
+    def __repr__(self):
+        return f'FleetDownloadCommand({self.__fleet.concurrency}, {self.__fleet.perHub}, {self.__directory})'
+
+
 class Stop(Command):
     '''
         Stops an Elitech device recording data
     '''
 
     cmdName = ('stop')
+    priority = Priority.Bulk
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        self.__dev = Command.device(args)
         if (len(params) > 0):
             params = '", "'.join(params[1:])
             warning(f"Ignored parameters: \"{params}\"")
 
     def execute(self):
+        from .frames import Frame
+
         frame = Frame(Frame.Operation.StopCommand, 0, b'\x00')
 
         if not self.__dev:
@@ -639,14 +842,17 @@ class Format(Command):
     '''
 
     cmdName = ('format')
+    priority = Priority.Bulk
 
     def __init__(self, args, *params):
-        self.__dev = Device(args.dev)
+        self.__dev = Command.device(args)
         if (len(params) > 0):
             params = '", "'.join(params[1:])
             warning(f"Ignored parameters: \"{params}\"")
 
     def execute(self):
+        from .frames import Frame
+
         frame = Frame(Frame.Operation.FormatCommand, 0, b'\x00')
 
         if not self.__dev:
@@ -662,3 +868,55 @@ class Format(Command):
 
     def __repr__(self):
         return f'FormatCommand({self.__dev})'
+
+
+class Serve(Command):
+    '''
+        Run a daemon which serves the other commands over a Unix socket
+
+        The daemon keeps the device registry and the device sessions open,
+        so that the commands do not pay the interpreter startup, the device enumeration
+        and the report descriptor parsing each time. When the daemon is running,
+        the commands use it transparently (unless --no-daemon is given).
+        A device is used by one command at a time.
+    '''
+
+    cmdName = 'serve'
+    cmdArgs = '[socket]'
+    remote = False
+
+    def __init__(self, args, *params):
+        self.__path = params[0] if (len(params) > 0) else getattr(args, 'socket', None)
+        if (len(params) > 1):
+            params = '", "'.join(params[1:])
+            warning(f"Ignored parameters: \"{params}\"")
+
+    def execute(self):
+        from .daemon import Server
+        from .registry import DeviceRegistry
+
+        import signal
+        import warnings
+
+        try:
+            registry = DeviceRegistry()
+        except OSError as e:
+            warning(f"Device registry is not available ({str(e)})")
+            registry = None
+
+        # Each client must get its warnings, even if they were already issued
+        warnings.simplefilter('always')
+        # Stop cleanly (removing the socket) when terminated
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        with Server(self.__path, registry) as server:
+            print(f"Listening on {server.path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if registry is not None:
+                    registry.close()
+
+    def __repr__(self):
+        return f'ServeCommand({self.__path})'
@@ -0,0 +1,177 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+from warnings import warn as warning
+
+import copy
+import threading
+
+from .cache import cachePath
+from .cache import loadJson
+from .cache import storeJson
+from .frames import Frame
+from .frames import Response
+from .image import MemoryImage
+from .parameters import Parameters
+from .parameters import Range
+
+class ConfigCache:
+    CacheName = 'config.json'
+    # The serial number (identifying the device) and the configuration time
+    # (validating the cached configuration) are read with a single frame.
+    # The volatile data in this frame is masked, when the token is compared
+    Token = Range(0x02, 0x2D)
+    # Parameters which change without the configuration being rewritten
+    Volatile = ['device-state', 'actual-stop-mode', 'battery-level', 'start-time', 'stop-time', 'record-number', 'device-time']
+
+    __lock = threading.Lock()
+    __entries = None
+    __key = None
+
+    def __init__(self, dev, broker=None):
+        self.__dev = dev
+        self.__broker = broker
+        self.serial = None
+        self.hit = False
+        self.requested = []
+
+    def read(self, ranges):
+        parameters = Parameters()
+        volatile = [parameters[n].range for n in ConfigCache.Volatile]
+
+        self.hit = False
+        self.requested = []
+        token = self.__token()
+        # The devices without a valid serial number cannot be told apart: they are not cached
+        if (token is None) or not self.serial:
+            return MemoryImage(*self.__get(Range.plan(ranges, Frame.MaxLength)))
+
+        with ConfigCache.__lock:
+            entry = ConfigCache.__load().get(self.serial)
+        if (entry is not None) and (entry.get('token') == ConfigCache.__mask(token, volatile).hex()):
+            self.hit = True
+            image = MemoryImage(*[Response(Range(s, len(d) // 2), bytes.fromhex(d)) for s, d in entry['spans']])
+            # The volatile data and the data missing from cache is read from the device
+            live = []
+            for r in ranges:
+                if r not in image:
+                    live.append(r)
+                else:
+                    live += [r & v for v in volatile if ((r & v).len > 0)]
+            live = Range.plan([r for r in live if r not in token.range], Frame.MaxLength)
+            for a in [token] + self.__get(live):
+                if a.range in image:
+                    image[a.range] = a.data
+                else:
+                    image.add(a.range, a.data)
+            return image
+
+        # The whole configuration is read and stored in cache
+        image = MemoryImage(token, *self.__get(Range.plan([p.range for p in parameters] + ranges, Frame.MaxLength)))
+        ConfigCache.__store(self.serial, {
+            'token': ConfigCache.__mask(token, volatile).hex(),
+            'spans': [[a.range.start, a.data.hex()] for a in image.responses()],
+        })
+        return image
+
+    def invalidate(self):
+        if (self.__token() is not None) and self.serial:
+            ConfigCache.forget(self.serial)
+
+    @staticmethod
+    def forget(serial):
+        with ConfigCache.__lock:
+            entries = dict(ConfigCache.__load())
+            if serial in entries:
+                del entries[serial]
+                ConfigCache.__save(entries)
+
+    @staticmethod
+    def serialOf(image):
+        # Serial number in a memory image (None when it is missing, empty or invalid)
+        serialNumber = copy.copy(Parameters()['serial-number'])
+        if serialNumber.range not in image:
+            return None
+        try:
+            return serialNumber.parseData(image[serialNumber.range]).value or None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def __mask(token, volatile):
+        # The cached configuration is valid as long as the non volatile data of the token is unchanged
+        data = bytearray(token.data)
+        for v in volatile:
+            r = token.range & v
+            if (r.len > 0):
+                data[(r.start - token.range.start):(r.end + 1 - token.range.start)] = bytes(r.len)
+        return bytes(data)
+
+    def __token(self):
+        answers = self.__get([ConfigCache.Token])
+        if (len(answers) == 0):
+            return None
+        self.serial = ConfigCache.serialOf(MemoryImage(answers[0]))
+        return answers[0]
+
+    def __get(self, ranges):
+        self.requested += ranges
+        if self.__broker is not None:
+            return self.__broker.get(*ranges, strict=False)
+
+        answers = []
+        for r in ranges:
+            frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+            self.__dev.write(bytes(frame))
+            try:
+                answers.append(frame.parse(self.__dev.read()))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+        return answers
+
+    @staticmethod
+    def __store(serial, entry):
+        with ConfigCache.__lock:
+            entries = dict(ConfigCache.__load())
+            entries[serial] = entry
+            ConfigCache.__save(entries)
+
+    @staticmethod
+    def __save(entries):
+        storeJson(ConfigCache.CacheName, entries)
+        ConfigCache.__entries = entries
+        ConfigCache.__key = ConfigCache.__fileKey()
+
+    @staticmethod
+    def __load():
+        # The entries are kept in memory as long as the cache file is not modified
+        key = ConfigCache.__fileKey()
+        if (ConfigCache.__entries is None) or (key != ConfigCache.__key):
+            ConfigCache.__entries = loadJson(ConfigCache.CacheName, {})
+            ConfigCache.__key = key
+        return ConfigCache.__entries
+
+    @staticmethod
+    def __fileKey():
+        path = cachePath(ConfigCache.CacheName)
+        try:
+            s = path.stat()
+        except OSError:
+            return (path, None, None)
+        return (path, s.st_ino, s.st_mtime_ns)
+
+    def __repr__(self): #pragma: no cover
+        return f"ConfigCache({self.__dev})"
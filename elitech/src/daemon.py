@@ -0,0 +1,240 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from argparse import Namespace
+from pathlib import Path
+
+import contextlib
+import contextvars
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from .broker import RequestBroker
+from .client import Client
+from .client import socketPath
+from .commands import Command
+from .device import Device
+from .scheduler import FrameScheduler
+from .scheduler import Priority
+
+class ContextOutput:
+    # Standard stream replacement, which writes to the stream of the current context.
+    # Threads started with a copy of the context (e.g. by RecordPipeline) inherit it.
+    def __init__(self, default):
+        self.default = default
+        self.__stream = contextvars.ContextVar('stream', default=None)
+
+    def redirect(self, stream):
+        return self.__stream.set(stream)
+
+    def restore(self, token):
+        self.__stream.reset(token)
+
+    def write(self, text):
+        stream = self.__stream.get()
+        if stream is None:
+            return self.default.write(text)
+        return stream.write(text)
+
+    def flush(self):
+        stream = self.__stream.get()
+        if stream is None:
+            return self.default.flush()
+        return stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+
+class MessageStream:
+    def __init__(self, wfile, key):
+        self.__wfile = wfile
+        self.__key = key
+        self.__lock = threading.Lock()
+        self.__buffer = ''
+
+    def write(self, text):
+        with self.__lock:
+            self.__buffer += text
+            if '\n' in text:
+                self.__send()
+        return len(text)
+
+    def flush(self):
+        with self.__lock:
+            self.__send()
+
+    def __send(self):
+        if self.__buffer:
+            send(self.__wfile, {self.__key: self.__buffer})
+            self.__buffer = ''
+
+
+def send(wfile, message):
+    wfile.write(json.dumps(message).encode() + b'\n')
+    wfile.flush()
+
+
+class Session:
+    def __init__(self, dev):
+        self.device = dev
+        self.scheduler = FrameScheduler(dev)
+        # The concurrent reads of brokered commands are merged into shared frames
+        self.broker = RequestBroker(self.scheduler.device(Priority.Interactive))
+        # One command at a time per priority class, whose frames are interleaved by the scheduler
+        self.locks = {p: threading.Lock() for p in Priority}
+
+    def close(self):
+        try:
+            self.device.close()
+        except (AttributeError, OSError):
+            pass
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                args = Namespace(**json.loads(line)['args'])
+            except (ValueError, KeyError, TypeError):
+                send(self.wfile, {'error': "Invalid request", 'type': 'ValueError'})
+                return
+
+            out = MessageStream(self.wfile, 'out')
+            err = MessageStream(self.wfile, 'err')
+            tokens = (sys.stdout.redirect(out), sys.stderr.redirect(err))
+            try:
+                self.server.execute(args)
+                status = {'exit': 0}
+            except Exception as e:
+                status = {'error': str(e), 'type': type(e).__name__}
+            finally:
+                sys.stdout.restore(tokens[0])
+                sys.stderr.restore(tokens[1])
+                out.flush()
+                err.flush()
+            try:
+                send(self.wfile, status)
+            except OSError:
+                return
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=None, registry=None, factory=None):
+        self.path = socketPath() if path is None else Path(path)
+        self.__registry = registry
+        self.__factory = factory or self.__device
+        self.__sessions = {}
+        self.__lock = threading.Lock()
+
+        if self.path.exists():
+            client = Client.connect(self.path)
+            if client is not None:
+                client.close()
+                raise ValueError(f"A daemon is already listening on \"{self.path}\"")
+            self.path.unlink()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The socket is created accessible only to the user (there is no window until a chmod)
+        umask = os.umask(0o177)
+        try:
+            super().__init__(str(self.path), Handler)
+        finally:
+            os.umask(umask)
+
+        self.__streams = (sys.stdout, sys.stderr)
+        sys.stdout = ContextOutput(sys.stdout)
+        sys.stderr = ContextOutput(sys.stderr)
+
+    def server_close(self):
+        super().server_close()
+        if self.__streams is not None:
+            sys.stdout, sys.stderr = self.__streams
+            self.__streams = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+        with self.__lock:
+            for session in self.__sessions.values():
+                session.close()
+            self.__sessions.clear()
+
+    def execute(self, args):
+        cmd, _ = Command.lookup(args.cmds)
+        if (cmd is not None) and not cmd.remote:
+            raise ValueError(f"Command '{' '.join(args.cmds)}' is not run by the daemon")
+
+        if not args.dev:
+            args.dev = ''
+            return Server.__execute(args)
+
+        priority = cmd.priority if (cmd is not None) else Priority.Interactive
+        brokered = (cmd is not None) and cmd.brokered
+        path = str(Path(args.dev))
+        session = self.session(path)
+        # Brokered commands run concurrently: the broker serializes their frames
+        with (contextlib.nullcontext() if brokered else session.locks[priority]):
+            args.dev = session.scheduler.device(priority)
+            args.broker = session.broker if brokered else None
+            try:
+                Server.__execute(args)
+            except ConnectionError:
+                raise
+            except OSError:
+                # The device was probably unplugged: it is reopened by the next command
+                self.drop(path)
+                raise
+
+    def session(self, path):
+        with self.__lock:
+            if self.__registry is not None:
+                self.__registry.update()
+                for p in list(self.__sessions):
+                    if self.__registry.get(p) is None:
+                        self.__sessions.pop(p).close()
+
+            session = self.__sessions.get(path)
+            if session is None:
+                session = Session(self.__factory(path))
+                self.__sessions[path] = session
+            return session
+
+    def drop(self, path):
+        with self.__lock:
+            session = self.__sessions.pop(path, None)
+        if session is not None:
+            session.close()
+
+    def __device(self, path):
+        entry = self.__registry.get(path) if (self.__registry is not None) else None
+        dev = self.__registry.device(entry) if (entry is not None) else Device(path)
+        # Keep the device open between commands
+        return dev.open()
+
+    @staticmethod
+    def __execute(args):
+        cmd = Command(args)
+        print(cmd)
+        cmd.execute()
+
+    def __repr__(self): #pragma: no cover
+        return f"Server({self.path})"
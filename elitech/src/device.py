@@ -15,15 +15,18 @@
 # You should have received a copy of the GNU General Public License
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
+from collections import namedtuple
 from pathlib import Path
+from warnings import warn as warning
 
+import functools
+import os
+import re
 import sys
+import threading
 import warnings
 sys.path.insert(0, str(Path(__file__).parents[2] / 'HIDParser'))
 
-from hid_parser import ReportDescriptor, HIDComplianceWarning
-
-
 supportedDevices = [
     {'VId': 0x04d8, 'PId':0x0033, 'name': 'Elitech RC-51'               },
     {'VId': 0x04d8, 'PId':0x0133, 'name': 'Elitech RC-51H'              },
@@ -48,6 +51,10 @@ supportedDevices = [
     {'VId': 0x464d, 'PId':0x0402, 'name': ''                            },
 ]
 
+supportedIndex = {(d['VId'], d['PId']): d for d in supportedDevices}
+
+DeviceInfo = namedtuple('DeviceInfo', ['path', 'vendorId', 'productId', 'name', 'bus', 'port', 'hub'])
+
 class WarningFilter:
     def __init__(self, category=None):
         self.__cls = category
@@ -68,48 +75,162 @@ class WarningFilter:
         if (self.__cls is not None) and (category is not self.__cls):
             self.__old(message, category, filename, lineno, file=None, line=None)
 
+DescriptorCacheName = 'descriptors.json'
+
+@functools.lru_cache(maxsize=64)
+def reportSizes(descriptor):
+    # The sizes are cached on disk by descriptor hash, so that the parser is only run for new models
+    import hashlib
+    from .cache import loadJson
+    from .cache import storeJson
+
+    key = hashlib.sha256(descriptor).hexdigest()
+    try:
+        sizes = loadJson(DescriptorCacheName, {})[key]
+        return int(sizes['inReportSize']), int(sizes['outReportSize'])
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    from hid_parser import ReportDescriptor, HIDComplianceWarning
+    with WarningFilter(HIDComplianceWarning):
+        parsed = ReportDescriptor([int(b) for b in descriptor])
+    sizes = parsed.get_input_report_size().byte, parsed.get_output_report_size().byte
+
+    cache = loadJson(DescriptorCacheName, {})
+    if type(cache) is not dict:
+        cache = {}
+    cache[key] = {'inReportSize': sizes[0], 'outReportSize': sizes[1]}
+    storeJson(DescriptorCacheName, cache)
+    return sizes
+
 class Device:
-    def __init__(self, devPath):
+    def __init__(self, devPath, classPath=None):
         self.path = devPath
         if self.path and (type(self.path) is str):
             self.path = Path(self.path)
         if self.path and not self.path.exists():
             raise ValueError(f"Device \"{self.path}\" does not exist")
         self.__dev = None
+        self.__depth = 0
+        self.__lock = threading.RLock()
         self.__vendorId = None
         self.__productId = None
+        self.__reportSizes = None
         self.__descriptor = None
+        self.__classPath = Path('/sys/class/hidraw') if classPath is None else Path(classPath)
 
     def __bool__(self):
         return bool(self.path)
 
     def __enter__(self):
-        if self.path:
-            self.__dev = open(self.path, 'rb+')
-        return self
-
+        return self.open()
 
     def __exit__(self, *args):
-        if self.__dev is not None:
-            self.__dev.close()
-            self.__dev = None
+        self.close()
         return False
 
+    @property
+    def isOpen(self):
+        return (self.__depth > 0)
+
+    def open(self):
+        with self.__lock:
+            if (self.__depth == 0) and self.path:
+                # Reports are read and written one by one, buffering is useless
+                # (and it would require the device file to be seekable).
+                self.__dev = open(self.path, 'rb+', buffering=0)
+            self.__depth += 1
+        return self
+
+    def close(self):
+        with self.__lock:
+            if (self.__depth == 0):
+                return
+            self.__depth -= 1
+            if (self.__depth == 0) and (self.__dev is not None):
+                self.__dev.close()
+                self.__dev = None
+
     @staticmethod
     def enumerate():
-        hidClassPath = Path('/sys/class/hidraw')
+        for info in Device.scan():
+            yield Device.fromInfo(info)
+
+    @classmethod
+    def fromInfo(cls, info, classPath=None, descriptor=None):
+        hidDevice = cls(info.path, classPath)
+        hidDevice.__vendorId = info.vendorId
+        hidDevice.__productId = info.productId
+        # The report descriptor may already be known (e.g. by the device registry)
+        hidDevice.__descriptor = descriptor
+        return hidDevice
 
-        for hidSysPath in hidClassPath.iterdir():
-            hidDevice = Device(Path('/dev') / hidSysPath.name)
-            try:
-                hidDevice.__resolve()
-            except ValueError:
-                continue
+    @staticmethod
+    def scan(classPath=None, devPath=None, unsupported=False):
+        classPath = Path('/sys/class/hidraw') if classPath is None else Path(classPath)
+
+        for hidSysPath in classPath.iterdir():
+            info = Device.info(hidSysPath, devPath, unsupported)
+            if info is not None:
+                yield info
+
+    @staticmethod
+    def info(hidSysPath, devPath=None, unsupported=False):
+        devPath = Path('/dev') if devPath is None else Path(devPath)
+        try:
+            bus, vendorId, productId = Device.__identify(hidSysPath)
+        except ValueError:
+            return None
+
+        d = supportedIndex.get((vendorId, productId))
+        if (d is None) and not unsupported:
+            return None
+        name = (d['name'] or 'Unknown') if (d is not None) else None
+        port, hub = Device.topology(hidSysPath)
+        return DeviceInfo(devPath / hidSysPath.name, vendorId, productId, name, bus, port, hub)
 
-            for d in supportedDevices:
-                if (d['VId'] == hidDevice.vendorId) and (d['PId'] == hidDevice.productId):
-                    yield hidDevice
-                    break
+    @staticmethod
+    def parseUevent(uevent):
+        for line in uevent.splitlines():
+            if line.startswith('HID_ID='):
+                try:
+                    bus, vendorId, productId = [int(v, 16) for v in line[7:].split(':')]
+                except ValueError:
+                    raise ValueError(f"Invalid HID_ID: {line[7:]}")
+                return bus, vendorId, productId
+        raise ValueError("No HID_ID in uevent")
+
+    @staticmethod
+    def topology(hidSysPath):
+        # The USB interface directory (e.g. 1-1.3:1.0) is in the USB device directory (1-1.3),
+        # which is itself in its hub directory (1-1 or usb1 for a root hub).
+        try:
+            # Class entries are links to the device directory, reading the link is enough
+            parts = os.readlink(str(hidSysPath)).split('/')
+        except OSError:
+            parts = str(hidSysPath.resolve()).split('/')
+        for i in range(2, len(parts)):
+            if re.fullmatch(r'[0-9]+-[0-9.]+:[0-9]+\.[0-9]+', parts[i]):
+                return parts[i - 1], parts[i - 2]
+        return None, None
+
+    @staticmethod
+    def __identify(hidSysPath):
+        try:
+            with open(hidSysPath / 'device' / 'uevent', 'rt') as f:
+                return Device.parseUevent(f.read())
+        except (OSError, ValueError):
+            pass
+
+        # Fall back to the USB device attributes
+        for p in hidSysPath.resolve().parents:
+            if (p / 'idVendor').is_file() and (p / 'idProduct').is_file():
+                with open(p / 'idVendor', 'rt') as f:
+                    vendorId = int(f.read().strip(), 16)
+                with open(p / 'idProduct', 'rt') as f:
+                    productId = int(f.read().strip(), 16)
+                return None, vendorId, productId
+        raise ValueError("Device vendor id and product id cannot be obtained")
 
     @property
     def vendorId(self):
@@ -128,30 +249,60 @@ class Device:
         if not self.path:
             return None
 
-        for d in supportedDevices:
-            if (d['VId'] == self.vendorId) and (d['PId'] == self.productId):
-                return d['name'] if (len(d['name']) > 0) else 'Unknown'
+        d = supportedIndex.get((self.vendorId, self.productId))
+        if d is not None:
+            return d['name'] if (len(d['name']) > 0) else 'Unknown'
 
         raise ValueError(f"Unsupported device: {self.vendorId:04x}:{self.productId:04x}")
 
     @property
     def outReportSize(self):
-        if self.__descriptor is None:
+        if self.__reportSizes is None:
             self.__readDescriptor()
-        if self.__descriptor is not None:
-            return self.__descriptor.get_output_report_size().byte
+        if self.__reportSizes is not None:
+            return self.__reportSizes[1]
         else:
             return 64
 
     @property
     def inReportSize(self):
-        if self.__descriptor is None:
+        if self.__reportSizes is None:
             self.__readDescriptor()
-        if self.__descriptor is not None:
-            return self.__descriptor.get_input_report_size().byte
+        if self.__reportSizes is not None:
+            return self.__reportSizes[0]
         else:
             return 64
 
+    def iterRecords(self, records=slice(None), since=None, until=None, protocol=0x20):
+        from .pager import RecordPager
+        return RecordPager(self).records(records, since, until, protocol)
+
+    def getParameters(self, *names):
+        from .frames import Frame
+        from .image import MemoryImage
+        from .parameters import Parameters
+        from .parameters import Range
+        from .parameters import codec
+
+        parameters = Parameters()
+        params = [parameters[n] for n in names]
+
+        answers = []
+        with self:
+            for r in Range.plan([p.range for p in params], Frame.MaxLength):
+                frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+                self.write(bytes(frame))
+                try:
+                    answers.append(frame.parse(self.read()))
+                except ValueError as e:
+                    warning(f"Got invalid response ({str(e)})")
+        image = MemoryImage(*answers)
+
+        values = {}
+        for a in image.responses():
+            values.update(codec.decode(a.data, a.range.start, names))
+        return values
+
     def write(self, frame):
         request = frame + bytes([0] * (self.outReportSize - len(frame)))
         print("Request:  " + ' '.join([f'{b:02X}' for b in request]))
@@ -175,27 +326,16 @@ class Device:
         if not self.path:
             return
 
-        hidSysPath = Path('/sys/class/hidraw') / self.path.name
-
-        for p in hidSysPath.resolve().parents:
-            if (p / 'idVendor').is_file() and (p / 'idProduct').is_file():
-                with open(p / 'idVendor', 'rt') as f:
-                    self.__vendorId = int(f.read().strip(), 16)
-                with open(p / 'idProduct', 'rt') as f:
-                    self.__productId = int(f.read().strip(), 16)
-                break
-        else:
-            raise ValueError("Device vendor id and product id cannot be obtained")
+        bus, self.__vendorId, self.__productId = Device.__identify(self.__classPath / self.path.name)
 
     def __readDescriptor(self):
         if not self.path:
             return
 
-        with open(Path('/sys/class/hidraw') / self.path.name / 'device' / 'report_descriptor', 'rb') as f:
-            report = [int(b) for b in f.read()]
-
-        with WarningFilter(HIDComplianceWarning):
-            self.__descriptor = ReportDescriptor(report)
+        if self.__descriptor is None:
+            with open(self.__classPath / self.path.name / 'device' / 'report_descriptor', 'rb') as f:
+                self.__descriptor = bytes(f.read())
+        self.__reportSizes = reportSizes(bytes(self.__descriptor))
 
     def __repr__(self): #pragma: no cover
         if not self.path:
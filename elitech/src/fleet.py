@@ -0,0 +1,130 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from pathlib import Path
+from warnings import warn as warning
+
+import threading
+import time
+
+from .device import Device
+from .recordcache import RecordCache
+
+class FleetResult:
+    def __init__(self, device, hub):
+        self.device = device
+        self.hub = hub
+        self.cache = None
+        self.serial = None
+        self.new = 0
+        self.records = 0
+        self.time = 0
+        self.error = None
+
+    def __bool__(self):
+        return self.error is None
+
+    def __repr__(self): #pragma: no cover
+        return f"FleetResult({self.device}, {self.serial}, {self.new})"
+
+
+class Fleet:
+    Concurrency = 4
+    PerHub = 1
+    SysClassPath = Path('/sys/class/hidraw')
+
+    def __init__(self, devices=None, concurrency=None, perHub=None):
+        self.devices = list(Device.enumerate()) if devices is None else list(devices)
+        self.concurrency = concurrency or Fleet.Concurrency
+        self.perHub = perHub or Fleet.PerHub
+        self.time = 0
+
+    @staticmethod
+    def hubOf(dev):
+        if not dev.path:
+            return None
+
+        port, hub = Device.topology(Fleet.SysClassPath / Path(dev.path).name)
+        return hub
+
+    def download(self, output=None):
+        pending = [(dev, Fleet.hubOf(dev)) for dev in self.devices]
+        running = {}
+        results = []
+        condition = threading.Condition()
+
+        def take():
+            with condition:
+                while (len(pending) > 0):
+                    for i, (dev, hub) in enumerate(pending):
+                        key = hub if hub is not None else dev.path
+                        if (running.get(key, 0) < self.perHub):
+                            running[key] = running.get(key, 0) + 1
+                            return pending.pop(i)
+                    condition.wait()
+                return None, None
+
+        def work():
+            while True:
+                dev, hub = take()
+                if dev is None:
+                    return
+                # The slot is released whatever happens, otherwise the other workers wait forever
+                result = FleetResult(dev, hub)
+                try:
+                    result = Fleet.__download(dev, hub)
+                finally:
+                    with condition:
+                        key = hub if hub is not None else dev.path
+                        running[key] -= 1
+                        results.append(result)
+                        condition.notify_all()
+                if output is not None:
+                    try:
+                        output(result)
+                    except Exception as e:
+                        warning(f"Could not output result for {dev.path}: {str(e)}")
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=work) for _ in range(0, min(self.concurrency, len(pending)))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.time = time.perf_counter() - t0
+
+        order = {id(dev): i for i, dev in enumerate(self.devices)}
+        results.sort(key=lambda r: order[id(r.device)])
+        return results
+
+    @staticmethod
+    def __download(dev, hub):
+        result = FleetResult(dev, hub)
+        t0 = time.perf_counter()
+        try:
+            result.cache = RecordCache(dev)
+            result.new = result.cache.sync()
+            result.serial = result.cache.serial
+            result.records = len(result.cache)
+        # A failing device must not stop the download of the others
+        except Exception as e:
+            result.error = e
+        result.time = time.perf_counter() - t0
+        return result
+
+    def __repr__(self): #pragma: no cover
+        return f"Fleet({len(self.devices)} devices, {self.concurrency}, {self.perHub})"
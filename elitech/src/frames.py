@@ -88,20 +88,13 @@ class Response:
 
     @staticmethod
     def merge(answers):
-        answers.sort(key=lambda a: a.range.start)
-
-        a = 0
-        while (a + 1 < len(answers)):
-            try:
-                answers[a] += answers[a + 1]
-                del(answers[a + 1])
-            except ValueError:
-                a = a + 1
-
-        return answers
+        from .image import MemoryImage
+        return MemoryImage(*answers).responses()
 
 
 class Frame:
+    MaxLength = 52
+
     class Operation(Enum):
         GetRecord = 0x0001
         GetParameter = 0x0003
@@ -119,12 +112,12 @@ class Frame:
         self.__offset = offset
 
         if type(args[0]) is bytes:
-            if (len(args[0]) > 52):
+            if (len(args[0]) > Frame.MaxLength):
                 raise ValueError(f"Too much data: {len(args[0])}")
             self.__len = len(args[0])
             self.__data = args[0]
         elif type(args[0]) is int:
-            if (args[0] <= 0) or (args[0] > 52):
+            if (args[0] <= 0) or (args[0] > Frame.MaxLength):
                 raise ValueError(f"Invalid length: {args[0]}")
             self.__len = args[0]
             self.__data = []
@@ -0,0 +1,179 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+from bisect import bisect_left
+from bisect import bisect_right
+
+import re
+
+from .frames import Response
+from .parameters import Range
+
+class MemoryImage:
+    def __init__(self, *answers):
+        # Sorted, disjoint and non-adjacent spans (the stops are exclusive) and their data
+        self.__starts = []
+        self.__stops = []
+        self.__chunks = []
+        for a in answers:
+            self.add(a.range, a.data)
+
+    def __len__(self):
+        return len(self.__starts)
+
+    @property
+    def spans(self):
+        return [Range(s, e - s) for s, e in zip(self.__starts, self.__stops)]
+
+    def add(self, r, data):
+        if (len(data) != r.len):
+            raise ValueError(f"Range and data lengths do not match: {len(data)} != {r.len}")
+        data = memoryview(bytes(data))
+        start = r.start
+        stop = r.start + r.len
+
+        # Spans overlapping or adjacent to the new data
+        first = bisect_left(self.__stops, start)
+        last = bisect_right(self.__starts, stop)
+
+        # The merged span extends the first span in place, when the new data does not start before it
+        if (first < last) and (self.__starts[first] <= start):
+            chunk = self.__chunks[first]
+            begin = self.__starts[first]
+        else:
+            chunk = bytearray()
+            begin = start
+
+        # Only the gaps between the spans are copied: the existing data is kept
+        mismatch = False
+        p = begin + len(chunk)
+        for i in range(first, last):
+            s = max(self.__starts[i], start)
+            e = min(self.__stops[i], stop)
+            if (s < e) and (self.__chunks[i][(s - self.__starts[i]):(e - self.__starts[i])] != data[(s - start):(e - start)]):
+                mismatch = True
+            if self.__chunks[i] is chunk:
+                continue
+            if (p < self.__starts[i]):
+                chunk += data[(p - start):(self.__starts[i] - start)]
+            chunk += self.__chunks[i]
+            p = self.__stops[i]
+        if (p < stop):
+            chunk += data[(p - start):]
+        if mismatch:
+            warning("Data mismatch, new overlapping data will be ignored")
+
+        self.__starts[first:last] = [begin]
+        self.__stops[first:last] = [begin + len(chunk)]
+        self.__chunks[first:last] = [chunk]
+        return self
+
+    def span(self, r):
+        i = self.__index(r)
+        return Response(Range(self.__starts[i], self.__stops[i] - self.__starts[i]), bytes(self.__chunks[i]))
+
+    def responses(self):
+        return [Response(Range(s, e - s), bytes(c)) for s, e, c in zip(self.__starts, self.__stops, self.__chunks)]
+
+    def __contains__(self, r):
+        try:
+            self.__index(r)
+        except ValueError:
+            return False
+        return True
+
+    def __getitem__(self, arg):
+        if type(arg) is int:
+            arg = Range(arg, 1)
+        i = self.__index(arg)
+        o = arg.start - self.__starts[i]
+        return bytes(self.__chunks[i][o:(o + arg.len)])
+
+    def __setitem__(self, arg, d):
+        if type(arg) is int:
+            arg = Range(arg, 1)
+        if (len(d) != arg.len):
+            raise ValueError(f"Length of {arg} does not match data length: {len(d)}")
+        i = self.__index(arg)
+        o = arg.start - self.__starts[i]
+        self.__chunks[i][o:(o + arg.len)] = bytes(d)
+
+    def __index(self, r):
+        # Index of the span containing the range
+        i = bisect_right(self.__starts, r.start) - 1
+        if (i < 0) or (self.__stops[i] < r.start + r.len):
+            raise ValueError(f"Required range {r} is not in available spans {self.spans}")
+        return i
+
+    def __repr__(self): #pragma: no cover
+        return f'MemoryImage{self.spans!r}'
+
+
+class ConfigImage(MemoryImage):
+    def __init__(self, *answers):
+        # One byte per address, set when the data at this address was modified
+        self.__dirty = bytearray()
+        super().__init__(*answers)
+
+    @property
+    def dirty(self):
+        return [Range(m.start(), m.end() - m.start()) for m in re.finditer(b'\x01+', self.__dirty)]
+
+    def __setitem__(self, arg, d):
+        if type(arg) is int:
+            arg = Range(arg, 1)
+        old = self[arg] if arg in self else None
+        super().__setitem__(arg, d)
+        for a, (o, n) in enumerate(zip(old, self[arg]), arg.start):
+            if (o != n):
+                self.__mark(Range(a, 1), 0x01)
+
+    def fill(self, r, d):
+        # The data is sent along with the modified data, but does not need to be written by itself
+        super().__setitem__(r, d)
+
+    def touch(self, r):
+        self.span(r)
+        self.__mark(r, 0x01)
+
+    def clean(self, r):
+        self.__mark(r, 0x00)
+
+    def plan(self, maxLen=52, protected=()):
+        dirty = self.dirty
+
+        # The protected ranges are only written when they were modified:
+        # otherwise, the frames must not span them
+        spans = self.spans
+        for p in protected:
+            if not any([(p & d).len > 0 for d in dirty]):
+                spans = [s for r in spans for s in (r - p)]
+
+        # The spans cannot be merged, as the data between them is unknown
+        planned = []
+        for span in spans:
+            planned += Range.plan([d for d in dirty if d in span], maxLen)
+        return planned
+
+    def __mark(self, r, flag):
+        if (len(self.__dirty) < r.start + r.len):
+            self.__dirty.extend(bytes(r.start + r.len - len(self.__dirty)))
+        self.__dirty[r.start:(r.start + r.len)] = bytes([flag]*r.len)
+
+    def __repr__(self): #pragma: no cover
+        return f'ConfigImage{self.spans!r}'
@@ -18,7 +18,7 @@
 import argparse
 from .commands import Command
 
-def main():
+def version():
     # Determine version from package information
     version = '0.0.1'
     try:
@@ -28,18 +28,51 @@ def main():
         pass
     except importlib.metadata.PackageNotFoundError:
         pass
+    return version
+
+class VersionAction(argparse.Action):
+    # Package information is slow to import: it is only read when the version is requested
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS, help=None):
+        super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message=f"{parser.prog} {version()}\n")
 
+def main():
     # Parse command line
     parser = argparse.ArgumentParser(description="Console tool to interact with Elitech temperature and humidity loggers")
     parser.add_argument('-d', '--dev', '--device', action='store', default='',
                         help='The device to interact with')
     parser.add_argument('-c', '--compat', action='store_const', const=True, default=False,
                         help='Forces to write all parameters (as Elitech official software does). Should not be needed')
-    parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + version)
+    parser.add_argument('--since', action='store', default=None,
+                        help="Only get the records after this time (e.g. '2024-01-31 08:00:00')")
+    parser.add_argument('--until', action='store', default=None,
+                        help="Only get the records before this time (e.g. '2024-01-31 18:00:00')")
+    parser.add_argument('-j', '--jobs', action='store', type=int, default=None,
+                        help='Maximum number of devices downloaded concurrently by fleet commands')
+    parser.add_argument('--per-hub', action='store', type=int, default=None,
+                        help='Maximum number of devices behind the same USB hub downloaded concurrently by fleet commands')
+    parser.add_argument('-s', '--socket', action='store', default=None,
+                        help='The Unix socket of the daemon (see serve command)')
+    parser.add_argument('--no-daemon', action='store_const', const=True, default=False,
+                        help='Run the command in this process, even if the daemon is running')
+    parser.add_argument('-v', '--version', action=VersionAction,
+                        help="show program's version number and exit")
     parser.add_argument('cmds', action='extend', nargs='+',
                         help="The commands to execute. To see help on a specific command, use the 'help' command.")
     args = parser.parse_args()
 
+    # Use the daemon when it is running
+    cmd, _ = Command.lookup(args.cmds)
+    if (cmd is not None) and cmd.remote and not args.no_daemon:
+        from .client import Client
+        client = Client.connect(args.socket)
+        if client is not None:
+            with client:
+                client.execute(args)
+            return
+
     cmd = Command(args)
     print(cmd)
     cmd.execute()
@@ -0,0 +1,290 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+
+import copy
+import warnings
+
+from .cache import loadJson
+from .cache import storeJson
+from .frames import Frame
+from .parameters import Parameters
+from .record import Record
+
+class RecordPager:
+    DefaultPageSize = 51 // Record.Length
+    CacheName = 'pages.json'
+
+    def __init__(self, dev, pageSize=None):
+        self.__dev = dev
+        self.__pageSize = pageSize
+
+    @staticmethod
+    def maxPageSize(reportSize):
+        # Responses carry an 11 bytes header and a 1 byte checksum,
+        # and their total length must fit in the 1 byte length field.
+        return max(1, min(Frame.MaxLength, (min(reportSize, 0xFF) - 12) // Record.Length))
+
+    @property
+    def pageSize(self):
+        if self.__pageSize is None:
+            self.__pageSize = self.__lookup()
+        return self.__pageSize
+
+    def probe(self):
+        maxSize = RecordPager.maxPageSize(self.__dev.inReportSize)
+        lo = min(RecordPager.DefaultPageSize, maxSize)
+        hi = maxSize
+        with self.__dev:
+            while (lo < hi):
+                n = (lo + hi + 1) // 2
+                if self.__tryPage(n):
+                    lo = n
+                else:
+                    hi = n - 1
+        return lo
+
+    def count(self):
+        with self.__dev:
+            capacity, number = self.__readCounters()
+            if (capacity is not None) and (number is not None) and (number <= capacity):
+                return number
+            return self.search(capacity)
+
+    def search(self, capacity=None):
+        with self.__dev:
+            lo = 0
+            if capacity is None:
+                # Exponential search for an upper bound
+                hi = 1
+                while not self.__isEmpty(hi - 1):
+                    lo = hi
+                    if (2*hi > 0x1000000):
+                        return hi
+                    hi = 2*hi
+                hi = hi - 1
+            else:
+                hi = capacity
+
+            # Find the first empty record in [lo, hi]
+            while (lo < hi):
+                mid = (lo + hi) // 2
+                if self.__isEmpty(mid):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            return lo
+
+    def frames(self, start, stop, step=1):
+        frames = []
+        r = start
+        while (r < stop):
+            n = min(self.pageSize, stop - r)
+            frames.append(Frame(Frame.Operation.GetRecord, r, ((n + step - 1) // step) * step + 1 - step))
+            r += ((n + step - 1) // step) * step
+        return frames
+
+    def pages(self, start, stop, step=1):
+        frames = self.frames(start, stop, step)
+        with self.__dev:
+            for frame in frames:
+                self.__dev.write(bytes(frame))
+                try:
+                    yield frame.parse(self.__dev.read())
+                except ValueError as e:
+                    warning(f"Got invalid response ({str(e)})")
+
+    def read(self, start, stop, step=1):
+        return list(self.pages(start, stop, step))
+
+    def window(self, records=slice(None), since=None, until=None, protocol=0x20):
+        start = records.start or 0
+        step = records.step or 1
+        with self.__dev:
+            stop = records.stop
+            if stop is None:
+                stop = self.count()
+            if (since is not None) or (until is not None):
+                start, stop = self.span(since, until, start, stop, protocol)
+        return start, stop, step
+
+    def records(self, records=slice(None), since=None, until=None, protocol=0x20):
+        with self.__dev:
+            start, stop, step = self.window(records, since, until, protocol)
+            for a in self.pages(start, stop, step):
+                for r, record in RecordPager.decode(a, step, protocol):
+                    if (record is None) and (records.stop is None):
+                        return
+                    if (record is None) or RecordPager.selected(record.time, since, until):
+                        yield r, record
+
+    @staticmethod
+    def decode(answer, step=1, protocol=0x20):
+        r = answer.range.start // Record.Length
+        while (Record.Length*r < answer.range.start + answer.range.len):
+            yield r, Record.parse(answer[(Record.Length*r):(Record.Length*(r + 1))], protocol)
+            r += step
+
+    @staticmethod
+    def selected(t, since=None, until=None):
+        if (since is not None) and (t < since):
+            return False
+        if (until is not None) and (t > until):
+            return False
+        return True
+
+    def seek(self, t, strict=False, start=0, stop=None, protocol=0x20):
+        with self.__dev:
+            if stop is None:
+                stop = self.count()
+
+            # Find the first record whose time is after t (or equal if not strict).
+            # The first page is always probed to detect unordered records.
+            lo = start
+            hi = stop
+            probed = []
+            while (lo < hi):
+                mid = (lo + hi) // 2 if (len(probed) != 0) else lo
+                page = self.__probe(mid, hi, protocol)
+                dated = [(i, u) for i, u in page if u is not None]
+                after = [i for i, u in dated if ((u > t) if strict else (u >= t))]
+                probed += dated
+
+                if (len(dated) == 0) or ((len(after) != 0) and (after[0] == dated[0][0])):
+                    hi = mid
+                elif (len(after) != 0):
+                    lo = hi = after[0]
+                else:
+                    lo = mid + len(page)
+
+            # Records are only time-ordered inside a recording
+            probed.sort()
+            if any([u1 > u2 for (i1, u1), (i2, u2) in zip(probed[:-1], probed[1:])]):
+                warning("Records are not ordered by time")
+                return None
+            return lo
+
+    def span(self, since=None, until=None, start=0, stop=None, protocol=0x20):
+        with self.__dev:
+            if stop is None:
+                stop = self.count()
+            first = start
+            last = stop
+            if since is not None:
+                first = self.seek(since, False, start, stop, protocol)
+            if (until is not None) and (first is not None):
+                last = self.seek(until, True, first, stop, protocol)
+            if (first is None) or (last is None):
+                return start, stop
+            return first, last
+
+    def __probe(self, index, stop, protocol):
+        frame = Frame(Frame.Operation.GetRecord, index, min(self.pageSize, stop - index))
+        self.__dev.write(bytes(frame))
+        try:
+            response = frame.parse(self.__dev.read())
+        except ValueError as e:
+            warning(f"Got invalid response ({str(e)})")
+            return []
+
+        page = []
+        for r in range(0, response.range.len // Record.Length):
+            try:
+                record = Record.parse(response.data[(Record.Length*r):(Record.Length*(r + 1))], protocol)
+            except ValueError:
+                record = None
+            page.append((response.range.start // Record.Length + r, record.time if record is not None else None))
+        return page
+
+    def __readCounters(self):
+        frame = RecordPager.countersFrame()
+        self.__dev.write(bytes(frame))
+        try:
+            response = frame.parse(self.__dev.read())
+        except ValueError as e:
+            warning(f"Got invalid response ({str(e)})")
+            return None, None
+        return RecordPager.parseCounters(response)
+
+    @staticmethod
+    def countersFrame():
+        parameters = Parameters()
+        capacity = parameters['device-capacity']
+        number = parameters['record-number']
+        return Frame(Frame.Operation.GetParameter, capacity.offset, number.range.end + 1 - capacity.offset)
+
+    @staticmethod
+    def parseCounters(response):
+        # The parameters are copied, as the pagers of a fleet run in several threads
+        parameters = Parameters()
+        capacity = copy.copy(parameters['device-capacity'])
+        number = copy.copy(parameters['record-number'])
+        if (capacity.range not in response.range) or (number.range not in response.range):
+            return None, None
+
+        c = capacity.parseData(response[capacity.range]).value
+        n = number.parseData(response[number.range]).value
+        if (c == 0) or (c == 0xFFFFFFFF):
+            c = None
+        if (n == 0xFFFF):
+            n = None
+        return c, n
+
+    def __isEmpty(self, index):
+        frame = Frame(Frame.Operation.GetRecord, index, 1)
+        self.__dev.write(bytes(frame))
+        try:
+            response = frame.parse(self.__dev.read())
+        except ValueError as e:
+            warning(f"Got invalid response ({str(e)})")
+            return True
+        return all([b == 0xFF for b in response.data])
+
+    def __lookup(self):
+        reportSize = self.__dev.inReportSize
+        maxSize = RecordPager.maxPageSize(reportSize)
+        if (maxSize <= RecordPager.DefaultPageSize) or not self.__dev:
+            return maxSize
+
+        key = self.__key()
+        pages = loadJson(RecordPager.CacheName, {})
+        if (key is not None) and (key in pages) and (pages[key].get('reportSize') == reportSize):
+            return pages[key]['pageSize']
+
+        pageSize = self.probe()
+        if key is not None:
+            pages[key] = {'pageSize': pageSize, 'reportSize': reportSize}
+            storeJson(RecordPager.CacheName, pages)
+        return pageSize
+
+    def __key(self):
+        try:
+            return f'{self.__dev.vendorId:04x}:{self.__dev.productId:04x}'
+        except (TypeError, ValueError):
+            return None
+
+    def __tryPage(self, n):
+        frame = Frame(Frame.Operation.GetRecord, 0, n)
+        self.__dev.write(bytes(frame))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                response = frame.parse(self.__dev.read())
+            except ValueError:
+                return False
+        return (response.range.len == Record.Length * n)
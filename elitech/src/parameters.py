@@ -16,11 +16,15 @@
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
 from abc import abstractmethod
+from bisect import bisect_left
 from enum import Enum
 from warnings import warn as warning
 
+import copy
 import datetime
 import math
+import struct
+import threading
 
 class Range:
     def __init__(self, s, l):
@@ -106,8 +110,49 @@ class Range:
 
         return merged
 
+    # Costs are expressed in bytes: a round trip costs as much as a full report
+    FrameCost = 64
+    ByteCost = 1
+
+    @staticmethod
+    def plan(ranges, maxLen=52, frameCost=None, byteCost=None):
+        if frameCost is None:
+            frameCost = Range.FrameCost
+        if byteCost is None:
+            byteCost = Range.ByteCost
+
+        ranges = [r for r in Range.optimize(ranges) if (r.len > 0)]
+
+        # cost[i] is the cost of the best plan for the first i ranges,
+        # whose last span starts with range first[i]
+        cost = [0] + [None]*len(ranges)
+        first = [0]*(len(ranges) + 1)
+        for i in range(1, len(ranges) + 1):
+            for j in range(i, 0, -1):
+                l = ranges[i - 1].end - ranges[j - 1].start + 1
+                c = cost[j - 1] + ((l + maxLen - 1) // maxLen) * frameCost + l * byteCost
+                if (cost[i] is None) or (c < cost[i]):
+                    cost[i] = c
+                    first[i] = j
+
+        # Build the spans (backwards) and split them to the maximum frame length
+        spans = []
+        i = len(ranges)
+        while (i > 0):
+            j = first[i]
+            spans.insert(0, Range(ranges[j - 1].start, ranges[i - 1].end - ranges[j - 1].start + 1))
+            i = j - 1
+
+        planned = []
+        for span in spans:
+            for s in range(span.start, span.end + 1, maxLen):
+                planned.append(Range(s, min(maxLen, span.end + 1 - s)))
+        return planned
+
 
 class Parameter:
+    _Formats = {1: '>B', 2: '>H', 4: '>I'}
+
     def __init__(self, name, description, offset, writable, immutable):
         self.name = name
         self.description = description
@@ -127,7 +172,7 @@ class Parameter:
 
     @property
     def value(self):
-        return self._value
+        return self._convert(self._value)
 
     @value.setter
     def value(self, v):
@@ -137,9 +182,9 @@ class Parameter:
     def range(self):
         return Range(self.offset, self.len)
 
-    @abstractmethod
     def parseData(self, data):
-        pass #pragma: no cover
+        self._value = self._parse(data)
+        return self
 
     @abstractmethod
     def parseValue(self, _value):
@@ -150,10 +195,27 @@ class Parameter:
             return ''
         return str(self.value)
 
-    @abstractmethod
     def __bytes__(self):
+        return self._format(self._value, self._oldData)
+
+    # The raw value is decoded from the data, encoded into the data and converted to
+    # the parameter value without modifying the parameter (see Codec)
+    @abstractmethod
+    def _parse(self, data):
+        pass #pragma: no cover
+
+    @abstractmethod
+    def _format(self, raw, oldData):
         pass #pragma: no cover
 
+    def _convert(self, raw):
+        return raw
+
+    # The integer parameters give the struct format, the mask and the shift of the raw value,
+    # so that the codec unpacks them in place (see Codec)
+    def _layout(self):
+        return None
+
     def __repr__(self): #pragma: no cover
         if self._value is None:
             return f"{self.__class__.__name__}({self.name})"
@@ -165,18 +227,17 @@ class StringParameter(Parameter):
         super().__init__(name, description, offset, writable, immutable)
         self._len = length
 
-    def parseData(self, data):
-        self._value = data.decode().replace('\x00', '')
-        return self
+    def _parse(self, data):
+        return bytes(data).decode().replace('\x00', '')
 
     def parseValue(self, value):
         self._value = value
         return self
 
-    def __bytes__(self):
-        if self._value is None:
+    def _format(self, raw, oldData):
+        if raw is None:
             return bytes([0x00]*self._len)
-        b = self._value.encode()
+        b = raw.encode()
         return b + bytes([0x00]*(self._len - len(b)))
 
 
@@ -185,9 +246,8 @@ class DateTimeParameter(Parameter):
         super().__init__(*args, **kwArgs)
         self._len = 7
 
-    def parseData(self, data):
-        self._value = datetime.datetime(2000 + data[0], data[1], data[3], data[4], data[5], data[6])
-        return self
+    def _parse(self, data):
+        return datetime.datetime(2000 + data[0], data[1], data[3], data[4], data[5], data[6])
 
     def parseValue(self, value):
         self._value = datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
@@ -202,17 +262,14 @@ class DateTimeParameter(Parameter):
             return ''
         return self._value.strftime('%Y-%m-%d %H:%M:%S')
 
-    def __bytes__(self):
-        if self._value is None:
+    def _format(self, raw, oldData):
+        if raw is None:
             return bytes([0x00]*self._len)
-        return bytes([self._value.year - 2000, self._value.month, 0x00, self._value.day, self._value.hour, self._value.minute, self._value.second])
+        return bytes([raw.year - 2000, raw.month, 0x00, raw.day, raw.hour, raw.minute, raw.second])
 
 class UnsignedIntegerParameter(Parameter):
-    def parseData(self, data):
-        self._value = 0
-        for b in range(0, self._len):
-            self._value = (self._value << 8) | data[b]
-        return self
+    def _parse(self, data):
+        return int.from_bytes(data[:self._len], 'big')
 
     def parseValue(self, value):
         try:
@@ -239,14 +296,13 @@ class UnsignedIntegerParameter(Parameter):
         return f'0x{s}'
 
 
-    def __bytes__(self):
-        ba = [0x00]*self._len
-        if self._value is not None:
-            v = self._value
-            for b in range(0, self._len):
-                ba[self._len - 1 - b] = v & 0xFF
-                v >>= 8
-        return bytes(ba)
+    def _format(self, raw, oldData):
+        if raw is None:
+            return bytes([0x00]*self._len)
+        return (raw & ((1 << (8*self._len)) - 1)).to_bytes(self._len, 'big')
+
+    def _layout(self):
+        return (Parameter._Formats[self._len], (1 << (8*self._len)) - 1, 0)
 
 
 class ByteParameter(UnsignedIntegerParameter):
@@ -273,19 +329,22 @@ class EnumParameter(Parameter):
         self.__cls = enumCls
         self._len = math.ceil(math.log2(1 + max([i.value for i in self.__cls])))
         self.__bitOffset = bitOffset
-
-    @property
-    def value(self):
-        for i in self.__cls:
-            if (i.value == self._value):
-                return i
-        if self._value is not None:
-            s = f'{self._value:X}'
+        # The bytes are read as a big-endian integer, in which the value bits are masked
+        self.__bytes = (self._len + self.__bitOffset + 7) // 8
+        self.__mask = ((1 << self._len) - 1) << self.__bitOffset
+        self.__values = {i.value: i for i in self.__cls}
+        self.__names = {i.name: i for i in self.__cls}
+
+    def _convert(self, raw):
+        if raw in self.__values:
+            return self.__values[raw]
+        if raw is not None:
+            s = f'{raw:X}'
             s = '0'*(2*((self._len + 7) // 8) - len(s)) + s
             warning(f"Invalid value for enum parameter: 0x{s}")
         return None
 
-    @value.setter
+    @Parameter.value.setter
     def value(self, v):
         if v is None:
             self._value = v
@@ -294,28 +353,20 @@ class EnumParameter(Parameter):
 
     @property
     def len(self):
-        return (self._len + self.__bitOffset + 7) // 8
+        return self.__bytes
 
-    def parseData(self, data):
-        self._value = 0
-        for b in range(0, self.len):
-            if (b == 0) and (b == self.len - 1):
-                m = ((1 << self._len) - 1) << self.__bitOffset
-            elif (b == 0):
-                m = (1 << (((self._len + self.__bitOffset - 1) % 8) + 1)) - 1
-            elif (b == self.len - 1):
-                m = (0xFF << self.__bitOffset) & 0xFF
-            else:
-                m = 0xFF
-            self._value = (self._value << 8) | (data[b] & m)
-        self._value >>= self.__bitOffset
-        return self
+    def _parse(self, data):
+        return (int.from_bytes(data[:self.__bytes], 'big') & self.__mask) >> self.__bitOffset
+
+    def _layout(self):
+        if self.__bytes not in Parameter._Formats:
+            return None
+        return (Parameter._Formats[self.__bytes], self.__mask, self.__bitOffset)
 
     def parseValue(self, value):
-        for i in self.__cls:
-            if (i.name == value):
-                self._value = i.value
-                return self
+        if value in self.__names:
+            self._value = self.__names[value].value
+            return self
         values = '", "'.join([i.name for i in self.__cls])
         warning(f"Invalid value: {value} (accepted values: \"{values}\")")
         self._value = None
@@ -326,22 +377,11 @@ class EnumParameter(Parameter):
             return self.value.name
         return ''
 
-    def __bytes__(self):
-        ba = [b for b in self._oldData] if self._oldData is not None else [0x00]*self.len
-        if self._value is not None:
-            v = self._value << self.__bitOffset
-            for b in range(self.len, 0, -1):
-                if (b == 1) and (b == self.len):
-                    m = ((1 << self._len) - 1) << self.__bitOffset
-                elif (b == 1):
-                    m = (1 << (((self._len + self.__bitOffset - 1) % 8) + 1)) - 1
-                elif (b == self.len):
-                    m = (0xFF << self.__bitOffset) & 0xFF
-                else:
-                    m = 0xFF
-                ba[b - 1] = v & m | ba[b - 1] & (0xFF - m)
-                v >>= 8
-        return bytes(ba)
+    def _format(self, raw, oldData):
+        old = int.from_bytes(oldData[:self.__bytes], 'big') if oldData is not None else 0
+        if raw is not None:
+            old = ((raw << self.__bitOffset) & self.__mask) | (old & ~self.__mask)
+        return old.to_bytes(self.__bytes, 'big')
 
 
 class HalfByteParameter(Parameter):
@@ -358,9 +398,11 @@ class HalfByteParameter(Parameter):
         self.__pos = position
         self._len = 1
 
-    def parseData(self, data):
-        self._value = (data[0] & self.__pos.mask) >> self.__pos.offset
-        return self
+    def _parse(self, data):
+        return (data[0] & self.__pos.mask) >> self.__pos.offset
+
+    def _layout(self):
+        return (Parameter._Formats[1], self.__pos.mask, self.__pos.offset)
 
     def parseValue(self, value):
         try:
@@ -384,23 +426,28 @@ class HalfByteParameter(Parameter):
             return ''
         return f'0x0{self._value:X}'
 
-    def __bytes__(self):
-        oldData = self._oldData[0] if self._oldData is not None else 0x00
-        if self._value is None:
+    def _format(self, raw, oldData):
+        oldData = oldData[0] if oldData is not None else 0x00
+        if raw is None:
             return bytes([oldData])
-        return bytes([(self._value & 0x0F) << self.__pos.offset | (oldData & (0xFF - self.__pos.mask))])
+        return bytes([(raw & 0x0F) << self.__pos.offset | (oldData & (0xFF - self.__pos.mask))])
 
 
 class BitParameter(Parameter):
     def __init__(self, name, description, offset, bitOffset, writable, immutable):
         super().__init__(name, description, offset, writable, immutable)
         self.__offset = bitOffset
+        self.__mask = 1 << bitOffset
         self._len = 1
 
-    def parseData(self, data):
-        m = 1 << self.__offset
-        self._value = bool(data[0] & m)
-        return self
+    def _parse(self, data):
+        return bool(data[0] & self.__mask)
+
+    def _convert(self, raw):
+        return bool(raw) if raw is not None else None
+
+    def _layout(self):
+        return (Parameter._Formats[1], self.__mask, self.__offset)
 
     def parseValue(self, value):
         if (value == 'True') or (value == '1'):
@@ -412,27 +459,24 @@ class BitParameter(Parameter):
             self._value = None
         return self
 
-    def __bytes__(self):
-        m = 1 << self.__offset
-        oldData = self._oldData[0] if self._oldData is not None else 0x00
-        if self._value is None:
+    def _format(self, raw, oldData):
+        oldData = oldData[0] if oldData is not None else 0x00
+        if raw is None:
             return bytes([oldData])
-        return bytes([int(self._value) << self.__offset | (oldData & (0xFF - m))])
+        return bytes([int(raw) << self.__offset | (oldData & (0xFF - self.__mask))])
 
 
 class EnumBitParameter(BitParameter):
     def __init__(self, name, description, offset, bitOffset, cls, writable, immutable):
         super().__init__(name, description, offset, bitOffset, writable, immutable)
         self.__cls = cls
+        self.__values = {i.value: i for i in self.__cls}
+        self.__names = {i.name: i for i in self.__cls}
 
-    @property
-    def value(self):
-        for i in self.__cls:
-            if (i.value == self._value):
-                return i
-        return None
+    def _convert(self, raw):
+        return self.__values.get(raw)
 
-    @value.setter
+    @Parameter.value.setter
     def value(self, v):
         if v is None:
             self._value = v
@@ -440,10 +484,9 @@ class EnumBitParameter(BitParameter):
             self._value = v.value
 
     def parseValue(self, value):
-        for i in self.__cls:
-            if (i.name == value):
-                self._value = i.value
-                return self
+        if value in self.__names:
+            self._value = self.__names[value].value
+            return self
         values = '", "'.join([i.name for i in self.__cls])
         warning(f"Invalid value: {value} (accepted values: \"{values}\")")
         self._value = None
@@ -456,18 +499,17 @@ class EnumBitParameter(BitParameter):
 
 
 class FloatParameter(WordParameter):
-    @property
-    def value(self):
-        if self._value is None:
+    def _convert(self, raw):
+        if raw is None:
             return None
-        elif (self._value == 0xFFFF):
+        elif (raw == 0xFFFF):
             return float('nan')
-        elif (self._value < 0x8000):
-            return self._value / 10.
+        elif (raw < 0x8000):
+            return raw / 10.
         else:
-            return -(self._value - 0x8000) / 10.
+            return -(raw - 0x8000) / 10.
 
-    @value.setter
+    @Parameter.value.setter
     def value(self, v):
         if math.isnan(v) or math.isinf(v):
             self._value = 0xFFFF
@@ -495,11 +537,10 @@ class FloatParameter(WordParameter):
 
 
 class TimeSpanParameter(WordParameter):
-    @property
-    def value(self):
-        return self._value*10 if self._value is not None else None
+    def _convert(self, raw):
+        return raw*10 if raw is not None else None
 
-    @value.setter
+    @Parameter.value.setter
     def value(self, v):
         if (v % 10 != 0):
             warning("Time span precision is 10s. Ignoring extra precision.")
@@ -574,16 +615,15 @@ class TimeZoneParameter(Parameter):
         super().__init__(name, description, offset, writable, immutable)
         self._len = 12
 
-    @property
-    def value(self):
-        if self._value is None:
+    def _convert(self, raw):
+        if raw is None:
             return None
-        elif (self._value < 0):
-            return f'-{-self._value // 60:02d}{-self._value % 60:02d}'
+        elif (raw < 0):
+            return f'-{-raw // 60:02d}{-raw % 60:02d}'
         else:
-            return f'+{self._value // 60:02d}{self._value % 60:02d}'
+            return f'+{raw // 60:02d}{raw % 60:02d}'
 
-    @value.setter
+    @Parameter.value.setter
     def value(self, v):
         if v.startswith('+'):
             if (len(v) != 5):
@@ -604,16 +644,16 @@ class TimeZoneParameter(Parameter):
             raise ValueError(f'Invalid timezone: {v}')
         self._value = h * 60 + m
 
-    def parseData(self, data):
+    def _parse(self, data):
         h = data[0] & 0x1F
         m = data[11]
         if (h > 24) or (m >= 60) or ((h == 12) and (m != 0)):
             warning(f'Invalid timezone data: h={h}, m={m}')
+            return None
         elif (h > 12):
-            self._value = -((24 - h) * 60 + m)
+            return -((24 - h) * 60 + m)
         else:
-            self._value = h * 60 + m
-        return self
+            return h * 60 + m
 
         # s = bool(data[0] & 0x10)
         # h = data[0] & 0x0F
@@ -632,16 +672,16 @@ class TimeZoneParameter(Parameter):
             self._value = None
         return self
 
-    def __bytes__(self):
-        data = [b for b in self._oldData] if self._oldData is not None else [0x00]*12
-        if self._value is None:
+    def _format(self, raw, oldData):
+        data = [b for b in oldData] if oldData is not None else [0x00]*12
+        if raw is None:
             pass
-        elif (self._value < 0):
-            data[0] = (data[0] & 0xE0) | ((24 - (-self._value // 60)) & 0x1F)
-            data[11] = -self._value % 60
+        elif (raw < 0):
+            data[0] = (data[0] & 0xE0) | ((24 - (-raw // 60)) & 0x1F)
+            data[11] = -raw % 60
         else:
-            data[0] = (data[0] & 0xE0) | ((self._value // 60) & 0x0F)
-            data[11] = self._value % 60
+            data[0] = (data[0] & 0xE0) | ((raw // 60) & 0x0F)
+            data[11] = raw % 60
         return bytes(data)
 
 
@@ -747,16 +787,77 @@ parameters = [
     ByteParameter(    'protocol-version',             "Version number of the protocol",                                           0x95,                                   False, False),
 ]
 
+class Codec:
+    def __init__(self, params):
+        self.__index = {p.name: p for p in params}
+        # The fields are sorted by offset, so that a block is decoded in a single pass.
+        # The integer fields are unpacked in place with precompiled structs, the others are parsed from a slice
+        self.__fields = []
+        for p in sorted(params, key=lambda p: p.offset):
+            layout = p._layout()
+            if layout is not None:
+                fmt, mask, shift = layout
+                self.__fields.append((p.offset, p.offset + p.len, p.name, struct.Struct(fmt).unpack_from, mask, shift, None, p._convert))
+            else:
+                self.__fields.append((p.offset, p.offset + p.len, p.name, None, 0, 0, p._parse, p._convert))
+        self.__offsets = [f[0] for f in self.__fields]
+        # Encoding converts values with private copies of the parameters
+        self.__scratch = {p.name: (p.offset, p.len, copy.copy(p)) for p in params}
+        self.__lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.__index.values())
+
+    def __getitem__(self, key):
+        try:
+            return self.__index[key]
+        except KeyError:
+            raise KeyError(f"Unknown parameter: {key}")
+
+    def decode(self, data, start=0, names=None):
+        stop = start + len(data)
+        values = {}
+        for o, e, name, unpack, mask, shift, parse, convert in self.__fields[bisect_left(self.__offsets, start):]:
+            if (o >= stop):
+                break
+            if (e <= stop) and ((names is None) or (name in names)):
+                if unpack is not None:
+                    values[name] = convert((unpack(data, o - start)[0] & mask) >> shift)
+                else:
+                    values[name] = convert(parse(data[(o - start):(e - start)]))
+        return values
+
+    def encode(self, data, values, start=0):
+        data = bytearray(data)
+        with self.__lock:
+            for name, v in values.items():
+                if name not in self.__scratch:
+                    raise KeyError(f"Unknown parameter: {name}")
+                o, l, p = self.__scratch[name]
+                o -= start
+                if (o < 0) or (o + l > len(data)):
+                    raise ValueError(f"Parameter {name} is not in data range {Range(start, len(data))}")
+                # A None value encodes the default raw value of the parameter
+                if v is None:
+                    p._value = None
+                else:
+                    p.value = v
+                # Only the bits of the parameter are modified
+                data[o:(o + l)] = p._format(p._value, data[o:(o + l)])
+        return bytes(data)
+
+    def __repr__(self): #pragma: no cover
+        return f"Codec({len(self.__index)} parameters)"
+
+codec = Codec(parameters)
+
 class Parameters:
     def __iter__(self):
         for param in parameters:
             yield param
 
     def __getitem__(self, key):
-        for param in parameters:
-            if (param.name == key):
-                return param
-        raise KeyError(f"Unknown parameter: {key}")
+        return codec[key]
 
 
 
@@ -0,0 +1,128 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import contextvars
+import queue
+import threading
+
+from .pager import RecordPager
+
+class RecordPipeline:
+    Depth = 4
+    Timeout = 0.1
+    JoinTimeout = 1.0
+
+    def __init__(self, dev, records=slice(None), since=None, until=None, protocol=0x20, depth=None):
+        self.__dev = dev
+        self.__records = records
+        self.__since = since
+        self.__until = until
+        self.__protocol = protocol
+        self.__depth = depth or RecordPipeline.Depth
+
+    def __iter__(self):
+        pager = RecordPager(self.__dev)
+        with self.__dev:
+            start, stop, step = pager.window(self.__records, self.__since, self.__until, self.__protocol)
+
+            pages = queue.Queue(self.__depth)
+            batches = queue.Queue(self.__depth)
+            stopped = threading.Event()
+            # The stages run in the context of the caller (e.g. to write to the output of a daemon client)
+            threads = [
+                threading.Thread(target=contextvars.copy_context().run, args=(self.__read,   pager, start, stop, step, pages, stopped), daemon=True),
+                threading.Thread(target=contextvars.copy_context().run, args=(self.__decode, step, pages, batches, stopped),             daemon=True),
+            ]
+            for t in threads:
+                t.start()
+
+            try:
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        break
+                    if isinstance(batch, BaseException):
+                        raise batch
+                    yield from batch
+            finally:
+                stopped.set()
+                # A stage blocked reading the device is not waited for (e.g. on KeyboardInterrupt): the threads are daemons
+                for t in threads:
+                    t.join(RecordPipeline.JoinTimeout)
+
+    def run(self, output):
+        n = 0
+        for r, record in self:
+            output(r, record)
+            n += 1
+        return n
+
+    def __read(self, pager, start, stop, step, pages, stopped):
+        # I/O stage: keeps the device busy while pages are decoded
+        try:
+            for a in pager.pages(start, stop, step):
+                if not RecordPipeline.__put(pages, a, stopped):
+                    return
+        except BaseException as e:
+            RecordPipeline.__put(pages, e, stopped)
+        finally:
+            RecordPipeline.__put(pages, None, stopped)
+
+    def __decode(self, step, pages, batches, stopped):
+        # Decoding stage: turns pages into batches of selected records
+        try:
+            while True:
+                a = RecordPipeline.__get(pages, stopped)
+                if (a is None) or isinstance(a, BaseException):
+                    RecordPipeline.__put(batches, a, stopped)
+                    return
+
+                batch = []
+                for r, record in RecordPager.decode(a, step, self.__protocol):
+                    if (record is None) and (self.__records.stop is None):
+                        RecordPipeline.__put(batches, batch, stopped)
+                        RecordPipeline.__put(batches, None, stopped)
+                        stopped.set()
+                        return
+                    if (record is None) or RecordPager.selected(record.time, self.__since, self.__until):
+                        batch.append((r, record))
+                if not RecordPipeline.__put(batches, batch, stopped):
+                    return
+        except BaseException as e:
+            RecordPipeline.__put(batches, e, stopped)
+
+    @staticmethod
+    def __put(q, item, stopped):
+        while not stopped.is_set():
+            try:
+                q.put(item, timeout=RecordPipeline.Timeout)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def __get(q, stopped):
+        while not stopped.is_set():
+            try:
+                return q.get(timeout=RecordPipeline.Timeout)
+            except queue.Empty:
+                pass
+        return None
+
+    def __repr__(self): #pragma: no cover
+        return f"RecordPipeline({self.__dev}, {self.__records})"
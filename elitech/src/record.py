@@ -15,12 +15,56 @@
 # You should have received a copy of the GNU General Public License
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
+from array import array
 from datetime import datetime
+from datetime import timezone
 from enum import IntFlag
 from warnings import warn as warning
 
+import struct
+
+def __getattr__(name):
+    # NumPy is only imported when a batch is first parsed
+    if (name == 'numpy'):
+        try:
+            import numpy
+        except ImportError: #pragma: no cover
+            numpy = None
+        globals()['numpy'] = numpy
+        return numpy
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _numpy():
+    if 'numpy' not in globals():
+        return __getattr__('numpy')
+    return globals()['numpy']
+
+def _epoch(year, month, day, hour, minute, second):
+    # Works element-wise on NumPy integer arrays as well as on plain integers
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12*a - 3
+    jdn = day + (153*m + 2) // 5 + 365*y + y // 4 - y // 100 + y // 400 - 32045
+    return (jdn - 2440588)*86400 + hour*3600 + minute*60 + second
+
+def _timestamps(seconds):
+    # Device times are local times, like the naive datetimes of Record.parse: their timestamps
+    # are computed as datetime.timestamp() does. The time zone offsets only change on quarter hours,
+    # so that the offset is computed once per quarter hour.
+    numpy = _numpy()
+    quarters, index = numpy.unique(seconds // 900, return_inverse=True)
+    offsets = numpy.array([int(datetime.fromtimestamp(900*int(q), timezone.utc).replace(tzinfo=None).timestamp()) - 900*int(q) for q in quarters], dtype='i8')
+    return seconds + offsets[index]
+
 class Record:
     Length = 8
+    Columns = [
+        ('time',        '<i8'),
+        ('temperature', '<f8'),
+        ('humidity',    '<f8'),
+        ('flags',       'u1' ),
+        ('valid',       '?'  ),
+    ]
 
     class Flags(IntFlag):
         Zero  = 0b00000000
@@ -119,4 +163,101 @@ class Record:
             return cls(t, temperature, flags, humidity)
 
 
+    @classmethod
+    def parseBatch(cls, data, protocol=0x20):
+        data = getattr(data, 'data', data)
+        if (len(data) % cls.Length != 0):
+            raise ValueError(f"Invalid records length: {len(data)}")
+
+        if _numpy() is not None:
+            return cls.__parseBatchNumPy(data, protocol)
+        return cls.__parseBatchArray(data, protocol)
 
+    @classmethod
+    def __parseBatchNumPy(cls, data, protocol):
+        numpy = _numpy()
+        q = numpy.frombuffer(data, dtype='<u8')
+        valid = (q != 0xFFFFFFFFFFFFFFFF)
+
+        humidity    = ((q >> 54) & 0x3FF).astype('i8')
+        minute      = ((q >> 48) & 0x03F).astype('i8')
+        temperature = ((q >> 37) & 0x7FF).astype('i8')
+        hour        = ((q >> 32) & 0x01F).astype('i8')
+        day         = ((q >> 27) & 0x01F).astype('i8')
+        month       = ((q >> 23) & 0x00F).astype('i8')
+        year        = ((q >> 16) & 0x07F).astype('i8')
+        second      = ((q >> 10) & 0x03F).astype('i8')
+        flags       = ((q >>  0) & 0x0FF).astype('u1')
+
+        bit9 = ((q >> 9) & 0x01).astype('i8')
+        if (protocol >= 0x23):
+            temperature |= bit9 << 10
+        elif numpy.any(bit9[valid]):
+            warning('Ignored bit 9 is non zero')
+        if numpy.any(((q >> 8) & 0x01)[valid]):
+            warning('Ignored bit 8 is non zero')
+
+        # The invalid dates are rejected, with the same error as Record.parse
+        leap = ((year % 4 == 0) & ((year + 2000) % 100 != 0)) | ((year + 2000) % 400 == 0)
+        days = numpy.array([31, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31, 31, 31, 31])[month] + (leap & (month == 2))
+        invalid = valid & ((month < 1) | (month > 12) | (day < 1) | (day > days) | (hour > 23) | (minute > 59) | (second > 59))
+        if numpy.any(invalid):
+            i = numpy.argmax(invalid)
+            datetime(2000 + int(year[i]), int(month[i]), int(day[i]), int(hour[i]), int(minute[i]), int(second[i]))
+
+        records = numpy.zeros(len(q), dtype=cls.Columns)
+        records['time'][valid] = _timestamps(_epoch(2000 + year, month, day, hour, minute, second)[valid])
+        records['temperature'] = numpy.where(flags & cls.Flags.Sign1, -temperature, temperature) / 10
+        records['humidity'] = numpy.where(flags & cls.Flags.Sign2, -humidity, humidity) / 10
+        records['humidity'][humidity == 0] = numpy.nan
+        records['flags'] = flags
+        records['valid'] = valid
+
+        records['temperature'][~valid] = numpy.nan
+        records['humidity'][~valid] = numpy.nan
+        records['flags'][~valid] = 0
+        return records
+
+    @classmethod
+    def __parseBatchArray(cls, data, protocol):
+        records = {
+            'time':        array('q'),
+            'temperature': array('d'),
+            'humidity':    array('d'),
+            'flags':       array('B'),
+            'valid':       array('B'),
+        }
+
+        bit8 = False
+        bit9 = False
+        for (q,) in struct.iter_unpack('<Q', data):
+            if (q == 0xFFFFFFFFFFFFFFFF):
+                records['time'].append(0)
+                records['temperature'].append(float('nan'))
+                records['humidity'].append(float('nan'))
+                records['flags'].append(0)
+                records['valid'].append(False)
+                continue
+
+            humidity    = (q >> 54) & 0x3FF
+            temperature = (q >> 37) & 0x7FF
+            flags       = (q >>  0) & 0x0FF
+
+            if (protocol >= 0x23):
+                temperature |= ((q >>  9) & 0x01) << 10
+            else:
+                bit9 |= bool((q >>  9) & 0x01)
+            bit8 |= bool((q >>  8) & 0x01)
+
+            t = datetime(2000 + ((q >> 16) & 0x7F), (q >> 23) & 0x0F, (q >> 27) & 0x1F, (q >> 32) & 0x1F, (q >> 48) & 0x3F, (q >> 10) & 0x3F)
+            records['time'].append(int(t.timestamp()))
+            records['temperature'].append((-temperature if (flags & cls.Flags.Sign1) else temperature) / 10)
+            records['humidity'].append((-humidity if (flags & cls.Flags.Sign2) else humidity) / 10 if (humidity != 0) else float('nan'))
+            records['flags'].append(flags)
+            records['valid'].append(True)
+
+        if bit9:
+            warning('Ignored bit 9 is non zero')
+        if bit8:
+            warning('Ignored bit 8 is non zero')
+        return records
@@ -0,0 +1,162 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+
+import copy
+import re
+
+from .archive import Archive
+from .cache import cachePath
+from .frames import Frame
+from .image import MemoryImage
+from .pager import RecordPager
+from .parameters import Parameters
+from .parameters import Range
+from .record import Record
+
+class RecordCache:
+    Identity = ['model', 'serial-number', 'start-time', 'interval', 'protocol-version']
+
+    def __init__(self, dev):
+        self.__dev = dev
+        self.__archive = None
+        self.__data = bytes()
+        self.__protocol = 0x20
+        self.serial = None
+        self.startTime = None
+        self.new = 0
+
+    def __len__(self):
+        if self.__archive is not None:
+            return len(self.__archive)
+        return len(self.__data) // Record.Length
+
+    @property
+    def archive(self):
+        return self.__archive
+
+    @property
+    def data(self):
+        if self.__archive is not None:
+            return bytes(self.__archive.raw(0, len(self.__archive)))
+        return self.__data
+
+    def close(self):
+        if self.__archive is not None:
+            self.__archive.close()
+            self.__archive = None
+
+    def sync(self):
+        self.close()
+        with self.__dev:
+            identity = self.__readIdentity()
+            self.serial = identity['serial-number']
+            self.startTime = identity['start-time']
+            self.__protocol = identity['protocol-version']
+
+            # The devices without a serial number cannot be told apart: their records are not cached
+            if self.serial:
+                path = cachePath('records', f'{RecordCache.fileName(self.serial)}.elt')
+                try:
+                    archive = Archive(path)
+                except (OSError, ValueError):
+                    archive = None
+            else:
+                path = None
+                archive = None
+            if (archive is not None) and (archive.rawStartTime != self.startTime):
+                warning(f"A new recording was started on {self.serial}: cached records are discarded")
+                archive.close()
+                archive = None
+
+            cached = len(archive) if archive is not None else 0
+            number = RecordPager(self.__dev).count()
+            if (number < cached):
+                warning(f"Records were erased on {self.serial}: cached records are discarded")
+                archive.close()
+                archive = None
+                cached = 0
+
+            new = bytearray()
+            for a in RecordPager(self.__dev).read(cached, number):
+                if (a.range.start != Record.Length*cached + len(new)):
+                    warning(f"Missing records from {a.range.start // Record.Length + 1}")
+                    break
+                new += a.data
+
+        if path is not None:
+            self.__archive = self.__store(path, archive, identity, bytes(new))
+        else:
+            self.__data = bytes(new)
+        self.new = cached
+        return len(new) // Record.Length
+
+    def records(self, start=0, protocol=None):
+        if protocol is None:
+            protocol = self.__archive.protocol if self.__archive is not None else self.__protocol
+        for r in range(start, len(self)):
+            if self.__archive is not None:
+                yield r, Record.parse(self.__archive.raw(r), protocol)
+            else:
+                yield r, Record.parse(self.__data[(Record.Length*r):(Record.Length*(r + 1))], protocol)
+
+    @staticmethod
+    def fileName(serial):
+        return re.sub('[^0-9A-Za-z_-]', '_', serial) or '_'
+
+    def __readIdentity(self):
+        # The parameters are copied, as the caches of a fleet run in several threads
+        parameters = [copy.copy(Parameters()[p]) for p in RecordCache.Identity]
+
+        answers = []
+        for r in Range.plan([p.range for p in parameters], Frame.MaxLength):
+            frame = Frame(Frame.Operation.GetParameter, r.start, r.len)
+            self.__dev.write(bytes(frame))
+            try:
+                answers.append(frame.parse(self.__dev.read()))
+            except ValueError as e:
+                warning(f"Got invalid response ({str(e)})")
+        image = MemoryImage(*answers)
+
+        identity = {}
+        for p in parameters:
+            if p.range not in image:
+                raise ValueError(f"Could not read {p.name}")
+            identity[p.name] = image[p.range]
+
+        try:
+            identity['serial-number'] = parameters[1].parseData(identity['serial-number']).value
+        except ValueError:
+            raise ValueError(f"Invalid serial number: {identity['serial-number']}")
+        for p in [parameters[0], parameters[3], parameters[4]]:
+            identity[p.name] = p.parseData(identity[p.name]).value
+        return identity
+
+    def __store(self, path, archive, identity, new):
+        try:
+            if archive is not None:
+                archive.append(new)
+                return archive
+            path.parent.mkdir(parents=True, exist_ok=True)
+            return Archive.create(path, identity['serial-number'], identity['model'], identity['protocol-version'], identity['start-time'], identity['interval'], new)
+        except OSError as e:
+            warning(f"Could not store records in cache ({str(e)})")
+            self.__data = (bytes(archive.raw(0, len(archive))) if archive is not None else bytes()) + new
+            if archive is not None:
+                archive.close()
+            return None
@@ -0,0 +1,232 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from warnings import warn as warning
+from pathlib import Path
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+from .device import Device
+
+class Inotify:
+    MovedFrom = 0x00000040
+    MovedTo = 0x00000080
+    Create = 0x00000100
+    Delete = 0x00000200
+    Overflow = 0x00004000
+    Event = struct.Struct('iIII')
+
+    def __init__(self):
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            init = self.__libc.inotify_init1
+        except AttributeError:
+            raise OSError("inotify is not available")
+        self.__fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if (self.__fd < 0):
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.__paths = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def fileno(self):
+        return self.__fd
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def add(self, path, mask):
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if (wd < 0):
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), str(path))
+        self.__paths[wd] = Path(path)
+        return wd
+
+    def read(self, timeout=0):
+        if timeout != 0:
+            select.select([self.__fd], [], [], timeout)
+        try:
+            data = os.read(self.__fd, 0x10000)
+        except BlockingIOError:
+            return []
+
+        events = []
+        o = 0
+        while (o + Inotify.Event.size <= len(data)):
+            wd, mask, cookie, l = Inotify.Event.unpack_from(data, o)
+            o += Inotify.Event.size
+            name = data[o:(o + l)].rstrip(b'\x00').decode()
+            o += l
+            events.append((self.__paths.get(wd), mask, name))
+        return events
+
+
+class RegistryEntry:
+    def __init__(self, info, classPath):
+        self.info = info
+        self.serial = None
+        self.model = None
+        self.protocol = None
+        self.__sysPath = classPath / info.path.name
+        self.__descriptor = None
+
+    @property
+    def path(self):
+        return self.info.path
+
+    @property
+    def descriptor(self):
+        if self.__descriptor is None:
+            with open(self.__sysPath / 'device' / 'report_descriptor', 'rb') as f:
+                self.__descriptor = f.read()
+        return self.__descriptor
+
+    @property
+    def identified(self):
+        return self.serial is not None
+
+    def __repr__(self): #pragma: no cover
+        return f"RegistryEntry({self.info.path}, {self.serial})"
+
+
+class DeviceRegistry:
+    Mask = Inotify.Create | Inotify.Delete | Inotify.MovedFrom | Inotify.MovedTo
+
+    def __init__(self, classPath=None, devPath=None, factory=None):
+        self.__classPath = Path('/sys/class/hidraw') if classPath is None else Path(classPath)
+        self.__devPath = Path('/dev') if devPath is None else Path(devPath)
+        self.__factory = factory or (lambda info, descriptor=None: Device.fromInfo(info, self.__classPath, descriptor))
+        self.__entries = {}
+        self.__serials = {}
+
+        try:
+            self.__inotify = Inotify()
+            self.__inotify.add(self.__classPath, DeviceRegistry.Mask)
+            self.__inotify.add(self.__devPath, DeviceRegistry.Mask)
+        except OSError as e:
+            warning(f"Hotplug events are not available ({str(e)}): the devices will be rescanned")
+            self.__inotify = None
+        self.rescan()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    def close(self):
+        if self.__inotify is not None:
+            self.__inotify.close()
+            self.__inotify = None
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __iter__(self):
+        return iter(list(self.__entries.values()))
+
+    def __getitem__(self, serial):
+        return self.__serials[serial]
+
+    def __contains__(self, serial):
+        return serial in self.__serials
+
+    def get(self, path):
+        return self.__entries.get(Path(path).name)
+
+    def rescan(self):
+        names = set()
+        for info in Device.scan(self.__classPath, self.__devPath):
+            if not info.path.exists():
+                continue
+            names.add(info.path.name)
+            if info.path.name not in self.__entries:
+                self.__add(info)
+        for name in set(self.__entries) - names:
+            self.__remove(name)
+
+    def update(self, timeout=0):
+        if self.__inotify is None:
+            self.rescan()
+            return
+
+        for path, mask, name in self.__inotify.read(timeout):
+            if mask & Inotify.Overflow:
+                self.rescan()
+            elif not name.startswith('hidraw'):
+                continue
+            elif mask & (Inotify.Delete | Inotify.MovedFrom):
+                self.__remove(name)
+            elif (mask & (Inotify.Create | Inotify.MovedTo)) and (name not in self.__entries):
+                # sysfs does not send events: the device is added when its node appears in /dev
+                info = Device.info(self.__classPath / name, self.__devPath)
+                if (info is not None) and info.path.exists():
+                    self.__add(info)
+
+    def device(self, entry):
+        if type(entry) is str:
+            entry = self.__serials[entry]
+        # The report descriptor read by the entry is passed to the device, which does not read it again
+        try:
+            descriptor = entry.descriptor
+        except OSError:
+            descriptor = None
+        return self.__factory(entry.info, descriptor=descriptor)
+
+    def identify(self, entry=None):
+        entries = [entry] if (entry is not None) else [e for e in self.__entries.values() if not e.identified]
+        for e in entries:
+            if e.identified:
+                continue
+            try:
+                values = self.device(e).getParameters('model', 'serial-number', 'protocol-version')
+            except (OSError, ValueError) as err:
+                warning(f"Could not identify {e.path} ({str(err)})")
+                continue
+            if ('serial-number' not in values):
+                warning(f"Could not identify {e.path}")
+                continue
+            e.model = values.get('model')
+            e.serial = values['serial-number']
+            e.protocol = values.get('protocol-version')
+            self.__serials[e.serial] = e
+        return [e for e in entries if e.identified]
+
+    def __add(self, info):
+        self.__entries[info.path.name] = RegistryEntry(info, self.__classPath)
+
+    def __remove(self, name):
+        entry = self.__entries.pop(name, None)
+        if (entry is not None) and entry.identified and (self.__serials.get(entry.serial) is entry):
+            del self.__serials[entry.serial]
+
+    def __repr__(self): #pragma: no cover
+        return f"DeviceRegistry({self.__classPath}, {self.__devPath})"
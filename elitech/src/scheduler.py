@@ -0,0 +1,138 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from collections import deque
+from enum import Enum
+
+import threading
+import time
+
+class Priority(Enum):
+    Interactive = 0
+    Bulk = 1
+
+
+class SchedulerMetrics:
+    def __init__(self):
+        self.frames = 0
+        self.depth = 0
+        self.maxDepth = 0
+        self.wait = 0.0
+        self.maxWait = 0.0
+        self.latency = 0.0
+        self.maxLatency = 0.0
+
+    @property
+    def meanWait(self):
+        return self.wait / self.frames if (self.frames > 0) else 0.0
+
+    @property
+    def meanLatency(self):
+        return self.latency / self.frames if (self.frames > 0) else 0.0
+
+    def __repr__(self): #pragma: no cover
+        return f"SchedulerMetrics({self.frames}, {self.depth}, {self.meanLatency})"
+
+
+class FrameScheduler:
+    # Frames are exchanged one at a time, the next frame being the oldest one of the highest priority class.
+    # Since the frames of a long transfer are scheduled one by one, interactive frames are interleaved between them.
+
+    def __init__(self, dev):
+        self.__dev = dev
+        self.__condition = threading.Condition()
+        self.__queues = {p: deque() for p in Priority}
+        self.__busy = False
+        self.metrics = {p: SchedulerMetrics() for p in Priority}
+
+    def device(self, priority=Priority.Interactive):
+        return ScheduledDevice(self, self.__dev, priority)
+
+    def exchange(self, request, priority=Priority.Interactive):
+        metrics = self.metrics[priority]
+        ticket = object()
+
+        t0 = time.perf_counter()
+        with self.__condition:
+            self.__queues[priority].append(ticket)
+            metrics.depth += 1
+            metrics.maxDepth = max(metrics.maxDepth, metrics.depth)
+            while self.__busy or (self.__next() is not ticket):
+                self.__condition.wait()
+            self.__queues[priority].popleft()
+            metrics.depth -= 1
+            self.__busy = True
+
+        t1 = time.perf_counter()
+        try:
+            self.__dev.write(request)
+            return self.__dev.read()
+        finally:
+            t2 = time.perf_counter()
+            with self.__condition:
+                self.__busy = False
+                metrics.frames += 1
+                metrics.wait += t1 - t0
+                metrics.maxWait = max(metrics.maxWait, t1 - t0)
+                metrics.latency += t2 - t0
+                metrics.maxLatency = max(metrics.maxLatency, t2 - t0)
+                self.__condition.notify_all()
+
+    def __next(self):
+        for p in Priority:
+            if self.__queues[p]:
+                return self.__queues[p][0]
+        return None
+
+    def __repr__(self): #pragma: no cover
+        return f"FrameScheduler({self.__dev})"
+
+
+class ScheduledDevice:
+    # Device view, whose requests are exchanged by the scheduler with the given priority
+
+    def __init__(self, scheduler, dev, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.__dev = dev
+        self.__request = None
+
+    def __bool__(self):
+        return bool(self.__dev)
+
+    def __enter__(self):
+        self.__dev.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        return self.__dev.__exit__(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.__dev, name)
+
+    def write(self, frame):
+        self.__request = frame
+
+    def read(self):
+        if self.__request is None:
+            raise ValueError("No request to exchange")
+        request = self.__request
+        self.__request = None
+        return self.scheduler.exchange(request, self.priority)
+
+    def __repr__(self): #pragma: no cover
+        return repr(self.__dev)
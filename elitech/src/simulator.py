@@ -0,0 +1,260 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+
+import copy
+import os
+import select
+import tempfile
+import threading
+import time
+import tty
+
+from .device import Device
+from .frames import Frame
+from .parameters import Parameters
+
+class Fault(Enum):
+    Drop = 0        # The request is not answered (Device, which reads without timeout, blocks forever)
+    Checksum = 1    # The answer checksum is wrong
+    Header = 2      # The answer header is wrong
+    Offset = 3      # The answer offset does not match the request
+
+class Simulator:
+    ImageSize = 0x200
+    # Usage page, usage, collection, logical min/max, usage min/max, report count and size, input, usage min/max, output, end collection
+    Descriptor = '05 01 09 00 a1 01 15 00 25 ff 19 01 {usageMax} {count} 75 08 81 02 19 01 {usageMax} 91 02 c0'
+
+    def __init__(self, records=None, protocol=0x20, reportSize=64, latency=0, faults=None, image=None,
+                 model=0x3005, serial='EL0000000001', capacity=16000, maxRecords=None, vendorId=0x04D8, productId=0x3005,
+                 startTime=datetime(2024, 1, 1)):
+        if (reportSize < 20) or (reportSize > 0xFFFF):
+            raise ValueError(f"Invalid report size: {reportSize}")
+        self.reportSize = reportSize
+        self.maxRecords = min(30, (reportSize - 12) // 8) if maxRecords is None else maxRecords
+        self.latency = latency
+        self.faults = faults if faults is not None else {}
+        self.vendorId = vendorId
+        self.productId = productId
+
+        self.image = bytearray(Simulator.ImageSize)
+        if image is not None:
+            self.image[:len(image)] = image
+        else:
+            self.set('model', model)
+            self.set('serial-number', serial)
+            self.set('device-capacity', capacity)
+            self.set('protocol-version', protocol)
+            for name in ('configuration-time', 'start-time', 'stop-time', 'device-time'):
+                self.set(name, startTime)
+        self.records = [bytes(r) for r in records] if records is not None else []
+        self.set('record-number', len(self.records))
+        self.stopped = False
+        self.requests = []
+
+        self.path = None
+        self.classPath = None
+        self.__dir = None
+        self.__master = None
+        self.__slave = None
+        self.__stop = None
+        self.__thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+    @staticmethod
+    def record(t, flags=0):
+        # Encodes a record with the time of the measure (the temperature and humidity are zero)
+        q = (t.minute << 48) | (t.hour << 32) | (t.day << 27) | (t.month << 23) | ((t.year - 2000) << 16) | (t.second << 10) | flags
+        return q.to_bytes(8, 'little')
+
+    def get(self, name):
+        p = copy.copy(Parameters()[name])
+        return p.parseData(bytes(self.image[p.offset:(p.offset + p.len)])).value
+
+    def set(self, name, value):
+        p = copy.copy(Parameters()[name])
+        if type(value) is str:
+            p.parseValue(value)
+        else:
+            p.value = value
+        self.image[p.offset:(p.offset + p.len)] = bytes(p | bytes(self.image[p.offset:(p.offset + p.len)]))
+
+    @property
+    def descriptor(self):
+        usageMax = f'29 {self.reportSize:02x}' if (self.reportSize < 0x100) else f'2a {self.reportSize & 0xFF:02x} {self.reportSize >> 8:02x}'
+        count = f'95 {self.reportSize:02x}' if (self.reportSize < 0x100) else f'96 {self.reportSize & 0xFF:02x} {self.reportSize >> 8:02x}'
+        return bytes.fromhex(Simulator.Descriptor.format(usageMax=usageMax, count=count))
+
+    def device(self):
+        return Device(self.path, self.classPath)
+
+    def loopback(self):
+        return LoopbackDevice(self)
+
+    def answer(self, request):
+        n = len(self.requests)
+        self.requests.append(bytes(request))
+        fault = self.faults(n, request) if callable(self.faults) else self.faults.get(n)
+
+        if (self.latency > 0):
+            time.sleep(self.latency)
+        if (fault == Fault.Drop):
+            return None
+
+        if (len(request) < 12) or (request[0:3] != bytes([0x33, 0xCC, 0x00])) or (request[3] < 12) or (request[3] > len(request)) \
+                or (request[request[3] - 1] != sum(request[:(request[3] - 1)]) & 0xFF):
+            return bytes(self.reportSize)
+
+        op = (request[5] << 8) | request[4]
+        o = (request[9] << 16) + (request[7] << 8) + request[8]
+        l = request[10]
+        if (op == Frame.Operation.GetRecord.value):
+            # The memory after the last record is erased
+            l = min(l, self.maxRecords)
+            data = b''.join([self.records[r] if (r < len(self.records)) else bytes([0xFF]*8) for r in range(o, o + l)])
+        elif (op == Frame.Operation.GetParameter.value):
+            l = max(0, min(l, Simulator.ImageSize - o))
+            data = bytes(self.image[o:(o + l)])
+        elif (op == Frame.Operation.SetParameter.value):
+            self.image[o:(o + l)] = request[11:(11 + l)]
+            l, data = 1, b'\x01'
+        elif (op == Frame.Operation.StopCommand.value):
+            self.stopped = True
+            l, data = 1, b'\x01'
+        elif (op == Frame.Operation.FormatCommand.value):
+            self.records = []
+            self.set('record-number', 0)
+            self.stopped = False
+            l, data = 1, b'\x01'
+        else:
+            return bytes(self.reportSize)
+
+        answer = bytearray(request[:10]) + bytes([l]) + data
+        answer[3] = len(answer) + 1
+        answer.append(sum(answer) & 0xFF)
+        if (fault == Fault.Checksum):
+            answer[-1] ^= 0xFF
+        elif (fault == Fault.Header):
+            answer[0] ^= 0xFF
+        elif (fault == Fault.Offset):
+            answer[8] = (answer[8] + 1) & 0xFF
+            answer[-1] = sum(answer[:-1]) & 0xFF
+        return bytes(answer) + bytes(self.reportSize - len(answer))
+
+    def start(self, root=None):
+        # The simulated logger is exposed through a pseudo terminal (in raw mode),
+        # with a minimal sysfs tree giving its identifiers and its report descriptor.
+        if root is None:
+            self.__dir = tempfile.TemporaryDirectory()
+            root = self.__dir.name
+        root = Path(root)
+
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        self.__stop = os.pipe()
+
+        usbPath = root / 'sys' / 'devices' / 'pci0000:00' / '0000:00:14.0' / 'usb1' / '1-1'
+        hidPath = usbPath / '1-1:1.0' / f'0003:{self.vendorId:04X}:{self.productId:04X}.0001'
+        (hidPath / 'hidraw' / 'hidraw0').mkdir(parents=True, exist_ok=True)
+        (hidPath / 'uevent').write_text(f'DRIVER=hid-generic\nHID_ID=0003:{self.vendorId:08X}:{self.productId:08X}\nHID_NAME=Simulator\n')
+        (hidPath / 'report_descriptor').write_bytes(self.descriptor)
+        (usbPath / 'idVendor').write_text(f'{self.vendorId:04x}\n')
+        (usbPath / 'idProduct').write_text(f'{self.productId:04x}\n')
+        (hidPath / 'hidraw' / 'hidraw0' / 'device').symlink_to(hidPath)
+        self.classPath = root / 'sys' / 'class' / 'hidraw'
+        self.classPath.mkdir(parents=True, exist_ok=True)
+        (self.classPath / 'hidraw0').symlink_to(hidPath / 'hidraw' / 'hidraw0')
+        (root / 'dev').mkdir(exist_ok=True)
+        self.path = root / 'dev' / 'hidraw0'
+        self.path.symlink_to(os.ttyname(self.__slave))
+
+        self.__thread = threading.Thread(target=self.__serve, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__thread is None:
+            return
+        os.write(self.__stop[1], b'\x00')
+        self.__thread.join()
+        self.__thread = None
+        for fd in (self.__master, self.__slave) + self.__stop:
+            os.close(fd)
+        if self.__dir is not None:
+            self.__dir.cleanup()
+            self.__dir = None
+
+    def __serve(self):
+        request = b''
+        while True:
+            ready, _, _ = select.select([self.__master, self.__stop[0]], [], [])
+            if self.__stop[0] in ready:
+                return
+            request += os.read(self.__master, self.reportSize - len(request))
+            if (len(request) < self.reportSize):
+                continue
+            answer = self.answer(request)
+            request = b''
+            if answer is not None:
+                os.write(self.__master, answer)
+
+    def __repr__(self): #pragma: no cover
+        return f"Simulator({self.path})"
+
+
+class LoopbackDevice:
+    # In-process device stand-in, which exchanges the frames directly with the simulator
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.path = None
+        self.inReportSize = simulator.reportSize
+        self.outReportSize = simulator.reportSize
+        self.vendorId = simulator.vendorId
+        self.productId = simulator.productId
+        self.__answer = None
+
+    def __bool__(self):
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, frame):
+        self.__answer = self.simulator.answer(frame + bytes(self.outReportSize - len(frame)))
+
+    def read(self):
+        answer = self.__answer
+        self.__answer = None
+        if answer is None:
+            raise TimeoutError("Simulator did not answer")
+        return answer
+
+    def __repr__(self): #pragma: no cover
+        return "LoopbackDevice"
@@ -22,11 +22,30 @@ sys.path.insert(0, str(Path(__file__).parents[2]))
 
 from .test_warning_filter import TestWarningFilter
 from .test_device     import TestDevice
+from .test_asyncdevice import TestAsyncDevice
+from .test_scan       import TestDeviceScan
+from .test_registry   import TestDeviceRegistry
+from .test_descriptor import TestReportSizes
 from .test_frame      import TestFrame
 from .test_response   import TestResponse
+from .test_image      import TestMemoryImage
+from .test_image      import TestConfigImage
 from .test_record     import TestRecord
 from .test_range      import TestRange
 from .test_slice      import TestSliceFromString
+from .test_slice      import TestTimeFromString
+from .test_pager      import TestRecordPager
+from .test_pipeline   import TestRecordPipeline
+from .test_archive   import TestArchive
+from .test_configcache import TestConfigCache
+from .test_recordcache import TestRecordCache
+from .test_fleet     import TestFleet
+from .test_daemon    import TestDaemon
+from .test_broker    import TestRequestBroker
+from .test_scheduler import TestFrameScheduler
+from .test_simulator import TestSimulator
+from .test_bench     import TestBenchmark
+from .test_startup   import TestStartup
 from .test_response   import TestResponse
 from .test_parameters import *
 #from .test_commands   import *
@@ -0,0 +1,141 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.archive import Archive
+from elitech.src.record import Record
+
+from .test_pager import encodeRecord
+
+from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
+
+import os
+import tempfile
+
+def makeRecords(n):
+    t0 = datetime(2024, 1, 31, 8, 0, 0)
+    return b''.join([encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, n)])
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.__dir.name) / 'archive.elt'
+
+    def tearDown(self):
+        self.__dir.cleanup()
+
+    def create(self, data=bytes()):
+        return Archive.create(self.path, 'EF1234567890', 0x5210, 0x23, bytes([24, 1, 0, 31, 8, 0, 0]), 60, data)
+
+    def testHeader(self):
+        with self.create() as archive:
+            pass
+        with Archive(self.path) as archive:
+            self.assertEqual(archive.serial, 'EF1234567890')
+            self.assertEqual(archive.model, 0x5210)
+            self.assertEqual(archive.protocol, 0x23)
+            self.assertEqual(archive.startTime, datetime(2024, 1, 31, 8, 0, 0))
+            self.assertEqual(archive.rawStartTime, bytes([24, 1, 0, 31, 8, 0, 0]))
+            self.assertEqual(archive.interval, 60)
+            self.assertEqual(len(archive), 0)
+        self.assertEqual(os.path.getsize(self.path), Archive.Header.size)
+
+    @testdata.TestData([
+        {'records':   0},
+        {'records':   1},
+        {'records': 100},
+    ])
+    def testRandomAccess(self, records):
+        data = makeRecords(records)
+        with self.create(data) as archive:
+            self.assertEqual(len(archive), records)
+            for r in range(0, records):
+                self.assertEqual(bytes(archive.raw(r)), data[(8*r):(8*(r + 1))])
+                self.assertEqual(archive[r].time, Record.parse(data[(8*r):(8*(r + 1))]).time)
+            if (records > 0):
+                self.assertEqual(archive[-1].time, datetime(2024, 1, 31, 8, 0, 0) + timedelta(minutes=records - 1))
+                self.assertEqual([r.time for r in archive[::10]], [Record.parse(data[(8*r):(8*(r + 1))]).time for r in range(0, records, 10)])
+            with self.assertRaises(IndexError):
+                archive.raw(records)
+
+    def testRawZeroCopy(self):
+        with self.create(makeRecords(10)) as archive:
+            view = archive.raw(2, 5)
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(len(view), 24)
+            del view
+
+    @testdata.TestData([
+        {'before':  0, 'after':  1},
+        {'before': 10, 'after': 11},
+        {'before': 10, 'after': 50},
+    ])
+    def testAppend(self, before, after):
+        data = makeRecords(after)
+        with self.create(data[:(8*before)]) as archive:
+            self.assertEqual(len(archive), before)
+            archive.append(data[(8*before):])
+            self.assertEqual(len(archive), after)
+            self.assertEqual(bytes(archive.raw(0, after)), data)
+        with Archive(self.path) as archive:
+            self.assertEqual(bytes(archive.raw(0, len(archive))), data)
+
+    def testAppendPartial(self):
+        data = makeRecords(3)
+        with self.create(data[:8]) as archive:
+            with open(self.path, 'ab') as f:
+                f.write(data[8:12])
+            self.assertEqual(len(archive), 1)
+            archive.append(data[8:])
+            self.assertEqual(len(archive), 3)
+            self.assertEqual(bytes(archive.raw(0, 3)), data)
+
+    def testBatch(self):
+        data = makeRecords(20)
+        with self.create(data) as archive:
+            batch = archive.batch(5, 15)
+            self.assertEqual(len(batch['time']), 10)
+
+    @testdata.TestData([
+        {'length': 7},
+        {'length': 9},
+    ])
+    def testInvalidLength(self, length):
+        with self.assertRaises(ValueError) as e:
+            self.create(bytes(length))
+        self.assertEqual(str(e.exception), f"Invalid records length: {length}")
+        with self.create() as archive:
+            with self.assertRaises(ValueError) as e:
+                archive.append(bytes(length))
+            self.assertEqual(str(e.exception), f"Invalid records length: {length}")
+
+    @testdata.TestData([
+        {'data': b'',                                   'error': "Invalid archive header length: 0" },
+        {'data': b'ELTB' + bytes(Archive.Header.size - 4), 'error': "Invalid archive magic: b'ELTB'" },
+        {'data': b'ELTA\x02' + bytes(Archive.Header.size - 5), 'error': "Unsupported archive version: 2" },
+    ])
+    def testInvalidHeader(self, data, error):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        with self.assertRaises(ValueError) as e:
+            Archive(self.path)
+        self.assertEqual(str(e.exception), error)
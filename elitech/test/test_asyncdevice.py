@@ -0,0 +1,199 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from PythonUtils import testdata
+
+from elitech.src.asyncdevice import AsyncDevice
+from elitech.src.cache import loadJson
+from elitech.src.configcache import ConfigCache
+from elitech.src.parameters import Range
+
+from .test_pager import CacheDir
+from .test_pager import FakeDevice
+from .test_pager import encodeRecord
+
+from contextlib import redirect_stdout
+from datetime import datetime
+from datetime import timedelta
+
+import asyncio
+import io
+import os
+import socket
+
+class Responder:
+    def __init__(self, fake, silent=False):
+        self.fake = fake
+        self.fake.path = '/dev/hidraw99'
+        self.silent = silent
+        self.__sock, self.__peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.__sock.setblocking(False)
+        self.__peer.setblocking(False)
+
+    def __enter__(self):
+        asyncio.get_running_loop().add_reader(self.__peer.fileno(), self.__answer)
+        return self
+
+    def __exit__(self, *args):
+        asyncio.get_running_loop().remove_reader(self.__peer.fileno())
+        self.__sock.close()
+        self.__peer.close()
+        return False
+
+    def device(self, **kwArgs):
+        return self.reopen(AsyncDevice(self.fake, **kwArgs))
+
+    def reopen(self, dev):
+        with unittest.mock.patch('os.open', return_value=os.dup(self.__sock.fileno())):
+            return dev.open()
+
+    def __answer(self):
+        request = self.__peer.recv(1024)
+        self.fake.write(request)
+        if not self.silent:
+            self.__peer.send(self.fake.read())
+
+def makeDevice(records=0):
+    t0 = datetime(2024, 1, 31, 8, 0, 0)
+    dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, records)])
+    dev.config[0x02:0x0E] = b'EF1234567890'
+    dev.config[0x4C:0x4E] = bytes([0x00, 0x06])
+    return dev
+
+class TestAsyncDevice(unittest.TestCase):
+    def testGetParameters(self):
+        async def run():
+            with Responder(makeDevice()) as responder:
+                async with responder.device() as dev:
+                    return await dev.getParameters('serial-number', 'interval')
+        self.assertEqual(asyncio.run(run()), {'serial-number': 'EF1234567890', 'interval': 60})
+
+    @testdata.TestData([
+        {'records':  0, 'slice': slice(None, None, None), 'indices': []                  },
+        {'records': 20, 'slice': slice(None, None, None), 'indices': list(range(0, 20))   },
+        {'records': 20, 'slice': slice(1, 18, 4),         'indices': list(range(1, 18, 4))},
+        {'records': 20, 'slice': slice(15, 25, None),     'indices': list(range(15, 25))  },
+    ])
+    def testGetRecords(self, records, slice, indices):
+        async def run():
+            with Responder(makeDevice(records)) as responder:
+                async with responder.device() as dev:
+                    return await dev.getRecords(slice)
+        result = asyncio.run(run())
+        self.assertEqual([r for r, record in result], indices)
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        self.assertEqual([record.time for r, record in result if (r < records)], [t0 + timedelta(minutes=r) for r in indices if (r < records)])
+
+    def testGetRecordsSmallReports(self):
+        async def run():
+            dev = makeDevice(20)
+            dev.inReportSize = 32
+            with Responder(dev) as responder:
+                async with responder.device() as dev:
+                    return await dev.getRecords()
+        result = asyncio.run(run())
+        self.assertEqual([r for r, record in result], list(range(0, 20)))
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        self.assertEqual([record.time for r, record in result], [t0 + timedelta(minutes=r) for r in range(0, 20)])
+
+    def testGetRecordsSinceUntil(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        async def run():
+            with Responder(makeDevice(100)) as responder:
+                async with responder.device() as dev:
+                    return await dev.getRecords(since=t0 + timedelta(minutes=25), until=t0 + timedelta(minutes=30))
+        self.assertEqual([r for r, record in asyncio.run(run())], list(range(25, 31)))
+
+    def testSetParameters(self):
+        async def run():
+            with Responder(makeDevice()) as responder:
+                async with responder.device() as dev:
+                    self.assertTrue(await dev.setParameters({'interval': '5m'}))
+                    return await dev.getParameters('interval', 'serial-number')
+        self.assertEqual(asyncio.run(run()), {'interval': 300, 'serial-number': 'EF1234567890'})
+
+    def testSetParametersCache(self):
+        async def run(responder):
+            async with responder.device() as dev:
+                for frames in [3, 2]:
+                    n = len(responder.fake.requests)
+                    self.assertTrue(await dev.setParameters({'start-delay': str(frames)}))
+                    # The serial number is read along with the old values, until it is known
+                    self.assertEqual(len(responder.fake.requests), n + frames)
+                    self.assertNotIn('EF1234567890', loadJson(ConfigCache.CacheName, {}))
+                    with redirect_stdout(io.StringIO()):
+                        ConfigCache(responder.fake).read([Range(0x40, 2)])
+                    self.assertIn('EF1234567890', loadJson(ConfigCache.CacheName, {}))
+                # The serial number is only written when it is modified
+                return [r for r in responder.fake.requests if (r[4:6] == b'\x04\x00')]
+        async def main():
+            with Responder(makeDevice()) as responder:
+                return await run(responder)
+        with CacheDir():
+            writes = asyncio.run(main())
+        self.assertEqual([((r[9] << 16) + (r[7] << 8) + r[8], r[10]) for r in writes], [(0x41, 1), (0x41, 1)])
+
+    def testSetParametersReplugged(self):
+        async def run():
+            with Responder(makeDevice()) as responder:
+                dev = responder.device()
+                self.assertTrue(await dev.setParameters({'start-delay': '1'}))
+                dev.close()
+                # Another logger is plugged at the same path
+                responder.fake.config[0x02:0x0E] = b'EF0000000002'
+                with redirect_stdout(io.StringIO()):
+                    ConfigCache(responder.fake).read([Range(0x40, 2)])
+                responder.reopen(dev)
+                self.assertTrue(await dev.setParameters({'start-delay': '2'}))
+                dev.close()
+        with CacheDir():
+            asyncio.run(run())
+            self.assertNotIn('EF0000000002', loadJson(ConfigCache.CacheName, {}))
+
+    @testdata.TestData([
+        {'values': {'serial-number': 'EF0000000000'}, 'error': "Read-only parameter: serial-number"                },
+        {'values': {'configuration-time': 'abc'},     'error': "Invalid value for parameter: configuration-time"},
+    ])
+    def testSetParametersInvalid(self, values, error):
+        async def run():
+            with Responder(makeDevice()) as responder:
+                async with responder.device() as dev:
+                    await dev.setParameters(values)
+        with self.assertRaises(ValueError) as e:
+            asyncio.run(run())
+        self.assertEqual(str(e.exception), error)
+
+    def testTimeout(self):
+        async def run():
+            with Responder(makeDevice(), silent=True) as responder:
+                async with responder.device(timeout=0.05) as dev:
+                    await dev.getParameters('serial-number')
+        with self.assertRaises(TimeoutError) as e:
+            asyncio.run(run())
+        self.assertEqual(str(e.exception), "Device \"/dev/hidraw99\" did not answer in time")
+
+    def testConcurrent(self):
+        async def read(records):
+            with Responder(makeDevice(records)) as responder:
+                async with responder.device() as dev:
+                    return len(await dev.getRecords())
+        async def run():
+            return await asyncio.gather(read(10), read(20), read(30))
+        self.assertEqual(asyncio.run(run()), [10, 20, 30])
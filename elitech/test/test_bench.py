@@ -0,0 +1,76 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.bench import compare
+from elitech.bench import load
+from elitech.bench import measure
+from elitech.bench import save
+
+from pathlib import Path
+
+import json
+import tempfile
+
+class TestBenchmark(unittest.TestCase):
+    @testdata.TestData([
+        {'old': 1.0, 'new': 1.0,  'status': ''           },
+        {'old': 1.0, 'new': 1.09, 'status': ''           },
+        {'old': 1.0, 'new': 1.2,  'status': 'regression' },
+        {'old': 1.0, 'new': 0.95, 'status': ''           },
+        {'old': 1.0, 'new': 0.8,  'status': 'improvement'},
+        {'old': 0.0, 'new': 0.1,  'status': 'regression' },
+    ])
+    def testCompare(self, old, new, status):
+        comparison = compare({'a': old, 'b': 1.0}, {'a': new, 'c': 1.0}, 0.1)
+        self.assertEqual(len(comparison), 1)
+        self.assertEqual(comparison[0][0:3], ('a', old, new))
+        self.assertEqual(comparison[0][4], status)
+
+    def testThreshold(self):
+        self.assertEqual(compare({'a': 1.0}, {'a': 1.2}, 0.5)[0][4], '')
+        self.assertEqual(compare({'a': 1.0}, {'a': 1.2}, 0.1)[0][4], 'regression')
+
+    def testSaveLoad(self):
+        results = {'micro.frame.bytes': 1e-6, 'macro.download': 0.025}
+        with tempfile.TemporaryDirectory() as d:
+            save(Path(d) / 'results.json', results)
+            self.assertEqual(load(Path(d) / 'results.json'), results)
+
+            with open(Path(d) / 'results.json', 'rt') as f:
+                data = json.load(f)
+            data['version'] = 0
+            with open(Path(d) / 'results.json', 'wt') as f:
+                json.dump(data, f)
+            with self.assertRaises(ValueError):
+                load(Path(d) / 'results.json')
+
+    @testdata.TestData([
+        {'number': None},
+        {'number': 10  },
+    ])
+    def testMeasure(self, number):
+        calls = []
+        t = measure(lambda: calls.append(None), number, repeat=3)
+        self.assertGreater(t, 0)
+        if number is not None:
+            self.assertEqual(len(calls), 3*number)
+        else:
+            self.assertGreater(len(calls), 3)
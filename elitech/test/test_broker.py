@@ -0,0 +1,139 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from PythonUtils import testdata
+
+from elitech.src.broker import RequestBroker
+from elitech.src.device import Device
+from elitech.src.parameters import Range
+
+from .test_daemon import SimulatedDevice
+
+import threading
+import time
+
+class TestRequestBroker(unittest.TestCase):
+    @staticmethod
+    def device():
+        dev = SimulatedDevice()
+        dev.config[:] = bytes(range(0, 0x100))
+        return dev
+
+    def get(self, broker, ranges, results, delay=0):
+        time.sleep(delay)
+        try:
+            results.append(broker.get(*ranges))
+        except Exception as e:
+            results.append(e)
+
+    @testdata.TestData([
+        {'requests': [[Range(0, 4)], [Range(2, 4)], [Range(4, 8)]],                 'frames': 1},
+        {'requests': [[Range(0, 4)], [Range(0, 4)], [Range(0, 4)], [Range(0, 4)]],  'frames': 1},
+        {'requests': [[Range(0, 4), Range(64, 4)], [Range(66, 2)]],                 'frames': 2},
+        {'requests': [[Range(0, 40)], [Range(30, 40)]],                             'frames': 2},
+    ])
+    def testCoalescing(self, requests, frames):
+        dev = TestRequestBroker.device()
+        broker = RequestBroker(dev, window=0.05)
+        results = [[] for _ in requests]
+        threads = [threading.Thread(target=self.get, args=(broker, r, res)) for r, res in zip(requests, results)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(broker.requests, len(requests))
+        self.assertEqual(broker.frames, frames)
+        self.assertEqual(len(dev.requests), frames)
+        for ranges, result in zip(requests, results):
+            self.assertEqual(len(result), 1)
+            self.assertEqual([a.range for a in result[0]], ranges)
+            self.assertEqual([a.data for a in result[0]], [bytes(range(r.start, r.start + r.len)) for r in ranges])
+
+    @testdata.TestData([
+        {'first': Range(0, 8), 'second': Range(2, 2), 'frames': 1},
+        {'first': Range(0, 8), 'second': Range(6, 4), 'frames': 2},
+    ])
+    def testInFlight(self, first, second, frames):
+        dev = TestRequestBroker.device()
+        dev.delay = 0.1
+        broker = RequestBroker(dev, window=0.01)
+        results = [[], []]
+        threads = [
+            threading.Thread(target=self.get, args=(broker, [first],  results[0])),
+            threading.Thread(target=self.get, args=(broker, [second], results[1], 0.05)),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(broker.frames, frames)
+        self.assertEqual(results[0][0][0].data, bytes(range(first.start, first.start + first.len)))
+        self.assertEqual(results[1][0][0].data, bytes(range(second.start, second.start + second.len)))
+
+    def testSequential(self):
+        dev = TestRequestBroker.device()
+        broker = RequestBroker(dev, window=0)
+        for _ in range(0, 3):
+            self.assertEqual(broker.get(Range(1, 2))[0].data, b'\x01\x02')
+        self.assertEqual(broker.frames, 3)
+
+    def testDeviceError(self):
+        dev = TestRequestBroker.device()
+        dev.write = unittest.mock.Mock(side_effect=OSError(19, 'No such device'))
+        broker = RequestBroker(dev, window=0.05)
+        results = [[], []]
+        threads = [threading.Thread(target=self.get, args=(broker, [Range(0, 4)], res)) for res in results]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for res in results:
+            self.assertIsInstance(res[0], OSError)
+
+        # The broker is still usable
+        del dev.write
+        self.assertEqual(broker.get(Range(0, 2))[0].data, b'\x00\x01')
+
+    def testInvalidAnswer(self):
+        dev = TestRequestBroker.device()
+        dev.read = unittest.mock.Mock(return_value=bytes(64))
+        broker = RequestBroker(dev, window=0)
+        with self.assertWarns(UserWarning):
+            with self.assertRaises(ValueError) as e:
+                broker.get(Range(0, 4))
+        self.assertEqual(str(e.exception), 'No answer for range [0, 4)')
+
+    def testInvalidAnswerNotStrict(self):
+        dev = TestRequestBroker.device()
+        dev.read = unittest.mock.Mock(return_value=bytes(64))
+        broker = RequestBroker(dev, window=0)
+        with self.assertWarns(UserWarning):
+            self.assertEqual(broker.get(Range(0, 4), strict=False), [])
+
+    @testdata.TestData([
+        {'names': ['model']                                           },
+        {'names': ['model', 'serial-number', 'protocol-version']      },
+    ])
+    def testGetParameters(self, names):
+        dev = TestRequestBroker.device()
+        broker = RequestBroker(dev, window=0)
+        self.assertEqual(broker.getParameters(*names), Device.getParameters(dev, *names))
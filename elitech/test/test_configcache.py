@@ -0,0 +1,162 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.cache import loadJson
+from elitech.src.configcache import ConfigCache
+from elitech.src.parameters import Parameters
+from elitech.src.parameters import StopModes
+from elitech.src.simulator import Simulator
+
+from .test_pager import CacheDir
+
+import copy
+import io
+
+from contextlib import redirect_stdout
+from datetime import datetime
+
+def read(dev, *names):
+    params = [copy.copy(Parameters()[n]) for n in names]
+    cache = ConfigCache(dev)
+    with redirect_stdout(io.StringIO()):
+        image = cache.read([p.range for p in params])
+    return cache, {p.name: p.parseData(image[p.range]).value for p in params}
+
+class TestConfigCache(unittest.TestCase):
+    @testdata.TestData([
+        {'names': ['model'                         ]},
+        {'names': ['interval', 'timezone'          ]},
+        {'names': ['password', 'protocol-version'  ]},
+    ])
+    def testHit(self, names):
+        with CacheDir():
+            sim = Simulator(serial='EL1234567890')
+            cache, values = read(sim.loopback(), *names)
+            self.assertFalse(cache.hit)
+            self.assertEqual(cache.serial, 'EL1234567890')
+            self.assertIn('EL1234567890', loadJson(ConfigCache.CacheName, {}))
+
+            n = len(sim.requests)
+            cache, cached = read(sim.loopback(), *names)
+            self.assertTrue(cache.hit)
+            self.assertEqual(cached, values)
+            # Only the validation frame is sent
+            self.assertEqual(len(sim.requests), n + 1)
+
+    @testdata.TestData([
+        {'name': 'record-number',    'value': 42,                    'expected': 42,                             'frames': 2},
+        {'name': 'battery-level',    'value': 3,                     'expected': 3,                              'frames': 1},
+        {'name': 'actual-stop-mode', 'value': 'Temporary',           'expected': StopModes.Temporary,            'frames': 1},
+        {'name': 'device-time',      'value': '2024-02-01 12:00:00', 'expected': datetime(2024, 2, 1, 12, 0, 0), 'frames': 2},
+        {'name': 'start-time',       'value': '2024-02-01 08:00:00', 'expected': datetime(2024, 2, 1,  8, 0, 0), 'frames': 2},
+    ])
+    def testVolatile(self, name, value, expected, frames):
+        with CacheDir():
+            sim = Simulator()
+            read(sim.loopback(), name, 'interval')
+            sim.set(name, value)
+
+            n = len(sim.requests)
+            cache, values = read(sim.loopback(), name, 'interval')
+            self.assertTrue(cache.hit)
+            self.assertEqual(values[name], expected)
+            self.assertEqual(len(sim.requests), n + frames)
+
+    def testConfigurationTime(self):
+        with CacheDir():
+            sim = Simulator()
+            read(sim.loopback(), 'interval')
+            sim.set('interval', 300)
+            sim.set('configuration-time', '2024-02-01 12:00:00')
+
+            cache, values = read(sim.loopback(), 'interval')
+            self.assertFalse(cache.hit)
+            self.assertEqual(values, {'interval': 300})
+            cache, values = read(sim.loopback(), 'interval')
+            self.assertTrue(cache.hit)
+            self.assertEqual(values, {'interval': 300})
+
+    @testdata.TestData([
+        {'name': 'device-state',     'value': 'MAX',       'hit': True },
+        {'name': 'battery-level',    'value': 3,           'hit': True },
+        {'name': 'timezone',         'value': '+0100',     'hit': False},
+        {'name': 'travel-number',    'value': 'ABC',       'hit': False},
+    ])
+    def testToken(self, name, value, hit):
+        # Only the volatile data of the token may change without invalidating the cached configuration
+        with CacheDir():
+            sim = Simulator()
+            read(sim.loopback(), 'interval')
+            sim.set(name, value)
+            cache, values = read(sim.loopback(), 'interval')
+            self.assertEqual(cache.hit, hit)
+
+    def testSerial(self):
+        with CacheDir():
+            sim1 = Simulator(serial='EL0000000001')
+            sim2 = Simulator(serial='EL0000000002')
+            sim2.set('interval', 300)
+            read(sim1.loopback(), 'interval')
+
+            cache, values = read(sim2.loopback(), 'interval')
+            self.assertFalse(cache.hit)
+            self.assertEqual(values, {'interval': 300})
+            cache, values = read(sim1.loopback(), 'interval')
+            self.assertTrue(cache.hit)
+            self.assertEqual(values, {'interval': 0})
+
+    @testdata.TestData([
+        {'serial': bytes(12)         },
+        {'serial': bytes([0xFF] * 12)},
+    ])
+    def testInvalidSerial(self, serial):
+        with CacheDir():
+            sim = Simulator()
+            r = Parameters()['serial-number'].range
+            sim.image[r.start:(r.end + 1)] = serial
+            sim.set('interval', 300)
+            for _ in range(0, 2):
+                cache, values = read(sim.loopback(), 'interval')
+                self.assertFalse(cache.hit)
+                self.assertFalse(cache.serial)
+                self.assertEqual(values, {'interval': 300})
+            # The devices without a valid serial number are not cached
+            self.assertEqual(loadJson(ConfigCache.CacheName, {}), {})
+
+    def testInvalidate(self):
+        with CacheDir():
+            sim = Simulator()
+            read(sim.loopback(), 'interval')
+            with redirect_stdout(io.StringIO()):
+                ConfigCache(sim.loopback()).invalidate()
+            self.assertEqual(loadJson(ConfigCache.CacheName, {}), {})
+
+            cache, values = read(sim.loopback(), 'interval')
+            self.assertFalse(cache.hit)
+
+    def testModifiedFile(self):
+        with CacheDir():
+            sim = Simulator()
+            read(sim.loopback(), 'interval')
+            # Another process forgets the device
+            ConfigCache.forget(sim.get('serial-number'))
+
+            cache, values = read(sim.loopback(), 'interval')
+            self.assertFalse(cache.hit)
@@ -0,0 +1,249 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.client import Client
+from elitech.src.client import socketPath
+from elitech.src.commands import Command
+from elitech.src.daemon import Server
+
+from .test_pager import CacheDir
+from .test_pager import FakeDevice
+from .test_pager import encodeRecord
+
+from argparse import Namespace
+from contextlib import redirect_stdout
+from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
+
+import io
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+import unittest.mock
+import warnings
+
+class SimulatedDevice(FakeDevice):
+    def __init__(self, delay=0, **kwargs):
+        t = datetime(2024, 1, 31, 8, 0, 0)
+        super().__init__(recordData=[encodeRecord(t + timedelta(minutes=r)) for r in range(0, 10)], **kwargs)
+        self.config[0:4] = b'\x01\x02\x03\x04'
+        self.delay = delay
+        self.active = 0
+        self.maxActive = 0
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        with self.__lock:
+            self.active += 1
+            self.maxActive = max(self.maxActive, self.active)
+        return self
+
+    def __exit__(self, *args):
+        with self.__lock:
+            self.active -= 1
+        return False
+
+    def read(self):
+        time.sleep(self.delay)
+        return super().read()
+
+    def __repr__(self):
+        return 'SimulatedDevice'
+
+
+class Daemon:
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __enter__(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        self.server = Server(Path(self.__dir.name) / 'elitech.sock', factory=self.factory)
+        self.__thread = threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+        self.__thread.join()
+        self.__dir.cleanup()
+        return False
+
+    def execute(self, cmds, dev='/dev/hidraw0', **kwargs):
+        out = io.StringIO()
+        err = io.StringIO()
+        with Client.connect(self.server.path) as client:
+            client.execute(Namespace(dev=dev, cmds=cmds, since=None, until=None, **kwargs), out, err)
+        return out.getvalue(), err.getvalue()
+
+
+class TestDaemon(unittest.TestCase):
+    @testdata.TestData([
+        {'cmds': ['address', 'get', '1-4']            },
+        {'cmds': ['address', 'get', '1', '3-4', '67'] },
+        {'cmds': ['record', 'get']                    },
+        {'cmds': ['record', 'get', '2:2:8']           },
+    ])
+    def testSameOutput(self, cmds):
+        with CacheDir():
+            with Daemon(lambda path: SimulatedDevice()) as daemon:
+                out, err = daemon.execute(list(cmds))
+
+                expected = io.StringIO()
+                with redirect_stdout(expected):
+                    cmd = Command(Namespace(dev=SimulatedDevice(), cmds=list(cmds), since=None, until=None))
+                    print(cmd)
+                    cmd.execute()
+        # Device requests and records are printed by different threads for record commands
+        self.assertEqual(sorted(out.splitlines()), sorted(expected.getvalue().splitlines()))
+        self.assertEqual(err, '')
+
+    def testSessions(self):
+        paths = []
+        def factory(path):
+            paths.append(path)
+            return SimulatedDevice()
+
+        with Daemon(factory) as daemon:
+            for _ in range(0, 3):
+                daemon.execute(['address', 'get', '1-4'], '/dev/hidraw0')
+                daemon.execute(['address', 'get', '1-4'], '/dev/hidraw1')
+        self.assertEqual(paths, ['/dev/hidraw0', '/dev/hidraw1'])
+
+    def testSerialized(self):
+        dev = SimulatedDevice(delay=0.01)
+        with Daemon(lambda path: dev) as daemon:
+            threads = [threading.Thread(target=daemon.execute, args=(['address', 'get', '1-4', '65-68'],)) for _ in range(0, 4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(dev.maxActive, 1)
+        self.assertLessEqual(len(dev.requests), 8)
+
+    @testdata.TestData([
+        {'cmds': ['address', 'get', '1-4', '65-68']          },
+        {'cmds': ['parameter', 'get', 'serial-number', 'csv']},
+    ])
+    def testBrokered(self, cmds):
+        sequential = SimulatedDevice(delay=0.01)
+        concurrent = SimulatedDevice(delay=0.01)
+        outputs = []
+        with CacheDir():
+            with Daemon(lambda path: sequential) as daemon:
+                # The output of the cached configuration reads (the requested ranges are printed)
+                for _ in range(0, 4):
+                    expected, _ = daemon.execute(list(cmds))
+            with Daemon(lambda path: concurrent) as daemon:
+                threads = [threading.Thread(target=lambda: outputs.append(daemon.execute(list(cmds)))) for _ in range(0, 4)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+        # The overlapping requests of concurrent clients are merged into shared frames
+        self.assertEqual(concurrent.maxActive, 1)
+        self.assertLess(len(concurrent.requests), len(sequential.requests))
+        self.assertEqual(outputs, [(expected, '')] * 4)
+
+    def testInterleaved(self):
+        dev = SimulatedDevice(delay=0.05)
+        with CacheDir():
+            with Daemon(lambda path: dev) as daemon:
+                download = threading.Thread(target=daemon.execute, args=(['record', 'get'],))
+                download.start()
+                time.sleep(0.06)
+                daemon.execute(['address', 'get', '1-4'])
+                # The address was read while the records were still being downloaded
+                self.assertTrue(download.is_alive())
+                download.join()
+
+                out, err = daemon.execute(['device', 'metrics'])
+        self.assertIn('Interactive: 1 frames, depth 0', out)
+        self.assertIn('Bulk: ', out)
+
+    def testWarnings(self):
+        with Daemon(lambda path: SimulatedDevice()) as daemon:
+            with warnings.catch_warnings():
+                warnings.simplefilter('always')
+                for _ in range(0, 2):
+                    out, err = daemon.execute(['address', 'get', '1-4'], '')
+                    self.assertIn('AddressReadCommand(Null, [[0, 4)])', out)
+                    self.assertIn('No device selected', err)
+
+    @testdata.TestData([
+        {'cmds': ['unknown'],                   'message': "Unknown command 'unknown'"                   },
+        {'cmds': ['help'],                      'message': "Command 'help' is not run by the daemon"     },
+        {'cmds': ['address', 'get', 'a'],       'message': 'Invalid range: "a"'                         },
+    ])
+    def testError(self, cmds, message):
+        with Daemon(lambda path: SimulatedDevice()) as daemon:
+            with self.assertRaises(ValueError) as e:
+                daemon.execute(list(cmds))
+            self.assertEqual(str(e.exception), message)
+            # The daemon is still running
+            daemon.execute(['address', 'get', '1-4'])
+
+    def testDeviceError(self):
+        devices = []
+        def factory(path):
+            devices.append(SimulatedDevice())
+            if (len(devices) == 1):
+                devices[0].write = unittest.mock.Mock(side_effect=OSError(19, 'No such device'))
+            return devices[-1]
+
+        with Daemon(factory) as daemon:
+            with self.assertRaises(ValueError):
+                daemon.execute(['address', 'get', '1-4'])
+            daemon.execute(['address', 'get', '1-4'])
+        self.assertEqual(len(devices), 2)
+
+    def testStaleSocket(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / 'elitech.sock'
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(str(path))
+            sock.close()
+
+            self.assertTrue(path.exists())
+            self.assertIsNone(Client.connect(path))
+            with Server(path, factory=lambda path: SimulatedDevice()):
+                self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+                self.assertIsNotNone(Client.connect(path))
+                with self.assertRaises(ValueError):
+                    Server(path)
+            self.assertFalse(path.exists())
+
+    def testNoDaemon(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.assertIsNone(Client.connect(Path(d) / 'elitech.sock'))
+
+    @testdata.TestData([
+        {'env': {'ELITECH_SOCKET': '/run/test.sock', 'XDG_RUNTIME_DIR': '/run/user/1000'}, 'path': '/run/test.sock'          },
+        {'env': {'ELITECH_SOCKET': '',               'XDG_RUNTIME_DIR': '/run/user/1000'}, 'path': '/run/user/1000/elitech.sock'},
+        {'env': {'ELITECH_SOCKET': '',               'XDG_RUNTIME_DIR': ''},               'path': f'/tmp/elitech-{os.getuid()}.sock'},
+    ])
+    def testSocketPath(self, env, path):
+        with unittest.mock.patch.dict(os.environ, env):
+            self.assertEqual(socketPath(), Path(path))
@@ -0,0 +1,80 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from elitech.src.cache import loadJson
+from elitech.src.device import DescriptorCacheName
+from elitech.src.device import reportSizes
+
+import hid_parser
+
+from .test_pager import CacheDir
+
+from pathlib import Path
+
+import hashlib
+import json
+
+class TestReportSizes(unittest.TestCase):
+    def setUp(self):
+        with open(Path(__file__).parents[0] / 'data' / 'hid_report_descriptor', 'rb') as f:
+            self.descriptor = f.read()
+        reportSizes.cache_clear()
+
+    def tearDown(self):
+        reportSizes.cache_clear()
+
+    def testParse(self):
+        with CacheDir():
+            with unittest.mock.patch('hid_parser.ReportDescriptor', wraps=hid_parser.ReportDescriptor) as parser:
+                self.assertEqual(reportSizes(self.descriptor), (64, 64))
+                self.assertEqual(parser.call_count, 1)
+            self.assertEqual(loadJson(DescriptorCacheName), {
+                hashlib.sha256(self.descriptor).hexdigest(): {'inReportSize': 64, 'outReportSize': 64}
+            })
+
+    def testMemoryCache(self):
+        with CacheDir():
+            reportSizes(self.descriptor)
+            with unittest.mock.patch('elitech.src.cache.loadJson') as load:
+                self.assertEqual(reportSizes(self.descriptor), (64, 64))
+                self.assertEqual(load.call_count, 0)
+
+    def testDiskCache(self):
+        with CacheDir():
+            reportSizes(self.descriptor)
+            reportSizes.cache_clear()
+            with unittest.mock.patch('hid_parser.ReportDescriptor') as parser:
+                self.assertEqual(reportSizes(self.descriptor), (64, 64))
+                self.assertEqual(parser.call_count, 0)
+
+    def testDiskCacheKey(self):
+        with CacheDir() as cacheDir:
+            with open(Path(cacheDir) / DescriptorCacheName, 'wt') as f:
+                json.dump({hashlib.sha256(b'other').hexdigest(): {'inReportSize': 32, 'outReportSize': 32}}, f)
+            self.assertEqual(reportSizes(b'other'), (32, 32))
+            self.assertEqual(reportSizes(self.descriptor), (64, 64))
+            self.assertEqual(len(loadJson(DescriptorCacheName)), 2)
+
+    def testDiskCacheInvalid(self):
+        with CacheDir() as cacheDir:
+            with open(Path(cacheDir) / DescriptorCacheName, 'wt') as f:
+                json.dump({hashlib.sha256(self.descriptor).hexdigest(): {'inReportSize': 'abc'}}, f)
+            self.assertEqual(reportSizes(self.descriptor), (64, 64))
+            self.assertEqual(loadJson(DescriptorCacheName)[hashlib.sha256(self.descriptor).hexdigest()], {'inReportSize': 64, 'outReportSize': 64})
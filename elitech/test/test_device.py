@@ -138,6 +138,58 @@ class TestDevice(unittest.TestCase):
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rb+')
         self.assertEqual(len(mock_file.close.call_args_list), 1)
 
+    @unittest.mock.patch('elitech.src.device.open')
+    def testOpenNested(self, mock_open):
+        mock_file = unittest.mock.Mock()
+        mock_open.return_value = mock_file
+
+        dev = Device(Path('/dev/null'))
+        self.assertFalse(dev.isOpen)
+
+        with dev:
+            self.assertTrue(dev.isOpen)
+            with dev:
+                self.assertTrue(dev.isOpen)
+            self.assertTrue(dev.isOpen)
+            self.assertEqual(len(mock_file.close.call_args_list), 0)
+        self.assertFalse(dev.isOpen)
+
+        self.assertEqual(len(mock_open.call_args_list), 1)
+        self.assertEqual(len(mock_file.close.call_args_list), 1)
+
+    @unittest.mock.patch('elitech.src.device.open')
+    def testOpenClose(self, mock_open):
+        mock_file = unittest.mock.Mock()
+        mock_open.return_value = mock_file
+
+        dev = Device(Path('/dev/null'))
+        self.assertIs(dev.open(), dev)
+        self.assertIs(dev.open(), dev)
+        dev.close()
+        self.assertTrue(dev.isOpen)
+        self.assertEqual(len(mock_file.close.call_args_list), 0)
+        dev.close()
+        self.assertFalse(dev.isOpen)
+        dev.close()
+
+        self.assertEqual(len(mock_open.call_args_list), 1)
+        self.assertEqual(len(mock_file.close.call_args_list), 1)
+
+    @unittest.mock.patch('elitech.src.device.open')
+    def testOpenException(self, mock_open):
+        mock_file = unittest.mock.Mock()
+        mock_open.return_value = mock_file
+
+        dev = Device(Path('/dev/null'))
+        with self.assertRaises(RuntimeError):
+            with dev:
+                with dev:
+                    raise RuntimeError()
+        self.assertFalse(dev.isOpen)
+
+        self.assertEqual(len(mock_open.call_args_list), 1)
+        self.assertEqual(len(mock_file.close.call_args_list), 1)
+
     @unittest.mock.patch('elitech.src.device.print')
     @unittest.mock.patch('elitech.src.device.open')
     def testWrite(self, mock_open, mock_print):
@@ -243,11 +295,13 @@ class TestDevice(unittest.TestCase):
         self.assertEqual(dev.vendorId, 0x1234)
         self.assertEqual(dev.productId, 0x6789)
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -268,11 +322,13 @@ class TestDevice(unittest.TestCase):
         self.assertEqual(dev.vendorId, 0x1234)
         self.assertEqual(dev.productId, 0x6789)
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -293,11 +349,13 @@ class TestDevice(unittest.TestCase):
         self.assertEqual(dev.vendorId, 0x1234)
         self.assertEqual(dev.productId, 0x6789)
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -359,11 +417,13 @@ class TestDevice(unittest.TestCase):
         dev = Device(Path('/dev/null'))
         self.assertEqual(dev.name, 'Elitech RC-5+')
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -383,11 +443,13 @@ class TestDevice(unittest.TestCase):
         dev = Device(Path('/dev/null'))
         self.assertEqual(dev.name, 'Elitech RC-5+')
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -407,11 +469,13 @@ class TestDevice(unittest.TestCase):
         dev = Device(Path('/dev/null'))
         self.assertEqual(dev.name, 'Elitech RC-5+')
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
@@ -432,11 +496,13 @@ class TestDevice(unittest.TestCase):
             dev.name
         self.assertEqual(str(e.exception), "Unsupported device: 04d8:1234")
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -459,11 +525,13 @@ class TestDevice(unittest.TestCase):
             dev.name
         self.assertEqual(str(e.exception), "Unsupported device: 04d8:1234")
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
@@ -486,11 +554,13 @@ class TestDevice(unittest.TestCase):
             dev.name
         self.assertEqual(str(e.exception), "Unsupported device: 04d8:1234")
 
-        self.assertEqual(len(mock_open.call_args_list), 2)
-        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
+        self.assertEqual(len(mock_open.call_args_list), 3)
+        self.assertEqual(mock_open.call_args_list[0][0][0], Path('/sys/class/hidraw/null/device/uevent'))
         self.assertEqual(mock_open.call_args_list[0][0][1], 'rt')
-        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[1][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idVendor'))
         self.assertEqual(mock_open.call_args_list[1][0][1], 'rt')
+        self.assertEqual(mock_open.call_args_list[2][0][0], Path('/sys/devices/pci0000:00/0000:00:14.0/usb3/3-2/idProduct'))
+        self.assertEqual(mock_open.call_args_list[2][0][1], 'rt')
 
     @unittest.mock.patch('elitech.src.device.open', new_callable=mockpath.MockPath.mock_open)
     @unittest.mock.patch('elitech.src.device.Path', new_callable=mockpath.MockPath({
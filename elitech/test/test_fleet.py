@@ -0,0 +1,187 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from PythonUtils import testdata
+
+from elitech.src.fleet import Fleet
+
+from .test_pager import CacheDir
+from .test_recordcache import makeDevice
+
+from pathlib import Path
+
+import tempfile
+import threading
+import time
+import warnings
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.maxActive = {}
+        self.total = 0
+        self.maxTotal = 0
+
+    def enter(self, hub):
+        with self.lock:
+            self.active[hub] = self.active.get(hub, 0) + 1
+            self.maxActive[hub] = max(self.maxActive.get(hub, 0), self.active[hub])
+            self.total += 1
+            self.maxTotal = max(self.maxTotal, self.total)
+
+    def exit(self, hub):
+        with self.lock:
+            self.active[hub] -= 1
+            self.total -= 1
+
+def trackDevice(dev, path, hub, tracker):
+    depth = [0]
+    class TrackingDevice(dev.__class__):
+        def __enter__(self):
+            if (depth[0] == 0):
+                tracker.enter(hub)
+            depth[0] += 1
+            return self
+
+        def __exit__(self, *args):
+            depth[0] -= 1
+            if (depth[0] == 0):
+                tracker.exit(hub)
+            return False
+
+        def read(self):
+            time.sleep(0.001)
+            return super().read()
+    dev.__class__ = TrackingDevice
+    dev.path = path
+    return dev
+
+class SysFs:
+    def __init__(self, devices):
+        self.__devices = devices
+
+    def __enter__(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        root = Path(self.__dir.name)
+        (root / 'class' / 'hidraw').mkdir(parents=True)
+        for name, hub, port in self.__devices:
+            usbPath = root / 'devices' / 'pci0000:00' / '0000:00:14.0' / hub / port
+            hidPath = usbPath / f'{port}:1.0' / '0003:04D8:3005.0001' / 'hidraw' / name
+            hidPath.mkdir(parents=True)
+            (usbPath / 'idVendor').write_text('04d8\n')
+            (usbPath / 'idProduct').write_text('3005\n')
+            (root / 'class' / 'hidraw' / name).symlink_to(hidPath)
+        self.__patch = unittest.mock.patch.object(Fleet, 'SysClassPath', root / 'class' / 'hidraw')
+        self.__patch.start()
+        return root
+
+    def __exit__(self, *args):
+        self.__patch.stop()
+        self.__dir.cleanup()
+        return False
+
+class TestFleet(unittest.TestCase):
+    @testdata.TestData([
+        {'hub': 'usb1',           'port': '1-2',     'expected': 'usb1' },
+        {'hub': 'usb1/1-1',       'port': '1-1.3',   'expected': '1-1'  },
+        {'hub': 'usb2/2-1/2-1.4', 'port': '2-1.4.2', 'expected': '2-1.4'},
+    ])
+    def testHubOf(self, hub, port, expected):
+        with SysFs([('hidraw0', hub, port)]):
+            dev = makeDevice(0)
+            dev.path = Path('/dev/hidraw0')
+            self.assertEqual(Fleet.hubOf(dev), expected)
+
+    def testHubOfUnknown(self):
+        with SysFs([]) as root:
+            (root / 'class' / 'hidraw' / 'hidraw5').mkdir()
+            dev = makeDevice(0)
+            dev.path = Path('/dev/hidraw5')
+            self.assertIsNone(Fleet.hubOf(dev))
+
+    @testdata.TestData([
+        {'hubs': [1, 1, 1, 1, 1, 1], 'concurrency': 4, 'perHub': 1},
+        {'hubs': [6],                'concurrency': 4, 'perHub': 1},
+        {'hubs': [6],                'concurrency': 4, 'perHub': 2},
+        {'hubs': [3, 3, 2],          'concurrency': 2, 'perHub': 1},
+        {'hubs': [2, 2, 2],          'concurrency': 8, 'perHub': 1},
+    ])
+    def testDownload(self, hubs, concurrency, perHub):
+        devices = []
+        for h, n in enumerate(hubs):
+            for d in range(0, n):
+                devices.append((f'hidraw{len(devices)}', f'usb1/1-{h + 1}', f'1-{h + 1}.{d + 1}'))
+        tracker = Tracker()
+        with CacheDir(), SysFs(devices):
+            fleet = Fleet([trackDevice(makeDevice(20 + d, serial=f'EF{d:010d}'.encode()), Path('/dev') / name, hub, tracker) for d, (name, hub, port) in enumerate(devices)], concurrency, perHub)
+            finished = []
+            results = fleet.download(lambda result: finished.append(result.serial))
+
+        self.assertEqual([r.serial for r in results], [f'EF{d:010d}' for d in range(0, len(devices))])
+        self.assertEqual([r.new for r in results], [20 + d for d in range(0, len(devices))])
+        self.assertTrue(all(results))
+        self.assertEqual(sorted(finished), [r.serial for r in results])
+        self.assertLessEqual(tracker.maxTotal, concurrency)
+        self.assertLessEqual(max(tracker.maxActive.values()), perHub)
+        self.assertGreater(fleet.time, 0)
+
+    def testDownloadError(self):
+        with CacheDir(), SysFs([('hidraw0', 'usb1', '1-1'), ('hidraw1', 'usb1', '1-2')]):
+            good = makeDevice(10)
+            good.path = Path('/dev/hidraw0')
+            bad = makeDevice(10, serial=bytes([0xFF]*12))
+            bad.path = Path('/dev/hidraw1')
+            results = Fleet([good, bad]).download()
+        self.assertTrue(results[0])
+        self.assertEqual(results[0].new, 10)
+        self.assertFalse(results[1])
+        self.assertIsInstance(results[1].error, ValueError)
+
+    def testDownloadUnexpectedError(self):
+        class FailingDevice:
+            path = Path('/dev/hidraw1')
+            def __enter__(self):
+                raise RuntimeError('Unexpected')
+            def __exit__(self, *args):
+                return False
+
+        with CacheDir(), SysFs([('hidraw0', 'usb1', '1-1'), ('hidraw1', 'usb1', '1-2'), ('hidraw2', 'usb1', '1-3')]):
+            devices = [makeDevice(10), FailingDevice(), makeDevice(10)]
+            devices[0].path = Path('/dev/hidraw0')
+            devices[2].path = Path('/dev/hidraw2')
+            results = Fleet(devices, 1, 1).download()
+        self.assertEqual([bool(r) for r in results], [True, False, True])
+        self.assertIsInstance(results[1].error, RuntimeError)
+
+    def testDownloadOutputError(self):
+        def output(result):
+            raise RuntimeError('Output failed')
+
+        with CacheDir(), SysFs([('hidraw0', 'usb1', '1-1'), ('hidraw1', 'usb1', '1-2')]):
+            devices = [makeDevice(10), makeDevice(10)]
+            devices[0].path = Path('/dev/hidraw0')
+            devices[1].path = Path('/dev/hidraw1')
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                results = Fleet(devices, 1, 1).download(output)
+        self.assertEqual([str(m.message) for m in w], [f"Could not output result for /dev/hidraw{d}: Output failed" for d in range(0, 2)])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(results))
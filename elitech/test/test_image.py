@@ -0,0 +1,203 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.parameters import Range
+from elitech.src.frames     import Response
+from elitech.src.image      import MemoryImage
+from elitech.src.image      import ConfigImage
+
+import tracemalloc
+
+class TestMemoryImage(unittest.TestCase):
+    @testdata.TestData([
+        {'answers': [                                                                                                           ], 'spans': [                          ]},
+        {'answers': [Response(Range(0, 2), bytes([0x01, 0x02])),                                                                ], 'spans': [Range(0, 2)               ]},
+        {'answers': [Response(Range(0, 2), bytes([0x01, 0x02])), Response(Range(2, 2), bytes([0x03, 0x04]))                     ], 'spans': [Range(0, 4)               ]},
+        {'answers': [Response(Range(2, 2), bytes([0x03, 0x04])), Response(Range(0, 2), bytes([0x01, 0x02]))                     ], 'spans': [Range(0, 4)               ]},
+        {'answers': [Response(Range(0, 2), bytes([0x01, 0x02])), Response(Range(3, 1), bytes([0x04      ]))                     ], 'spans': [Range(0, 2), Range(3, 1)  ]},
+        {'answers': [Response(Range(3, 1), bytes([0x04      ])), Response(Range(0, 2), bytes([0x01, 0x02]))                     ], 'spans': [Range(0, 2), Range(3, 1)  ]},
+        {'answers': [Response(Range(0, 1), bytes([0x01      ])), Response(Range(4, 1), bytes([0x05      ])), Response(Range(1, 3), bytes([0x02, 0x03, 0x04]))], 'spans': [Range(0, 5)]},
+        {'answers': [Response(Range(1, 1), bytes([0x02      ])), Response(Range(3, 1), bytes([0x04      ])), Response(Range(0, 5), bytes([0x01, 0x02, 0x03, 0x04, 0x05]))], 'spans': [Range(0, 5)]},
+    ])
+    def testSpans(self, answers, spans):
+        image = MemoryImage(*answers)
+        self.assertEqual(len(image), len(spans))
+        self.assertEqual([(s.start, s.len) for s in image.spans], [(s.start, s.len) for s in spans])
+
+    @testdata.TestData([
+        {'r': Range(0, 1), 'contained': True },
+        {'r': Range(0, 4), 'contained': True },
+        {'r': Range(1, 2), 'contained': True },
+        {'r': Range(3, 1), 'contained': True },
+        {'r': Range(0, 5), 'contained': False},
+        {'r': Range(3, 2), 'contained': False},
+        {'r': Range(4, 1), 'contained': False},
+        {'r': Range(5, 2), 'contained': False},
+        {'r': Range(6, 2), 'contained': True },
+        {'r': Range(7, 2), 'contained': False},
+    ])
+    def testContains(self, r, contained):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])), Response(Range(6, 2), bytes([0x07, 0x08])))
+        self.assertEqual(r in image, contained)
+
+    @testdata.TestData([
+        {'r': Range(0, 1), 'data': bytes([0x01                  ])},
+        {'r': Range(1, 2), 'data': bytes([0x02, 0x03            ])},
+        {'r': Range(0, 4), 'data': bytes([0x01, 0x02, 0x03, 0x04])},
+        {'r': Range(7, 1), 'data': bytes([0x08                  ])},
+        {'r': 2,           'data': bytes([0x03                  ])},
+    ])
+    def testGetItem(self, r, data):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])), Response(Range(6, 2), bytes([0x07, 0x08])))
+        self.assertEqual(image[r], data)
+
+    @testdata.TestData([
+        {'r': Range(3, 2)},
+        {'r': Range(4, 1)},
+        {'r': Range(5, 3)},
+        {'r': 5          },
+    ])
+    def testGetInvalidItem(self, r):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])), Response(Range(6, 2), bytes([0x07, 0x08])))
+        with self.assertRaises(ValueError) as e:
+            image[r]
+        if type(r) is int:
+            r = Range(r, 1)
+        self.assertEqual(str(e.exception), f"Required range {r} is not in available spans {image.spans}")
+
+    @testdata.TestData([
+        {'r': Range(0, 1), 'data': bytes([0xFF      ]), 'expected': bytes([0xFF, 0x02, 0x03, 0x04])},
+        {'r': Range(1, 2), 'data': bytes([0xFF, 0xFE]), 'expected': bytes([0x01, 0xFF, 0xFE, 0x04])},
+        {'r': Range(3, 1), 'data': [0xFF            ],  'expected': bytes([0x01, 0x02, 0x03, 0xFF])},
+        {'r': 2,           'data': bytes([0xFF      ]), 'expected': bytes([0x01, 0x02, 0xFF, 0x04])},
+    ])
+    def testSetItem(self, r, data, expected):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])))
+        image[r] = data
+        self.assertEqual(image[Range(0, 4)], expected)
+
+    @testdata.TestData([
+        {'r': Range(0, 1), 'data': bytes([          ]), 'message': "Length of [0, 1) does not match data length: 0"},
+        {'r': Range(0, 1), 'data': bytes([0xFF, 0xFE]), 'message': "Length of [0, 1) does not match data length: 2"},
+        {'r': Range(3, 2), 'data': bytes([0xFF, 0xFE]), 'message': "Required range [3, 5) is not in available spans [[0, 4)]"},
+    ])
+    def testSetInvalidItem(self, r, data, message):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])))
+        with self.assertRaises(ValueError) as e:
+            image[r] = data
+        self.assertEqual(str(e.exception), message)
+        self.assertEqual(image[Range(0, 4)], bytes([0x01, 0x02, 0x03, 0x04]))
+
+    @testdata.TestData([
+        {'r': Range(0, 1), 'span': Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04]))},
+        {'r': Range(2, 2), 'span': Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04]))},
+        {'r': Range(6, 1), 'span': Response(Range(6, 2), bytes([0x07, 0x08            ]))},
+    ])
+    def testSpan(self, r, span):
+        image = MemoryImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])), Response(Range(6, 2), bytes([0x07, 0x08])))
+        self.assertEqual(image.span(r), span)
+
+    @testdata.TestData([
+        {'answers': [Response(Range(0, 2), bytes([0x01, 0x02])), Response(Range(1, 2), bytes([0xFF, 0x03]))                     ], 'data': bytes([0x01, 0x02, 0x03            ])},
+        {'answers': [Response(Range(1, 2), bytes([0x02, 0x03])), Response(Range(0, 4), bytes([0x01, 0xFF, 0x03, 0x04]))         ], 'data': bytes([0x01, 0x02, 0x03, 0x04      ])},
+        {'answers': [Response(Range(0, 1), bytes([0x01      ])), Response(Range(2, 1), bytes([0x03      ])), Response(Range(0, 3), bytes([0x01, 0x02, 0xFF]))], 'data': bytes([0x01, 0x02, 0x03])},
+    ])
+    def testMismatch(self, answers, data):
+        image = MemoryImage(*answers[:-1])
+        with self.assertWarns(UserWarning) as w:
+            image.add(answers[-1].range, answers[-1].data)
+        self.assertEqual(str(w.warning), "Data mismatch, new overlapping data will be ignored")
+        self.assertEqual(image.responses(), [Response(Range(0, len(data)), data)])
+
+    def testInvalidAdd(self):
+        image = MemoryImage()
+        with self.assertRaises(ValueError) as e:
+            image.add(Range(0, 2), bytes([0x01]))
+        self.assertEqual(str(e.exception), "Range and data lengths do not match: 1 != 2")
+        self.assertEqual(len(image), 0)
+
+    def testPages(self):
+        pages = list(range(0, 64))
+        pages.reverse()
+        pages = pages[0::2] + pages[1::2]
+
+        image = MemoryImage()
+        for p in pages:
+            image.add(Range(48*p, 48), bytes([p]*48))
+        self.assertEqual(image.responses(), [Response(Range(0, 48*64), bytes([b for p in range(0, 64) for b in [p]*48]))])
+
+    def testSparse(self):
+        # The memory used is proportional to the data, not to the highest address
+        tracemalloc.start()
+        image = MemoryImage(Response(Range(0x10000000, 48), bytes(range(0, 48))), Response(Range(0x20000000, 48), bytes(range(0, 48))))
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, 0x10000)
+        self.assertEqual(image[Range(0x20000010, 4)], bytes(range(16, 20)))
+
+
+class TestConfigImage(unittest.TestCase):
+    @testdata.TestData([
+        {'writes': [                                                                            ], 'dirty': [                        ]},
+        {'writes': [(Range(0, 2), bytes([0x01, 0x02            ]))                              ], 'dirty': [                        ]},
+        {'writes': [(Range(0, 2), bytes([0xFF, 0x02            ]))                              ], 'dirty': [Range(0, 1)             ]},
+        {'writes': [(Range(0, 4), bytes([0xFF, 0x02, 0xFD, 0xFC]))                              ], 'dirty': [Range(0, 1), Range(2, 2)]},
+        {'writes': [(Range(0, 1), bytes([0xFF                  ])), (Range(1, 1), bytes([0xFE]))], 'dirty': [Range(0, 2)             ]},
+        {'writes': [(Range(0, 1), bytes([0xFF                  ])), (Range(0, 1), bytes([0x01]))], 'dirty': [Range(0, 1)             ]},
+        {'writes': [(6,           bytes([0xF7                  ]))                              ], 'dirty': [Range(6, 1)             ]},
+    ])
+    def testDirty(self, writes, dirty):
+        image = ConfigImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])), Response(Range(6, 2), bytes([0x07, 0x08])))
+        for r, d in writes:
+            image[r] = d
+        self.assertEqual([(d.start, d.len) for d in image.dirty], [(d.start, d.len) for d in dirty])
+
+    def testFill(self):
+        image = ConfigImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])))
+        image.fill(Range(1, 2), bytes([0x00, 0x00]))
+        self.assertEqual(image[Range(0, 4)], bytes([0x01, 0x00, 0x00, 0x04]))
+        self.assertEqual(image.dirty, [])
+        self.assertEqual(image.plan(), [])
+
+    def testTouchClean(self):
+        image = ConfigImage(Response(Range(0, 4), bytes([0x01, 0x02, 0x03, 0x04])))
+        image.touch(Range(1, 2))
+        self.assertEqual([(d.start, d.len) for d in image.dirty], [(1, 2)])
+        image.clean(Range(0, 2))
+        self.assertEqual([(d.start, d.len) for d in image.dirty], [(2, 1)])
+        with self.assertRaises(ValueError):
+            image.touch(Range(3, 2))
+
+    @testdata.TestData([
+        {'dirty': [                                     ], 'protected': [           ], 'maxLen': 52, 'planned': [                                ]},
+        {'dirty': [Range(0x00, 1)                       ], 'protected': [           ], 'maxLen': 52, 'planned': [Range(0x00,  1)                 ]},
+        {'dirty': [Range(0x00, 1), Range(0x04, 1)       ], 'protected': [           ], 'maxLen': 52, 'planned': [Range(0x00,  5)                 ]},
+        {'dirty': [Range(0x00, 1), Range(0x7F, 1)       ], 'protected': [           ], 'maxLen': 52, 'planned': [Range(0x00,  1), Range(0x7F,  1)]},
+        {'dirty': [Range(0x00, 1), Range(0x20, 1)       ], 'protected': [           ], 'maxLen': 16, 'planned': [Range(0x00,  1), Range(0x20,  1)]},
+        {'dirty': [Range(0x00, 0x40)                    ], 'protected': [           ], 'maxLen': 52, 'planned': [Range(0x00, 52), Range(0x34, 12)]},
+        {'dirty': [Range(0x00, 1), Range(0x04, 1)       ], 'protected': [Range(2, 1)], 'maxLen': 52, 'planned': [Range(0x00,  1), Range(0x04,  1)]},
+        {'dirty': [Range(0x00, 1), Range(0x02, 1)       ], 'protected': [Range(2, 1)], 'maxLen': 52, 'planned': [Range(0x00,  3)                 ]},
+        {'dirty': [Range(0x38, 1), Range(0x42, 1)       ], 'protected': [           ], 'maxLen': 52, 'planned': [Range(0x38,  1), Range(0x42,  1)]},
+    ])
+    def testPlan(self, dirty, protected, maxLen, planned):
+        image = ConfigImage(Response(Range(0, 0x40), bytes(0x40)), Response(Range(0x41, 0x40), bytes(0x40)))
+        for d in dirty:
+            image.touch(d)
+        self.assertEqual([(p.start, p.len) for p in image.plan(maxLen, protected)], [(p.start, p.len) for p in planned])
@@ -0,0 +1,265 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from PythonUtils import testdata
+
+from elitech.src.cache import loadJson
+from elitech.src.frames import Response
+from elitech.src.pager import RecordPager
+from elitech.src.parameters import Parameters
+from elitech.src.parameters import Range
+from elitech.src.simulator import LoopbackDevice
+from elitech.src.simulator import Simulator
+
+from datetime import datetime
+from datetime import timedelta
+
+import os
+import tempfile
+import warnings
+
+# The records and the fake devices are the ones of the simulator
+encodeRecord = Simulator.record
+
+class FakeDevice(LoopbackDevice):
+    # Loopback device of a simulator with a blank configuration (only the capacity and the record number are set)
+    def __init__(self, reportSize=64, maxRecords=6, vendorId=0x04d8, productId=0x3005, records=0, capacity=16000, recordNumber=None, recordData=None):
+        if recordData is None:
+            recordData = [bytes(8)] * records
+        super().__init__(Simulator(recordData, reportSize=reportSize, maxRecords=maxRecords, vendorId=vendorId, productId=productId, image=bytes(0x100)))
+        self.recordData = recordData
+        self.config = self.simulator.image
+        self.requests = self.simulator.requests
+        self.simulator.set('device-capacity', capacity)
+        if recordNumber is not None:
+            self.simulator.set('record-number', recordNumber)
+
+    def read(self):
+        # The answers are padded to the input report size, which the tests may change
+        answer = super().read()
+        return answer[:answer[3]] + bytes(max(0, self.inReportSize - answer[3]))
+
+
+class CacheDir:
+    def __enter__(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        self.__env = unittest.mock.patch.dict(os.environ, {'ELITECH_CACHE_DIR': self.__dir.name})
+        self.__env.start()
+        return self.__dir.name
+
+    def __exit__(self, *args):
+        self.__env.stop()
+        self.__dir.cleanup()
+        return False
+
+
+class TestRecordPager(unittest.TestCase):
+
+    @testdata.TestData([
+        {'reportSize':    8, 'pageSize':  1},
+        {'reportSize':   32, 'pageSize':  2},
+        {'reportSize':   64, 'pageSize':  6},
+        {'reportSize':   65, 'pageSize':  6},
+        {'reportSize':  128, 'pageSize': 14},
+        {'reportSize':  256, 'pageSize': 30},
+        {'reportSize': 1024, 'pageSize': 30},
+    ])
+    def testMaxPageSize(self, reportSize, pageSize):
+        self.assertEqual(RecordPager.maxPageSize(reportSize), pageSize)
+
+    @testdata.TestData([
+        {'reportSize': 32, 'pageSize': 2},
+        {'reportSize': 64, 'pageSize': 6},
+    ])
+    def testPageSizeNoProbe(self, reportSize, pageSize):
+        with CacheDir():
+            dev = FakeDevice(reportSize)
+            self.assertEqual(RecordPager(dev).pageSize, pageSize)
+            self.assertEqual(len(dev.requests), 0)
+            self.assertEqual(loadJson(RecordPager.CacheName, {}), {})
+
+    @testdata.TestData([
+        {'reportSize':  128, 'maxRecords':  6, 'pageSize':  6},
+        {'reportSize':  128, 'maxRecords': 10, 'pageSize': 10},
+        {'reportSize':  128, 'maxRecords': 52, 'pageSize': 14},
+        {'reportSize': 1024, 'maxRecords': 20, 'pageSize': 20},
+        {'reportSize': 1024, 'maxRecords': 52, 'pageSize': 30},
+    ])
+    def testPageSizeProbe(self, reportSize, maxRecords, pageSize):
+        with CacheDir():
+            dev = FakeDevice(reportSize, maxRecords)
+            self.assertEqual(RecordPager(dev).pageSize, pageSize)
+            self.assertGreater(len(dev.requests), 0)
+            self.assertEqual(loadJson(RecordPager.CacheName, {}), {'04d8:3005': {'pageSize': pageSize, 'reportSize': reportSize}})
+
+            dev = FakeDevice(reportSize, maxRecords)
+            self.assertEqual(RecordPager(dev).pageSize, pageSize)
+            self.assertEqual(len(dev.requests), 0)
+
+    def testPageSizeProbePerModel(self):
+        with CacheDir():
+            dev1 = FakeDevice(128, 10, productId=0x3005)
+            dev2 = FakeDevice(128, 12, productId=0x0033)
+            self.assertEqual(RecordPager(dev1).pageSize, 10)
+            self.assertEqual(RecordPager(dev2).pageSize, 12)
+            self.assertEqual(loadJson(RecordPager.CacheName, {}), {
+                '04d8:3005': {'pageSize': 10, 'reportSize': 128},
+                '04d8:0033': {'pageSize': 12, 'reportSize': 128},
+            })
+
+    def testPageSizeReportSizeChanged(self):
+        with CacheDir():
+            self.assertEqual(RecordPager(FakeDevice(128, 10)).pageSize, 10)
+            dev = FakeDevice(1024, 20)
+            self.assertEqual(RecordPager(dev).pageSize, 20)
+            self.assertGreater(len(dev.requests), 0)
+
+    @testdata.TestData([
+        {'records':     0, 'capacity': 16000},
+        {'records':     1, 'capacity': 16000},
+        {'records':  1234, 'capacity': 16000},
+        {'records': 16000, 'capacity': 16000},
+    ])
+    def testCount(self, records, capacity):
+        dev = FakeDevice(records=records, capacity=capacity)
+        self.assertEqual(RecordPager(dev).count(), records)
+        self.assertEqual(len(dev.requests), 1)
+
+    def testParseCountersShared(self):
+        parameters = Parameters()
+        capacity = parameters['device-capacity']
+        number = parameters['record-number']
+        data = bytearray(number.range.end + 1 - capacity.offset)
+        data[0:4] = (16000).to_bytes(4, 'big')
+        data[(number.offset - capacity.offset):(number.range.end + 1 - capacity.offset)] = (1234).to_bytes(2, 'big')
+        before = [capacity.value, number.value]
+        self.assertEqual(RecordPager.parseCounters(Response(Range(capacity.offset, len(data)), bytes(data))), (16000, 1234))
+        # The shared parameters are not modified, as the pagers of a fleet run in several threads
+        self.assertEqual([capacity.value, number.value], before)
+
+    @testdata.TestData([
+        {'records':     0, 'capacity': 16000, 'recordNumber': 0xFFFF},
+        {'records':     1, 'capacity': 16000, 'recordNumber': 0xFFFF},
+        {'records':  1234, 'capacity': 16000, 'recordNumber': 16001 },
+        {'records': 15999, 'capacity': 16000, 'recordNumber': 0xFFFF},
+        {'records': 16000, 'capacity': 16000, 'recordNumber': 0xFFFF},
+    ])
+    def testCountUnreliable(self, records, capacity, recordNumber):
+        dev = FakeDevice(records=records, capacity=capacity, recordNumber=recordNumber)
+        self.assertEqual(RecordPager(dev).count(), records)
+        self.assertLessEqual(len(dev.requests), 2 + capacity.bit_length())
+
+    @testdata.TestData([
+        {'records':     0},
+        {'records':     1},
+        {'records':     2},
+        {'records':  1234},
+        {'records': 16384},
+    ])
+    def testSearchNoCapacity(self, records):
+        dev = FakeDevice(records=records)
+        self.assertEqual(RecordPager(dev).search(), records)
+        self.assertLessEqual(len(dev.requests), 2 + 2*records.bit_length())
+
+    @testdata.TestData([
+        {'records': 1000, 'since':    0, 'until': None, 'span': (   0, 1000)},
+        {'records': 1000, 'since':    1, 'until': None, 'span': (   1, 1000)},
+        {'records': 1000, 'since':  500, 'until': None, 'span': ( 500, 1000)},
+        {'records': 1000, 'since':  999, 'until': None, 'span': ( 999, 1000)},
+        {'records': 1000, 'since': 1000, 'until': None, 'span': (1000, 1000)},
+        {'records': 1000, 'since': None, 'until':    0, 'span': (   0,    1)},
+        {'records': 1000, 'since': None, 'until':  499, 'span': (   0,  500)},
+        {'records': 1000, 'since': None, 'until': 1000, 'span': (   0, 1000)},
+        {'records': 1000, 'since':  250, 'until':  750, 'span': ( 250,  751)},
+        {'records':    7, 'since':    3, 'until':    5, 'span': (   3,    6)},
+        {'records':    0, 'since':    3, 'until':    5, 'span': (   0,    0)},
+    ])
+    def testSpan(self, records, since, until, span):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, records)])
+        since = (t0 + timedelta(minutes=since)) if since is not None else None
+        until = (t0 + timedelta(minutes=until)) if until is not None else None
+        self.assertEqual(RecordPager(dev).span(since, until), span)
+        self.assertLessEqual(len(dev.requests), 3 + 2*records.bit_length())
+
+    def testSpanUnordered(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        recordData = [encodeRecord(t0 + timedelta(minutes=r)) for r in range(1000, 1500)]
+        recordData += [encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, 500)]
+        dev = FakeDevice(recordData=recordData)
+        with self.assertWarns(UserWarning) as w:
+            span = RecordPager(dev).span(t0 + timedelta(minutes=1200))
+        self.assertEqual(str(w.warning), "Records are not ordered by time")
+        self.assertEqual(span, (0, 1000))
+
+    def testSpanProtocol(self):
+        # Bit 9 is the high temperature bit on protocol 0x23 and above
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r), 0x200) for r in range(0, 100)])
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            span = RecordPager(dev).span(t0 + timedelta(minutes=25), t0 + timedelta(minutes=75), protocol=0x23)
+        self.assertEqual(span, (25, 76))
+        self.assertEqual([str(m.message) for m in w], [])
+
+    def testSeekPauseStop(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        recordData = [encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, 100)]
+        recordData += [encodeRecord(t0 + timedelta(minutes=100), 0b100)]
+        recordData += [encodeRecord(t0 + timedelta(minutes=r)) for r in range(200, 300)]
+        dev = FakeDevice(recordData=recordData)
+        self.assertEqual(RecordPager(dev).seek(t0 + timedelta(minutes=150)), 101)
+        self.assertEqual(RecordPager(dev).seek(t0 + timedelta(minutes=100)), 100)
+        self.assertEqual(RecordPager(dev).seek(t0 + timedelta(minutes=210)), 111)
+
+    @testdata.TestData([
+        {'records':  0, 'slice': slice(None, None, None), 'indices': []                },
+        {'records': 20, 'slice': slice(None, None, None), 'indices': list(range(0, 20))},
+        {'records': 20, 'slice': slice(5, None, None),    'indices': list(range(5, 20))},
+        {'records': 20, 'slice': slice(5, 12, None),      'indices': list(range(5, 12))},
+        {'records': 20, 'slice': slice(None, None, 3),    'indices': list(range(0, 20, 3))},
+        {'records': 20, 'slice': slice(1, 18, 4),         'indices': list(range(1, 18, 4))},
+        {'records': 20, 'slice': slice(15, 25, None),     'indices': list(range(15, 25))},
+    ])
+    def testRecords(self, records, slice, indices):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, records)])
+        result = list(RecordPager(dev).records(slice))
+        self.assertEqual([r for r, record in result], indices)
+        for r, record in result:
+            if (r < records):
+                self.assertEqual(record.time, t0 + timedelta(minutes=r))
+            else:
+                self.assertIsNone(record)
+
+    def testRecordsSinceUntil(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, 1000)])
+        result = list(RecordPager(dev).records(since=t0 + timedelta(minutes=250), until=t0 + timedelta(minutes=260)))
+        self.assertEqual([r for r, record in result], list(range(250, 261)))
+
+    def testRecordsStreaming(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, 100)])
+        records = RecordPager(dev).records(slice(0, 100))
+        self.assertEqual(next(records)[0], 0)
+        self.assertEqual(len([r for r in dev.requests if (r[4] == 0x01)]), 1)
+        self.assertEqual(len(list(records)), 99)
+        self.assertEqual(len([r for r in dev.requests if (r[4] == 0x01)]), 17)
@@ -36,6 +36,13 @@ from elitech.src.parameters import EnumBitParameter
 from elitech.src.parameters import FloatParameter
 from elitech.src.parameters import TimeSpanParameter
 from elitech.src.parameters import TimeZoneParameter
+from elitech.src.parameters import Codec
+from elitech.src.parameters import Parameters
+from elitech.src.parameters import PdfLanguages
+from elitech.src.parameters import StopModes
+from elitech.src.simulator import Simulator
+
+import copy
 
 class TestStringParameter(unittest.TestCase):
     @testdata.TestData([
@@ -1872,3 +1879,100 @@ class TestTimeZoneParameter(unittest.TestCase):
         self.assertEqual(str(param), '')
         self.assertEqual(bytes(param | bytes([0xE0] + [0xFF]*10 + [0x00])), bytes([0xE0] + [0xFF]*10 + [0x00]))
 
+
+class TestCodec(unittest.TestCase):
+    def image(self):
+        sim = Simulator()
+        sim.set('device-state', 'MAX')
+        return bytes(sim.image)
+
+    def testIndex(self):
+        codec = Codec(list(Parameters()))
+        for p in Parameters():
+            self.assertIs(codec[p.name], p)
+        self.assertEqual([p.name for p in codec], [p.name for p in Parameters()])
+        with self.assertRaises(KeyError) as e:
+            codec['unknown']
+        self.assertEqual(e.exception.args[0], "Unknown parameter: unknown")
+
+    def testDecode(self):
+        image = self.image()
+        codec = Codec(list(Parameters()))
+        values = {p.name: copy.copy(p).parseData(image[p.range.start:(p.range.end + 1)]).value for p in Parameters()}
+        self.assertEqual(codec.decode(image), values)
+        self.assertEqual({n: type(v) for n, v in codec.decode(image).items()}, {n: type(v) for n, v in values.items()})
+
+    @testdata.TestData([
+        {'start': 0x00, 'stop': 0x40},
+        {'start': 0x20, 'stop': 0x50},
+        {'start': 0x21, 'stop': 0x2C},
+        {'start': 0x40, 'stop': 0x80},
+    ])
+    def testDecodeBlock(self, start, stop):
+        image = self.image()
+        codec = Codec(list(Parameters()))
+        values = {p.name: copy.copy(p).parseData(image[p.range.start:(p.range.end + 1)]).value for p in Parameters() if (start <= p.range.start) and (p.range.end < stop)}
+        self.assertEqual(codec.decode(image[start:stop], start), values)
+
+    def testDecodeInvalidTimeZone(self):
+        image = bytearray(self.image())
+        r = Parameters()['timezone'].range
+        # Only the first and last bytes belong to the time zone
+        image[r.start] = 0xF9
+        image[r.end] = 0x00
+        codec = Codec(list(Parameters()))
+        with self.assertWarns(UserWarning) as w:
+            values = codec.decode(bytes(image))
+        self.assertEqual(str(w.warning), "Invalid timezone data: h=25, m=0")
+        self.assertIsNone(values['timezone'])
+
+        # The previous value is not kept either when parsing invalid data
+        param = copy.copy(Parameters()['timezone']).parseValue('+0100')
+        with self.assertWarns(UserWarning):
+            param.parseData(image[r.start:(r.end + 1)])
+        self.assertIsNone(param.value)
+
+    def testDecodeNames(self):
+        image = self.image()
+        codec = Codec(list(Parameters()))
+        self.assertEqual(codec.decode(image, names=['csv', 'start-delay']), {'csv': False, 'start-delay': 0})
+
+    @testdata.TestData([
+        {'values': {'csv': True}},
+        {'values': {'start-delay': 42}},
+        {'values': {'actual-stop-mode': StopModes.Temporary, 'pdf-language': PdfLanguages.es}},
+        {'values': {'interval': 60, 'timezone': '+0130', 'repeat': True}},
+    ])
+    def testEncode(self, values):
+        image = self.image()
+        codec = Codec(list(Parameters()))
+        data = bytearray(image)
+        for name, v in values.items():
+            p = copy.copy(Parameters()[name])
+            p.value = v
+            data[p.range.start:(p.range.end + 1)] = bytes(p | data[p.range.start:(p.range.end + 1)])
+        self.assertEqual(codec.encode(image, values), bytes(data))
+        self.assertEqual(codec.decode(bytes(data), names=values.keys()), values)
+
+    def testEncodeBits(self):
+        image = bytes([0xFF] * 0x80)
+        codec = Codec(list(Parameters()))
+        data = codec.encode(image, {'csv': False})
+        offset = Parameters()['csv'].range.start
+        self.assertEqual(data[:offset] + data[(offset + 1):], image[:offset] + image[(offset + 1):])
+        self.assertEqual(bin(data[offset] ^ image[offset]).count('1'), 1)
+
+    def testEncodeDefault(self):
+        image = bytes([0xFF] * 0x80)
+        codec = Codec(list(Parameters()))
+        for name in ['csv', 'start-delay', 'device-state']:
+            p = copy.copy(Parameters()[name])
+            p._value = None
+            self.assertEqual(codec.encode(image, {name: None})[p.range.start:(p.range.end + 1)], bytes(p | image[p.range.start:(p.range.end + 1)]))
+
+    def testEncodeOutOfRange(self):
+        codec = Codec(list(Parameters()))
+        with self.assertRaises(ValueError):
+            codec.encode(bytes(16), {'csv': True}, 0x00)
+        with self.assertRaises(KeyError):
+            codec.encode(bytes(16), {'unknown': True}, 0x00)
@@ -0,0 +1,107 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.pager import RecordPager
+from elitech.src.pipeline import RecordPipeline
+
+from .test_pager import FakeDevice
+from .test_pager import encodeRecord
+
+from datetime import datetime
+from datetime import timedelta
+
+import threading
+import time
+
+def makeDevice(records):
+    t0 = datetime(2024, 1, 31, 8, 0, 0)
+    return FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, records)])
+
+class FailingDevice(FakeDevice):
+    def __init__(self, failAfter, *args, **kwArgs):
+        super().__init__(*args, **kwArgs)
+        self.failAfter = failAfter
+
+    def read(self):
+        if (len([r for r in self.requests if (r[4] == 0x01)]) > self.failAfter):
+            raise OSError("Device disconnected")
+        return super().read()
+
+class BlockingDevice(FakeDevice):
+    def __init__(self, blockAfter, *args, **kwArgs):
+        super().__init__(*args, **kwArgs)
+        self.blockAfter = blockAfter
+        self.released = threading.Event()
+
+    def read(self):
+        if (len([r for r in self.requests if (r[4] == 0x01)]) > self.blockAfter):
+            self.released.wait()
+        return super().read()
+
+class TestRecordPipeline(unittest.TestCase):
+    @testdata.TestData([
+        {'records':   0, 'slice': slice(None, None, None), 'depth': None},
+        {'records':  20, 'slice': slice(None, None, None), 'depth': None},
+        {'records': 200, 'slice': slice(None, None, None), 'depth':    1},
+        {'records': 200, 'slice': slice(10, 150, 7),       'depth':    2},
+        {'records':  20, 'slice': slice(15, 25, None),     'depth': None},
+    ])
+    def testRecords(self, records, slice, depth):
+        expected = [(r, record.time if record else None) for r, record in RecordPager(makeDevice(records)).records(slice)]
+        result = [(r, record.time if record else None) for r, record in RecordPipeline(makeDevice(records), slice, depth=depth)]
+        self.assertEqual(result, expected)
+
+    def testSinceUntil(self):
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        pipeline = RecordPipeline(makeDevice(1000), since=t0 + timedelta(minutes=250), until=t0 + timedelta(minutes=260))
+        self.assertEqual([r for r, record in pipeline], list(range(250, 261)))
+
+    def testRun(self):
+        output = []
+        self.assertEqual(RecordPipeline(makeDevice(50)).run(lambda r, record: output.append(r)), 50)
+        self.assertEqual(output, list(range(0, 50)))
+
+    def testError(self):
+        threads = threading.active_count()
+        dev = FailingDevice(3, recordData=makeDevice(100).recordData)
+        with self.assertRaises(OSError) as e:
+            list(RecordPipeline(dev, slice(0, 100)))
+        self.assertEqual(str(e.exception), "Device disconnected")
+        self.assertEqual(threading.active_count(), threads)
+
+    def testClose(self):
+        threads = threading.active_count()
+        dev = makeDevice(1000)
+        records = iter(RecordPipeline(dev, slice(0, 1000), depth=2))
+        self.assertEqual(next(records)[0], 0)
+        records.close()
+        self.assertEqual(threading.active_count(), threads)
+        self.assertLess(len([r for r in dev.requests if (r[4] == 0x01)]), 1000 // 6)
+
+    def testCloseBlocked(self):
+        # The reader blocked on the device does not prevent closing the pipeline
+        dev = BlockingDevice(3, recordData=makeDevice(100).recordData)
+        records = iter(RecordPipeline(dev, slice(0, 100), depth=1))
+        self.assertEqual(next(records)[0], 0)
+        t = time.monotonic()
+        records.close()
+        self.assertLess(time.monotonic() - t, 2 * RecordPipeline.JoinTimeout)
+        dev.released.set()
@@ -20,6 +20,7 @@ import unittest
 from PythonUtils import testdata
 
 from elitech.src.parameters import Range
+from elitech.src.parameters import parameters
 
 class TestRange(unittest.TestCase):
     @testdata.TestData([
@@ -335,3 +336,46 @@ class TestRange(unittest.TestCase):
         self.assertEqual(Range.optimize(ranges), optimized)
         self.assertEqual(ranges, original)
 
+    @testdata.TestData([
+        {'ranges': [                                     ], 'planned': [                                     ]},
+        {'ranges': [Range(0, 0)                          ], 'planned': [                                     ]},
+        {'ranges': [Range(0, 1)                          ], 'planned': [Range(0, 1)                          ]},
+        {'ranges': [Range(0, 1), Range(1, 1)             ], 'planned': [Range(0, 2)                          ]},
+        {'ranges': [Range(0, 1), Range(4, 1)             ], 'planned': [Range(0, 5)                          ]},
+        {'ranges': [Range(4, 1), Range(0, 1)             ], 'planned': [Range(0, 5)                          ]},
+        {'ranges': [Range(0, 1), Range(100, 1)           ], 'planned': [Range(0, 1), Range(100, 1)           ]},
+        {'ranges': [Range(0, 52)                         ], 'planned': [Range(0, 52)                         ]},
+        {'ranges': [Range(0, 53)                         ], 'planned': [Range(0, 52), Range(52, 1)           ]},
+        {'ranges': [Range(0, 120)                        ], 'planned': [Range(0, 52), Range(52, 52), Range(104, 16)]},
+        {'ranges': [Range(0, 50), Range(51, 3)           ], 'planned': [Range(0, 50), Range(51, 3)           ]},
+        {'ranges': [Range(0, 10), Range(20, 10), Range(40, 10)], 'planned': [Range(0, 50)                    ]},
+    ])
+    def testPlan(self, ranges, planned):
+        original = [r for r in ranges]
+        self.assertEqual(Range.plan(ranges), planned)
+        self.assertEqual(ranges, original)
+
+    @testdata.TestData([
+        {'ranges': [Range(0, 1), Range(4, 1)], 'frameCost': 64, 'byteCost':  1, 'planned': [Range(0, 5)             ]},
+        {'ranges': [Range(0, 1), Range(4, 1)], 'frameCost':  2, 'byteCost':  1, 'planned': [Range(0, 1), Range(4, 1)]},
+        {'ranges': [Range(0, 1), Range(4, 1)], 'frameCost': 64, 'byteCost': 32, 'planned': [Range(0, 1), Range(4, 1)]},
+        {'ranges': [Range(0, 4)             ], 'frameCost': 64, 'byteCost':  1, 'planned': [Range(0, 4)             ]},
+    ])
+    def testPlanCost(self, ranges, frameCost, byteCost, planned):
+        self.assertEqual(Range.plan(ranges, frameCost=frameCost, byteCost=byteCost), planned)
+
+    @testdata.TestData([
+        {'maxLen': 52, 'frames':  3},
+        {'maxLen': 16, 'frames':  7},
+        {'maxLen':  8, 'frames': 13},
+    ])
+    def testPlanParameters(self, maxLen, frames):
+        planned = Range.plan([p.range for p in parameters], maxLen)
+        self.assertEqual(len(planned), frames)
+        self.assertEqual(planned, sorted(planned, key=lambda r: r.start))
+        covered = set()
+        for r in planned:
+            self.assertLessEqual(r.len, maxLen)
+            covered |= set(range(r.start, r.end + 1))
+        for p in parameters:
+            self.assertTrue(set(range(p.range.start, p.range.end + 1)) <= covered)
@@ -16,13 +16,41 @@
 # along with python-elitech. If not, see <http://www.gnu.org/licenses/>
 
 import unittest
+import unittest.mock
 
 from PythonUtils import testdata
 
 from elitech.src.record import Record
+from elitech.src.record import numpy
 
 from datetime import datetime
 
+import math
+import os
+import time
+
+def encodeTime(t):
+    q = (t.minute << 48) | (t.hour << 32) | (t.day << 27) | (t.month << 23) | ((t.year - 2000) << 16) | (t.second << 10)
+    return q.to_bytes(8, 'little')
+
+class LocalTimeZone:
+    def __init__(self, tz):
+        self.__tz = tz
+
+    def __enter__(self):
+        self.__old = os.environ.get('TZ')
+        os.environ['TZ'] = self.__tz
+        time.tzset()
+        return self
+
+    def __exit__(self, *args):
+        if self.__old is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = self.__old
+        time.tzset()
+        return False
+
 class TestRecord(unittest.TestCase):
     @testdata.TestData([
         {'frame': '00 E8 96 D0 D5 19 23 00', 't': datetime(2022, 1, 26, 21, 35, 58), 'temperature':  20.6, 'humidity':  None, 'flags': Record.Flags.Zero,                                            'flagStr': '---', 'pause': False, 'stop': False, 'error': False},
@@ -167,3 +195,101 @@ class TestRecord(unittest.TestCase):
             Record.parse(bytes([int(b, 16) for b in frame.split(' ')]))
         self.assertEqual(str(e.exception), f"Invalid record length: {l}")
 
+    @testdata.TestData([
+        {'frames': ['00 E8 96 D0 D5 19 23 00'],                                                       'protocol': 0x20},
+        {'frames': ['00 E8 96 D0 D5 19 23 00', '01 20 96 D0 B5 19 24 00', '02 48 96 D0 95 19 A4 32'], 'protocol': 0x20},
+        {'frames': ['08 E8 96 D0 D5 19 E3 31', '49 20 96 D0 B5 19 64 32', '60 C0 96 D0 F5 18 A4 33'], 'protocol': 0x20},
+        {'frames': ['00 EA 96 D0 D5 19 23 00', '09 22 96 D0 B5 19 64 32', 'C8 EA 96 D0 D5 18 E4 33'], 'protocol': 0x23},
+        {'frames': ['00 E8 96 D0 D5 19 23 00', 'FF FF FF FF FF FF FF FF', '02 48 96 D0 95 19 A4 32'], 'protocol': 0x20},
+        {'frames': ['FF FF FF FF FF FF FF FF', 'FF FF FF FF FF FF FF FF'],                            'protocol': 0x23},
+    ])
+    def testParseBatch(self, frames, protocol):
+        data = bytes([int(b, 16) for f in frames for b in f.split(' ')])
+        for useNumPy in ([False, True] if numpy is not None else [False]):
+            with unittest.mock.patch('elitech.src.record.numpy', numpy if useNumPy else None):
+                records = Record.parseBatch(data, protocol)
+            self.assertEqual(len(records['time']), len(frames))
+            for f, frame in enumerate(frames):
+                r = Record.parse(bytes([int(b, 16) for b in frame.split(' ')]), protocol)
+                if r is None:
+                    self.assertFalse(records['valid'][f])
+                    self.assertTrue(math.isnan(records['temperature'][f]))
+                    self.assertTrue(math.isnan(records['humidity'][f]))
+                    continue
+                self.assertTrue(records['valid'][f])
+                self.assertEqual(records['time'][f], r.time.timestamp())
+                self.assertEqual(records['temperature'][f], r.temperature)
+                if r.humidity is None:
+                    self.assertTrue(math.isnan(records['humidity'][f]))
+                else:
+                    self.assertEqual(records['humidity'][f], r.humidity)
+                self.assertEqual(records['flags'][f], int(frame[0:2], 16))
+
+    @testdata.TestData([
+        {'tz': 'UTC'            },
+        {'tz': 'Europe/Paris'   },
+        {'tz': 'America/Chicago'},
+        {'tz': 'Asia/Kolkata'   },
+    ])
+    def testParseBatchTimeZone(self, tz):
+        times = [
+            datetime(2024,  1, 31,  8,  0,  0),
+            datetime(2024,  3, 10,  2, 30,  0),
+            datetime(2024,  3, 31,  1, 59, 59),
+            datetime(2024,  3, 31,  3,  0,  0),
+            datetime(2024,  7,  1, 12,  0,  0),
+            datetime(2024, 10, 27,  2, 30,  0),
+            datetime(2024, 11,  3,  1, 30,  0),
+        ]
+        data = b''.join([encodeTime(t) for t in times])
+        with LocalTimeZone(tz):
+            for useNumPy in ([False, True] if numpy is not None else [False]):
+                with unittest.mock.patch('elitech.src.record.numpy', numpy if useNumPy else None):
+                    records = Record.parseBatch(data)
+                # The times are the timestamps of the naive datetimes of Record.parse
+                self.assertEqual(list(records['time']), [Record.parse(encodeTime(t)).time.timestamp() for t in times])
+
+    @testdata.TestData([
+        {'t': (2024,  0, 10, 8,  0,  0)},
+        {'t': (2024, 13, 10, 8,  0,  0)},
+        {'t': (2024,  1,  0, 8,  0,  0)},
+        {'t': (2023,  2, 29, 8,  0,  0)},
+        {'t': (2024,  4, 31, 8,  0,  0)},
+        {'t': (2024,  1, 10, 24, 0,  0)},
+        {'t': (2024,  1, 10, 8, 60,  0)},
+        {'t': (2024,  1, 10, 8,  0, 60)},
+    ])
+    def testParseBatchInvalidDate(self, t):
+        year, month, day, hour, minute, second = t
+        q = (minute << 48) | (hour << 32) | (day << 27) | (month << 23) | ((year - 2000) << 16) | (second << 10)
+        data = encodeTime(datetime(2024, 1, 31, 8, 0, 0)) + q.to_bytes(8, 'little')
+        with self.assertRaises(ValueError) as e:
+            Record.parse(q.to_bytes(8, 'little'))
+        for useNumPy in ([False, True] if numpy is not None else [False]):
+            with unittest.mock.patch('elitech.src.record.numpy', numpy if useNumPy else None):
+                with self.assertRaises(ValueError) as b:
+                    Record.parseBatch(data)
+            self.assertEqual(str(b.exception), str(e.exception))
+
+    @testdata.TestData([
+        {'frames': ['00 E9 96 D0 D5 19 23 00'],                            'b': 8},
+        {'frames': ['00 EA 96 D0 D5 19 23 00'],                            'b': 9},
+        {'frames': ['FF FF FF FF FF FF FF FF', '00 EA 96 D0 D5 19 E3 31'], 'b': 9},
+    ])
+    def testParseBatchWarning(self, frames, b):
+        data = bytes([int(b, 16) for f in frames for b in f.split(' ')])
+        for useNumPy in ([False, True] if numpy is not None else [False]):
+            with unittest.mock.patch('elitech.src.record.numpy', numpy if useNumPy else None):
+                with self.assertWarns(UserWarning) as w:
+                    Record.parseBatch(data)
+            self.assertEqual(str(w.warning), f"Ignored bit {b} is non zero")
+
+    @testdata.TestData([
+        {'l':  7},
+        {'l':  9},
+        {'l': 15},
+    ])
+    def testParseBatchInvalid(self, l):
+        with self.assertRaises(ValueError) as e:
+            Record.parseBatch(bytes([0xFF]*l))
+        self.assertEqual(str(e.exception), f"Invalid records length: {l}")
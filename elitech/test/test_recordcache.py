@@ -0,0 +1,136 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.archive import Archive
+from elitech.src.cache import cachePath
+from elitech.src.recordcache import RecordCache
+
+from .test_pager import CacheDir
+from .test_pager import FakeDevice
+from .test_pager import encodeRecord
+
+from datetime import datetime
+from datetime import timedelta
+
+def makeDevice(records, serial=b'EF1234567890', startTime=bytes([24, 1, 0, 31, 8, 0, 0])):
+    t0 = datetime(2024, 1, 31, 8, 0, 0)
+    dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r)) for r in range(0, records)])
+    dev.config[0x02:0x0E] = serial
+    dev.config[0x30:0x37] = startTime
+    return dev
+
+class TestRecordCache(unittest.TestCase):
+    @testdata.TestData([
+        {'records':   0},
+        {'records':   1},
+        {'records': 100},
+    ])
+    def testSyncEmpty(self, records):
+        with CacheDir():
+            cache = RecordCache(makeDevice(records))
+            self.assertEqual(cache.sync(), records)
+            self.assertEqual(cache.serial, 'EF1234567890')
+            self.assertEqual(cache.new, 0)
+            self.assertEqual(len(cache), records)
+            self.assertEqual([r for r, record in cache.records()], list(range(0, records)))
+            with Archive(cachePath('records', 'EF1234567890.elt')) as archive:
+                self.assertEqual(archive.serial, 'EF1234567890')
+                self.assertEqual(archive.rawStartTime, bytes([24, 1, 0, 31, 8, 0, 0]))
+                self.assertEqual(len(archive), records)
+
+    @testdata.TestData([
+        {'before':   0, 'after':   0},
+        {'before':  10, 'after':  10},
+        {'before':  10, 'after':  11},
+        {'before': 100, 'after': 250},
+    ])
+    def testSyncIncremental(self, before, after):
+        with CacheDir():
+            RecordCache(makeDevice(before)).sync()
+
+            dev = makeDevice(after)
+            cache = RecordCache(dev)
+            self.assertEqual(cache.sync(), after - before)
+            self.assertEqual(cache.new, before)
+            self.assertEqual(len(cache), after)
+            self.assertEqual(cache.data, b''.join(dev.recordData))
+            recordRequests = [r for r in dev.requests if (r[4] == 0x01)]
+            self.assertEqual(len(recordRequests), (after - before + 5) // 6)
+
+    def testSyncRestarted(self):
+        with CacheDir():
+            RecordCache(makeDevice(100)).sync()
+
+            cache = RecordCache(makeDevice(120, startTime=bytes([24, 2, 0, 1, 8, 0, 0])))
+            with self.assertWarns(UserWarning) as w:
+                self.assertEqual(cache.sync(), 120)
+            self.assertEqual(str(w.warning), "A new recording was started on EF1234567890: cached records are discarded")
+            self.assertEqual(cache.new, 0)
+            self.assertEqual(len(cache), 120)
+
+    def testSyncErased(self):
+        with CacheDir():
+            RecordCache(makeDevice(100)).sync()
+
+            cache = RecordCache(makeDevice(50))
+            with self.assertWarns(UserWarning) as w:
+                self.assertEqual(cache.sync(), 50)
+            self.assertEqual(str(w.warning), "Records were erased on EF1234567890: cached records are discarded")
+            self.assertEqual(cache.new, 0)
+            self.assertEqual(len(cache), 50)
+
+    def testSyncPerSerial(self):
+        with CacheDir():
+            RecordCache(makeDevice(100, serial=b'EF0000000001')).sync()
+            cache = RecordCache(makeDevice(20, serial=b'EF0000000002'))
+            self.assertEqual(cache.sync(), 20)
+            self.assertEqual(len(cache), 20)
+
+    def testSyncNoSerial(self):
+        # The devices without a serial number cannot be told apart: their records are not cached
+        with CacheDir():
+            RecordCache(makeDevice(100, serial=bytes(12))).sync()
+            cache = RecordCache(makeDevice(20, serial=bytes(12)))
+            self.assertEqual(cache.sync(), 20)
+            self.assertEqual(cache.serial, '')
+            self.assertIsNone(cache.archive)
+            self.assertEqual(len(cache), 20)
+            self.assertFalse(cachePath('records').exists() and any(cachePath('records').iterdir()))
+
+    def testRecordsProtocol(self):
+        # Bit 9 is the high temperature bit on protocol 0x23 and above
+        t0 = datetime(2024, 1, 31, 8, 0, 0)
+        dev = FakeDevice(recordData=[encodeRecord(t0 + timedelta(minutes=r), 1 << 9) for r in range(0, 10)])
+        dev.config[0x30:0x37] = bytes([24, 1, 0, 31, 8, 0, 0])
+        dev.config[0x95] = 0x23
+        with CacheDir():
+            cache = RecordCache(dev)
+            cache.sync()
+            self.assertIsNone(cache.archive)
+            self.assertEqual([record.temperature for r, record in cache.records()], [102.4] * 10)
+
+    @testdata.TestData([
+        {'serial': 'EF1234567890', 'name': 'EF1234567890'},
+        {'serial': 'EF 12/34',     'name': 'EF_12_34'    },
+        {'serial': '',             'name': '_'           },
+    ])
+    def testFileName(self, serial, name):
+        self.assertEqual(RecordCache.fileName(serial), name)
@@ -0,0 +1,171 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from elitech.src.cache import storeJson
+from elitech.src.device import DescriptorCacheName
+from elitech.src.device import Device
+from elitech.src.registry import DeviceRegistry
+
+from .test_pager import CacheDir
+from .test_recordcache import makeDevice
+from .test_scan import makeSysfs
+
+from pathlib import Path
+
+import hashlib
+import os
+import tempfile
+
+class RegistryDevice(Device):
+    inReportSize = 64
+    outReportSize = 64
+    fakes = {}
+
+    def write(self, frame):
+        RegistryDevice.fakes[self.path.name].write(frame)
+
+    def read(self):
+        return RegistryDevice.fakes[self.path.name].read()
+
+class TestDeviceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.__dir.name)
+        self.devPath = self.root / 'dev'
+        self.devPath.mkdir()
+        self.classPath = makeSysfs(self.root / 'sys', [])
+        RegistryDevice.fakes = {}
+
+    def tearDown(self):
+        self.__dir.cleanup()
+
+    def plug(self, n, serial=None, hidId='0003:000004D8:00003005', dev=True):
+        makeSysfs(self.root / 'sys', [(f'hidraw{n}', 'usb1', f'1-{n + 1}', hidId, None)])
+        if serial is not None:
+            RegistryDevice.fakes[f'hidraw{n}'] = makeDevice(0, serial=serial)
+        if dev:
+            (self.devPath / f'hidraw{n}').touch()
+
+    def unplug(self, n):
+        os.remove(self.devPath / f'hidraw{n}')
+        os.remove(self.classPath / f'hidraw{n}')
+
+    def registry(self):
+        return DeviceRegistry(self.classPath, self.devPath, RegistryDevice.fromInfo)
+
+    def testScan(self):
+        self.plug(0)
+        self.plug(1, hidId='0003:0000046D:0000C069')
+        self.plug(2, dev=False)
+        self.plug(3)
+        with self.registry() as registry:
+            self.assertEqual(len(registry), 2)
+            self.assertEqual(sorted([e.path for e in registry]), [self.devPath / 'hidraw0', self.devPath / 'hidraw3'])
+            self.assertEqual(registry.get(self.devPath / 'hidraw3').info.name, 'Elitech RC-5+')
+            self.assertEqual(registry.get(self.devPath / 'hidraw3').info.port, '1-4')
+            self.assertIsNone(registry.get(self.devPath / 'hidraw2'))
+
+    def testIdentify(self):
+        self.plug(0, b'EF0000000001')
+        self.plug(1, b'EF0000000002')
+        RegistryDevice.fakes['hidraw1'].config[0x00:0x02] = bytes([0x52, 0x10])
+        RegistryDevice.fakes['hidraw1'].config[0x95] = 0x23
+        with self.registry() as registry:
+            self.assertNotIn('EF0000000002', registry)
+            self.assertEqual(len(registry.identify()), 2)
+            self.assertIn('EF0000000002', registry)
+            entry = registry['EF0000000002']
+            self.assertEqual(entry.path, self.devPath / 'hidraw1')
+            self.assertEqual(entry.model, 0x5210)
+            self.assertEqual(entry.protocol, 0x23)
+            self.assertEqual(registry.device('EF0000000001').path, self.devPath / 'hidraw0')
+
+            # The identity is only read once
+            requests = len(RegistryDevice.fakes['hidraw1'].requests)
+            registry.identify()
+            registry.identify(entry)
+            self.assertEqual(len(RegistryDevice.fakes['hidraw1'].requests), requests)
+
+    def testHotplug(self):
+        self.plug(0, b'EF0000000001')
+        with self.registry() as registry:
+            registry.identify()
+            self.assertEqual(len(registry), 1)
+
+            self.plug(1, b'EF0000000002')
+            registry.update()
+            self.assertEqual(len(registry), 2)
+            self.assertEqual(registry.identify()[0].serial, 'EF0000000002')
+
+            self.unplug(0)
+            registry.update()
+            self.assertEqual(len(registry), 1)
+            self.assertNotIn('EF0000000001', registry)
+            self.assertIn('EF0000000002', registry)
+
+            # Replugging under another node
+            self.unplug(1)
+            self.plug(2, b'EF0000000002')
+            registry.update()
+            self.assertNotIn('EF0000000002', registry)
+            registry.identify()
+            self.assertEqual(registry['EF0000000002'].path, self.devPath / 'hidraw2')
+
+    def testHotplugSysfsFirst(self):
+        with self.registry() as registry:
+            self.plug(0, dev=False)
+            registry.update()
+            self.assertEqual(len(registry), 0)
+            (self.devPath / 'hidraw0').touch()
+            registry.update()
+            self.assertEqual(len(registry), 1)
+
+    def testRescan(self):
+        self.plug(0)
+        with self.registry() as registry:
+            registry.close()
+            self.plug(1)
+            registry.update()
+            self.assertEqual(len(registry), 2)
+            self.unplug(0)
+            registry.update()
+            self.assertEqual(len(registry), 1)
+
+    def testDescriptor(self):
+        self.plug(0)
+        descriptor = self.classPath / 'hidraw0' / 'device' / 'report_descriptor'
+        descriptor.write_bytes(bytes([0x06, 0x00, 0xFF]))
+        with self.registry() as registry:
+            entry = registry.get(self.devPath / 'hidraw0')
+            self.assertEqual(entry.descriptor, bytes([0x06, 0x00, 0xFF]))
+            descriptor.write_bytes(bytes([0x05, 0x01]))
+            self.assertEqual(entry.descriptor, bytes([0x06, 0x00, 0xFF]))
+
+    def testDeviceDescriptor(self):
+        # The device gets the report descriptor from the registry and does not read sysfs again
+        self.plug(0)
+        descriptor = self.classPath / 'hidraw0' / 'device' / 'report_descriptor'
+        descriptor.write_bytes(bytes([0x06, 0x01, 0xFF, 0x09, 0x01]))
+        with CacheDir(), DeviceRegistry(self.classPath, self.devPath) as registry:
+            storeJson(DescriptorCacheName, {hashlib.sha256(bytes([0x06, 0x01, 0xFF, 0x09, 0x01])).hexdigest(): {'inReportSize': 32, 'outReportSize': 16}})
+            entry = registry.get(self.devPath / 'hidraw0')
+            entry.descriptor
+            os.remove(descriptor)
+            dev = registry.device(entry)
+            self.assertEqual((dev.inReportSize, dev.outReportSize), (32, 16))
@@ -0,0 +1,125 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.device import Device
+from elitech.src.device import DeviceInfo
+
+from pathlib import Path
+
+import tempfile
+
+def makeSysfs(root, nodes):
+    # nodes: (name, hub, port, uevent HID_ID or None, idVendor/idProduct or None)
+    root = Path(root)
+    (root / 'class' / 'hidraw').mkdir(parents=True, exist_ok=True)
+    for name, hub, port, hidId, usbId in nodes:
+        usbPath = root / 'devices' / 'pci0000:00' / '0000:00:14.0' / hub / port
+        hidPath = usbPath / f'{port}:1.0' / f'0003:04D8:3005.{name[6:]:>04}'
+        (hidPath / 'hidraw' / name).mkdir(parents=True)
+        if hidId is not None:
+            (hidPath / 'uevent').write_text(f'DRIVER=hid-generic\nHID_ID={hidId}\nHID_NAME=Elitech\n')
+        if usbId is not None:
+            (usbPath / 'idVendor').write_text(f'{usbId[0]}\n')
+            (usbPath / 'idProduct').write_text(f'{usbId[1]}\n')
+        (hidPath / 'hidraw' / name / 'device').symlink_to(hidPath)
+        (root / 'class' / 'hidraw' / name).symlink_to(hidPath / 'hidraw' / name)
+    return root / 'class' / 'hidraw'
+
+class TestDeviceScan(unittest.TestCase):
+    def setUp(self):
+        self.__dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.__dir.name)
+
+    def tearDown(self):
+        self.__dir.cleanup()
+
+    def scan(self, nodes, unsupported=False):
+        return sorted(Device.scan(makeSysfs(self.root, nodes), '/dev', unsupported))
+
+    def testScan(self):
+        devices = self.scan([
+            ('hidraw0', 'usb3',     '3-2',   '0003:000004D8:00003005', None),
+            ('hidraw1', 'usb3/3-1', '3-1.4', '0003:00000416:00000001', None),
+            ('hidraw2', 'usb3/3-1', '3-1.2', '0003:0000046D:0000C069', None),
+        ])
+        self.assertEqual(devices, [
+            DeviceInfo(Path('/dev/hidraw0'), 0x04D8, 0x3005, 'Elitech RC-5+',   0x0003, '3-2',   'usb3'),
+            DeviceInfo(Path('/dev/hidraw1'), 0x0416, 0x0001, 'Elitech LogEt 1', 0x0003, '3-1.4', '3-1' ),
+        ])
+
+    def testScanUnsupported(self):
+        devices = self.scan([
+            ('hidraw0', 'usb3',     '3-2',   '0003:0000046D:0000C069', None),
+            ('hidraw1', 'usb3/3-1', '3-1.4', '0003:000004D8:0000F564', None),
+        ], True)
+        self.assertEqual(devices, [
+            DeviceInfo(Path('/dev/hidraw0'), 0x046D, 0xC069, None,      0x0003, '3-2',   'usb3'),
+            DeviceInfo(Path('/dev/hidraw1'), 0x04D8, 0xF564, 'Unknown', 0x0003, '3-1.4', '3-1' ),
+        ])
+
+    def testScanFallback(self):
+        devices = self.scan([
+            ('hidraw0', 'usb1', '1-1', None, ('04d8', '3005')),
+            ('hidraw1', 'usb1', '1-2', None, None),
+            ('hidraw2', 'usb1', '1-3', 'HID_ID', ('0416', '0001')),
+        ])
+        self.assertEqual(devices, [
+            DeviceInfo(Path('/dev/hidraw0'), 0x04D8, 0x3005, 'Elitech RC-5+',   None, '1-1', 'usb1'),
+            DeviceInfo(Path('/dev/hidraw2'), 0x0416, 0x0001, 'Elitech LogEt 1', None, '1-3', 'usb1'),
+        ])
+
+    def testScanImmutable(self):
+        device = self.scan([('hidraw0', 'usb3', '3-2', '0003:000004D8:00003005', None)])[0]
+        with self.assertRaises(AttributeError):
+            device.vendorId = 0x0416
+
+    @testdata.TestData([
+        {'hidId': '0003:000004D8:00003005', 'usbId': None,             'ids': (0x04D8, 0x3005)},
+        {'hidId': None,                     'usbId': ('0416', '0001'), 'ids': (0x0416, 0x0001)},
+    ])
+    def testResolve(self, hidId, usbId, ids):
+        root = self.root / f'{ids[0]:04x}'
+        classPath = makeSysfs(root / 'sys', [('hidraw0', 'usb1', '1-1', hidId, usbId)])
+        (root / 'hidraw0').touch()
+        dev = Device(root / 'hidraw0', classPath)
+        self.assertEqual((dev.vendorId, dev.productId), ids)
+
+    def testTopologyUnknown(self):
+        (self.root / 'hidraw0').mkdir()
+        self.assertEqual(Device.topology(self.root / 'hidraw0'), (None, None))
+
+    @testdata.TestData([
+        {'uevent': 'HID_ID=0003:000004D8:00003005',                      'hidId': (0x0003, 0x04D8, 0x3005)},
+        {'uevent': 'DRIVER=hid-generic\nHID_ID=0005:00000416:00000001\n', 'hidId': (0x0005, 0x0416, 0x0001)},
+    ])
+    def testParseUevent(self, uevent, hidId):
+        self.assertEqual(Device.parseUevent(uevent), hidId)
+
+    @testdata.TestData([
+        {'uevent': '',                        'error': "No HID_ID in uevent"               },
+        {'uevent': 'HID_NAME=Elitech',        'error': "No HID_ID in uevent"               },
+        {'uevent': 'HID_ID=0003:000004D8',    'error': "Invalid HID_ID: 0003:000004D8"     },
+        {'uevent': 'HID_ID=0003:XYZ:00003005', 'error': "Invalid HID_ID: 0003:XYZ:00003005"},
+    ])
+    def testParseUeventInvalid(self, uevent, error):
+        with self.assertRaises(ValueError) as e:
+            Device.parseUevent(uevent)
+        self.assertEqual(str(e.exception), error)
@@ -0,0 +1,116 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+import unittest.mock
+
+from PythonUtils import testdata
+
+from elitech.src.device import Device
+from elitech.src.frames import Frame
+from elitech.src.pipeline import RecordPipeline
+from elitech.src.scheduler import FrameScheduler
+from elitech.src.scheduler import Priority
+
+from .test_daemon import SimulatedDevice
+from .test_pager import CacheDir
+
+import threading
+import time
+
+class TestFrameScheduler(unittest.TestCase):
+    @staticmethod
+    def exchange(scheduler, offset, priority, delay=0):
+        time.sleep(delay)
+        return scheduler.exchange(bytes(Frame(Frame.Operation.GetParameter, 0x10 * offset, 2)), priority)
+
+    @testdata.TestData([
+        {'priorities': [Priority.Bulk, Priority.Bulk,        Priority.Interactive], 'order': [0, 2, 1]},
+        {'priorities': [Priority.Bulk, Priority.Interactive, Priority.Interactive], 'order': [0, 1, 2]},
+        {'priorities': [Priority.Bulk, Priority.Interactive, Priority.Bulk       ], 'order': [0, 1, 2]},
+        {'priorities': [Priority.Interactive, Priority.Bulk, Priority.Interactive], 'order': [0, 2, 1]},
+    ])
+    def testPriority(self, priorities, order):
+        dev = SimulatedDevice(delay=0.05)
+        scheduler = FrameScheduler(dev)
+        threads = [threading.Thread(target=TestFrameScheduler.exchange, args=(scheduler, o, p, 0.01 * o)) for o, p in enumerate(priorities)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([((r[9] << 16) + (r[7] << 8) + r[8]) // 0x10 for r in dev.requests], order)
+        for p in Priority:
+            m = scheduler.metrics[p]
+            self.assertEqual(m.frames, priorities.count(p))
+            self.assertEqual(m.depth, 0)
+            self.assertLessEqual(m.meanWait, m.maxWait)
+            self.assertLessEqual(m.meanLatency, m.maxLatency)
+            self.assertLessEqual(m.maxWait, m.maxLatency)
+        self.assertGreater(scheduler.metrics[Priority.Bulk].maxDepth, 0)
+
+    def testInterleaved(self):
+        with CacheDir():
+            dev = SimulatedDevice(delay=0.005)
+            dev.config[0x00:0x08] = bytes(range(1, 9))
+            scheduler = FrameScheduler(dev)
+            records = []
+            download = threading.Thread(target=lambda: records.extend(RecordPipeline(scheduler.device(Priority.Bulk))))
+            download.start()
+            time.sleep(0.01)
+            values = [Device.getParameters(scheduler.device(Priority.Interactive), 'model') for _ in range(0, 3)]
+            download.join()
+
+        expected = [r for r in RecordPipeline(SimulatedDevice())]
+        self.assertEqual([(r, record.time) for r, record in records], [(r, record.time) for r, record in expected])
+        self.assertEqual(values, [Device.getParameters(dev, 'model')]*3)
+
+        # The parameter frames were sent before the end of the download
+        operations = [r[4] for r in dev.requests]
+        last = len(operations) - operations[::-1].index(Frame.Operation.GetRecord.value)
+        self.assertIn(Frame.Operation.GetParameter.value, operations[:last])
+        self.assertEqual(scheduler.metrics[Priority.Interactive].frames, 3)
+
+    def testError(self):
+        dev = SimulatedDevice()
+        scheduler = FrameScheduler(dev)
+        dev.write = unittest.mock.Mock(side_effect=OSError(19, 'No such device'))
+        with self.assertRaises(OSError):
+            TestFrameScheduler.exchange(scheduler, 0, Priority.Interactive)
+
+        # The scheduler is not blocked
+        del dev.write
+        self.assertEqual(len(TestFrameScheduler.exchange(scheduler, 0, Priority.Bulk)), dev.inReportSize)
+        self.assertEqual(scheduler.metrics[Priority.Interactive].frames, 1)
+        self.assertEqual(scheduler.metrics[Priority.Bulk].frames, 1)
+
+    def testDevice(self):
+        dev = SimulatedDevice()
+        scheduler = FrameScheduler(dev)
+        view = scheduler.device(Priority.Bulk)
+        self.assertTrue(view)
+        self.assertEqual(view.inReportSize, dev.inReportSize)
+        self.assertEqual(view.vendorId, dev.vendorId)
+        with self.assertRaises(ValueError):
+            view.read()
+        with view:
+            self.assertEqual(dev.active, 1)
+            view.write(bytes(Frame(Frame.Operation.GetParameter, 0, 2)))
+            self.assertEqual(len(dev.requests), 0)
+            view.read()
+            self.assertEqual(len(dev.requests), 1)
+        self.assertEqual(dev.active, 0)
@@ -0,0 +1,226 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.src.asyncdevice import AsyncDevice
+from elitech.src.cache import loadJson
+from elitech.src.commands import Command
+from elitech.src.configcache import ConfigCache
+from elitech.src.device import Device
+from elitech.src.frames import Frame
+from elitech.src.simulator import Fault
+from elitech.src.simulator import Simulator
+
+from .test_pager import CacheDir
+from .test_pager import encodeRecord
+
+from argparse import Namespace
+from contextlib import redirect_stdout
+from datetime import datetime
+from datetime import timedelta
+
+import asyncio
+import io
+import time
+
+def makeRecords(n):
+    t = datetime(2024, 1, 31, 8, 0, 0)
+    return [encodeRecord(t + timedelta(minutes=r)) for r in range(0, n)]
+
+def execute(dev, *cmds):
+    with redirect_stdout(io.StringIO()):
+        Command(Namespace(dev=dev, compat=False, since=None, until=None, cmds=list(cmds))).execute()
+
+class TestSimulator(unittest.TestCase):
+    @testdata.TestData([
+        {'reportSize':  32},
+        {'reportSize':  64},
+        {'reportSize': 128},
+        {'reportSize': 256},
+        {'reportSize': 512},
+    ])
+    def testDevice(self, reportSize):
+        with CacheDir(), Simulator(makeRecords(40), protocol=0x23, reportSize=reportSize, serial='EL1234567890') as sim:
+            infos = list(Device.scan(sim.classPath, sim.path.parent))
+            self.assertEqual(len(infos), 1)
+            self.assertEqual(infos[0].path, sim.path)
+
+            dev = Device.fromInfo(infos[0], sim.classPath)
+            self.assertEqual(dev.name, 'Elitech RC-5+')
+            self.assertEqual(dev.inReportSize, reportSize)
+            self.assertEqual(dev.outReportSize, reportSize)
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(dev.getParameters('serial-number', 'protocol-version', 'record-number'),
+                                 {'serial-number': 'EL1234567890', 'protocol-version': 0x23, 'record-number': 40})
+                records = list(dev.iterRecords(protocol=0x23))
+        self.assertEqual([r for r, record in records], list(range(0, 40)))
+        self.assertEqual([record.time for r, record in records], [datetime(2024, 1, 31, 8, 0, 0) + timedelta(minutes=r) for r in range(0, 40)])
+
+    @testdata.TestData([
+        {'name': 'travel-number',  'value': 'ABC'   },
+        {'name': 'start-delay',    'value': '42'    },
+    ])
+    def testSetParameter(self, name, value):
+        with CacheDir(), Simulator() as sim:
+            execute(sim.device(), 'parameter', 'set', name, value)
+            self.assertEqual(str(sim.get(name)), value)
+            self.assertEqual(sim.get('serial-number'), 'EL0000000001')
+
+    @testdata.TestData([
+        {'params': ['start-delay', '0'                                   ], 'writes': [                              ]},
+        {'params': ['start-delay', '42'                                  ], 'writes': [(0x41, 1)                     ]},
+        {'params': ['travel-number', 'ABC'                               ], 'writes': [(0x10, 3)                     ]},
+        {'params': ['csv', '1', 'start-delay', '42'                      ], 'writes': [(0x27, 1), (0x41, 1)          ]},
+        {'params': ['timezone', '+0100', 'csv', '1'                      ], 'writes': [(0x24, 4)                     ]},
+        {'params': ['configuration-time', '2024-01-01 00:00:00'          ], 'writes': [(0x28, 7)                     ]},
+    ])
+    def testSetParameterWrites(self, params, writes):
+        sim = Simulator()
+        with CacheDir():
+            execute(sim.loopback(), 'parameter', 'set', *params)
+        frames = [r for r in sim.requests if (r[4:6] == b'\x04\x00')]
+        self.assertEqual([((r[9] << 16) + (r[7] << 8) + r[8], r[10]) for r in frames], writes)
+
+    @testdata.TestData([
+        {'cmds': ['parameter', 'set', 'start-delay', '42']},
+        {'cmds': ['address', 'set', '66', '42']           },
+    ])
+    def testSetInvalidatesCache(self, cmds):
+        sim = Simulator(serial='EL1234567890')
+        with CacheDir():
+            execute(sim.loopback(), 'parameter', 'get', 'start-delay')
+            self.assertIn('EL1234567890', loadJson(ConfigCache.CacheName, {}))
+            n = len(sim.requests)
+            execute(sim.loopback(), *cmds)
+            self.assertNotIn('EL1234567890', loadJson(ConfigCache.CacheName, {}))
+        # The serial number is read along with the old values: no frame is read after the writes
+        ops = [r[4:6] for r in sim.requests[n:]]
+        self.assertEqual(ops, sorted(ops, key=lambda op: op == b'\x04\x00'))
+        self.assertIn(b'\x04\x00', ops)
+
+    def testGetParameterRanges(self):
+        # The ranges printed are the ranges actually requested
+        sim = Simulator()
+        with CacheDir():
+            execute(sim.loopback(), 'parameter', 'get', 'interval')
+            n = len(sim.requests)
+            with redirect_stdout(io.StringIO()) as out:
+                Command(Namespace(dev=sim.loopback(), cmds=['parameter', 'get', 'interval'])).execute()
+        self.assertEqual(out.getvalue().splitlines()[0], str([ConfigCache.Token]))
+        self.assertEqual(len(sim.requests), n + 1)
+
+    def testSetParameterConcurrent(self):
+        # The commands of the daemon are built and executed in several threads
+        sims = [Simulator(), Simulator()]
+        with CacheDir(), redirect_stdout(io.StringIO()):
+            cmds = [Command(Namespace(dev=sim.loopback(), compat=False, since=None, until=None, cmds=['parameter', 'set', 'start-delay', str(d)])) for d, sim in zip([42, 43], sims)]
+            for cmd in cmds:
+                cmd.execute()
+        self.assertEqual([sim.get('start-delay') for sim in sims], [42, 43])
+
+    @testdata.TestData([
+        {'params': ['66', '0'                    ], 'writes': [         ]},
+        {'params': ['66', '42'                   ], 'writes': [(0x41, 1)]},
+        {'params': ['65-67', '0', '42', '0'      ], 'writes': [(0x41, 1)]},
+    ])
+    def testSetAddressWrites(self, params, writes):
+        sim = Simulator()
+        with CacheDir():
+            execute(sim.loopback(), 'address', 'set', *params)
+        frames = [r for r in sim.requests if (r[4:6] == b'\x04\x00')]
+        self.assertEqual([((r[9] << 16) + (r[7] << 8) + r[8], r[10]) for r in frames], writes)
+        self.assertEqual(sim.get('start-delay'), 42 if writes else 0)
+
+    def testStopFormat(self):
+        with CacheDir(), Simulator(makeRecords(10)) as sim:
+            execute(sim.device(), 'stop')
+            self.assertTrue(sim.stopped)
+            self.assertEqual(len(sim.records), 10)
+            execute(sim.device(), 'format')
+            self.assertFalse(sim.stopped)
+            self.assertEqual(len(sim.records), 0)
+            self.assertEqual(sim.get('record-number'), 0)
+
+    def testLatency(self):
+        with CacheDir(), Simulator(latency=0.02) as sim:
+            dev = sim.device()
+            with redirect_stdout(io.StringIO()):
+                dev.inReportSize
+                t0 = time.perf_counter()
+                dev.getParameters('model', 'interval', 'protocol-version')
+                t = time.perf_counter() - t0
+        self.assertEqual(len(sim.requests), 3)
+        self.assertGreaterEqual(t, 0.06)
+
+    @testdata.TestData([
+        {'fault': Fault.Checksum, 'message': 'Invalid answer checksum'    },
+        {'fault': Fault.Offset,   'message': 'Answer offset does not match'},
+    ])
+    def testFaultWarning(self, fault, message):
+        sim = Simulator(faults={1: fault})
+        for n in range(0, 3):
+            frame = Frame(Frame.Operation.GetParameter, 0x02, 12)
+            if (n == 1):
+                with self.assertWarns(UserWarning) as w:
+                    frame.parse(sim.answer(bytes(frame) + bytes(64 - len(bytes(frame)))))
+                self.assertIn(message, str(w.warning))
+            else:
+                self.assertEqual(frame.parse(sim.answer(bytes(frame) + bytes(64 - len(bytes(frame))))).data, b'EL0000000001')
+
+    def testFaultHeader(self):
+        sim = Simulator(faults=lambda n, request: Fault.Header if (request[4] == Frame.Operation.GetParameter.value) else None)
+        frame = Frame(Frame.Operation.GetParameter, 0x02, 12)
+        with self.assertRaises(ValueError):
+            frame.parse(sim.answer(bytes(frame)))
+
+    def testFaultDrop(self):
+        async def getParameters(dev):
+            async with AsyncDevice(dev, timeout=0.1) as d:
+                return await d.getParameters('serial-number')
+
+        with CacheDir(), Simulator(faults={0: Fault.Drop}) as sim:
+            with self.assertRaises(TimeoutError):
+                asyncio.run(getParameters(sim.device()))
+            self.assertEqual(asyncio.run(getParameters(sim.device())), {'serial-number': 'EL0000000001'})
+
+    def testLoopback(self):
+        sim = Simulator(makeRecords(10), faults=lambda n, request: Fault.Drop if (request[4:6] == b'\xC0\x03') else None)
+        dev = sim.loopback()
+        with CacheDir(), redirect_stdout(io.StringIO()) as out:
+            Command(Namespace(dev=dev, cmds=['parameter', 'get', 'serial-number', 'record-number'])).execute()
+        self.assertIn('serial-number: EL0000000001', out.getvalue())
+        self.assertIn('record-number: 0x000A', out.getvalue())
+        n = len(sim.requests)
+        with self.assertRaises(TimeoutError):
+            execute(dev, 'stop')
+        self.assertFalse(sim.stopped)
+        self.assertEqual(len(sim.requests), n + 1)
+
+    @testdata.TestData([
+        {'request': b''                                   },
+        {'request': b'\x33\xCC\x00\x0C\x03\x00\x00\x00\x00\x00\x02\x00'},
+        {'request': b'\x33\xCC\x00\x0C\x07\x00\x00\x00\x00\x00\x02\x14'},
+    ])
+    def testInvalidRequest(self, request):
+        self.assertEqual(Simulator().answer(request + bytes(64 - len(request))), bytes(64))
+
+    def testInvalidReportSize(self):
+        with self.assertRaises(ValueError):
+            Simulator(reportSize=8)
@@ -21,6 +21,8 @@ from PythonUtils import testdata
 
 from elitech.src.commands import RecordRead
 
+from datetime import datetime
+
 class TestSliceFromString(unittest.TestCase):
     @testdata.TestData([
         {'s': '::'},
@@ -80,3 +82,27 @@ class TestSliceFromString(unittest.TestCase):
         self.assertEqual(s.start, start)
         self.assertEqual(s.stop, stop)
         self.assertEqual(s.step, step)
+
+
+class TestTimeFromString(unittest.TestCase):
+    @testdata.TestData([
+        {'s': None,                  't': None                              },
+        {'s': '2024-01-31',          't': datetime(2024, 1, 31,  0,  0,  0)},
+        {'s': '2024-01-31 08:00',    't': datetime(2024, 1, 31,  8,  0,  0)},
+        {'s': '2024-01-31 08:15:30', 't': datetime(2024, 1, 31,  8, 15, 30)},
+        {'s': '2024-01-31T23:59:59', 't': datetime(2024, 1, 31, 23, 59, 59)},
+    ])
+    def testNormal(self, s, t):
+        self.assertEqual(RecordRead.timeFromString(s), t)
+
+    @testdata.TestData([
+        {'s': ''},
+        {'s': 'yesterday'},
+        {'s': '2024-13-01'},
+        {'s': '2024-01-31 25:00'},
+    ])
+    def testInvalid(self, s):
+        with self.assertRaises(ValueError) as e:
+            RecordRead.timeFromString(s)
+
+        self.assertEqual(str(e.exception), f"Invalid time: {s}")
@@ -0,0 +1,49 @@
+# Copyright 2023 Pascal COMBES <pascom@orange.fr>
+#
+# This file is part of python-elitech.
+#
+# python-elitech is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-elitech is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-elitech. If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from PythonUtils import testdata
+
+from elitech.bench.startup import Heavy
+from elitech.bench.startup import Budget
+from elitech.bench.startup import importTimes
+
+class TestStartup(unittest.TestCase):
+    @testdata.TestData([
+        {'module': 'elitech.src.main'    },
+        {'module': 'elitech.src.commands'},
+        {'module': 'elitech.src.device'  },
+        {'module': 'elitech'             },
+    ])
+    def testLazyImports(self, module):
+        times = importTimes(module)
+        self.assertIn(module, times)
+        for name in Heavy:
+            self.assertNotIn(name, times)
+
+    def testBudget(self):
+        # Best of a few runs, so that a loaded machine does not break the test
+        total = min(importTimes()['elitech.src.main'][1] for _ in range(3))
+        self.assertLess(total, Budget)
+
+    def testExports(self):
+        import elitech
+        self.assertIn('Device', dir(elitech))
+        self.assertIs(elitech.Device, __import__('elitech.src.device', fromlist=['Device']).Device)
+        with self.assertRaises(AttributeError):
+            elitech.Unknown